@@ -40,10 +40,11 @@ INSTALLED_APPS = [
     'rest_framework',
     'rest_framework.authtoken',
     'django_filters',
-    'store',
+    'store.apps.StoreConfig',
 ]
 
 MIDDLEWARE = [
+    'store.instrumentation.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -77,22 +78,123 @@ WSGI_APPLICATION = 'django_diplom.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.1/ref/settings/#databases
 
+# store.db.postgresql - postgresql с пулом соединений (store.db.pool): соединение, закрытое в конце запроса
+# (CONN_MAX_AGE = 0), возвращается в пул процесса. POOL: MIN_SIZE / MAX_SIZE соединений, TIMEOUT ожидания
+# свободного соединения, MAX_IDLE и MAX_LIFETIME в секундах, CHECK_AFTER - после скольких секунд простоя
+# соединение проверяется перед выдачей.
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'store.db.postgresql',
         'NAME': 'test6',
         'HOST': '127.0.0.1',
         'PORT': '5432',
         'USER': 'test2',
         'PASSWORD': 'test2',
+        'CONN_MAX_AGE': 0,
+        'POOL': {
+            'MIN_SIZE': 2,
+            'MAX_SIZE': 20,
+            'TIMEOUT': 5,
+            'MAX_IDLE': 300,
+            'MAX_LIFETIME': 3600,
+            'CHECK_AFTER': 5,
+        },
     }
 }
 
+# Чтение каталога с реплик (store.routing): {alias из DATABASES: вес}. После записи клиент
+# PIN_SECONDS секунд читает с основной базы. Состояние закрепления хранится в кэше CACHE.
+STORE_DATABASE_ROUTING = {
+    'REPLICAS': {},
+    'PIN_SECONDS': 5,
+    'CACHE': 'default',
+}
+
+# Шардирование заказов по пользователю (store.sharding): алиасы из DATABASES. Новый шард добавляется
+# в конец списка, после чего заказы переносятся командой rebalance_order_shards. Без шардов или с одним
+# шардом все заказы лежат в основной базе. ID заказов и позиций выдаются блоками по ID_BLOCK_SIZE.
+STORE_ORDER_SHARDING = {
+    'SHARDS': [],
+    'ID_BLOCK_SIZE': 1000,
+}
+
+DATABASE_ROUTERS = ['store.sharding.ShardRouter', 'store.routing.ReplicaRouter']
+
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
-    ]
+        'store.authentication.CachedTokenAuthentication',
+    ],
+    'DEFAULT_PAGINATION_CLASS': 'store.pagination.KeysetPagination',
+    'PAGE_SIZE': 20,
+    # JSON через orjson (store.renderers, store.parsers): тот же ответ, дробные числа запроса - Decimal
+    'DEFAULT_RENDERER_CLASSES': [
+        'store.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'store.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+}
+
+# Максимальный размер страницы, который клиент может запросить через ?page_size=
+STORE_MAX_PAGE_SIZE = 100
+
+# Быстрый list продуктов и заказов из строк values() (store.fastpath.FastListMixin)
+STORE_FAST_LIST_SERIALIZATION = False
+
+# Сколько первых продуктов подборки выводится в /api/v1/product-collections/ (остальные - в .../{id}/products/)
+STORE_COLLECTION_PREVIEW_SIZE = 10
+
+# Через сколько дней выполненный заказ переносится в архив командой archive_orders
+STORE_ORDER_ARCHIVE_AFTER_DAYS = 365
+
+# Максимальное количество заказов в одном запросе к /api/v1/orders/bulk/
+STORE_BULK_ORDERS_MAX_SIZE = 5000
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Кэш ответов для анонимных запросов к каталогу (store.cache.CachedResponseMixin)
+STORE_RESPONSE_CACHE = {
+    'ENABLED': True,
+    'CACHE': 'default',
+    'TIMEOUT': 300,
+}
+
+# Кэш токен -> пользователь для store.authentication.CachedTokenAuthentication
+STORE_TOKEN_CACHE = {
+    'MAX_SIZE': 10000,
+    'TTL': 30,
+    'SHARED_CACHE': None,
+    'SHARED_TTL': 300,
+}
+
+# Метрики запросов в заголовке Server-Timing (store.instrumentation.ServerTimingMiddleware)
+STORE_INSTRUMENTATION = {
+    'ENABLED': False,
+    'LOG': False,
+}
+
+# Фоновые задачи в базе DATABASE (store.jobs), выполняются командой run_workers. Неудачная задача
+# повторяется через BACKOFF * 2^(попытка - 1) секунд (не больше MAX_BACKOFF), после MAX_ATTEMPTS - FAILED.
+# Задача, выполняющаяся дольше LEASE секунд, возвращается в очередь. Выполненные удаляются через KEEP_DONE секунд.
+# С EAGER задачи выполняются сразу в потоке запроса.
+STORE_JOBS = {
+    'EAGER': False,
+    'DATABASE': 'default',
+    'MAX_ATTEMPTS': 5,
+    'BACKOFF': 2,
+    'MAX_BACKOFF': 600,
+    'LEASE': 300,
+    'POLL_INTERVAL': 1,
+    'BATCH_SIZE': 10,
+    'KEEP_DONE': 24 * 3600,
 }
 
 
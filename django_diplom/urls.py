@@ -16,13 +16,14 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from store.views import ProductsViewSet, ProductReviewsViewSet, ProductCollectionViewSet, OrdersViewSet
+from store.views import ProductsViewSet, ProductReviewsViewSet, ProductCollectionViewSet, OrdersViewSet, StatsViewSet
 
 router = DefaultRouter()
 router.register("products", ProductsViewSet, basename="products")
 router.register('product-reviews', ProductReviewsViewSet, basename='product-reviews')
 router.register('product-collections', ProductCollectionViewSet, basename='product-collections')
 router.register('orders', OrdersViewSet, basename='orders')
+router.register('stats', StatsViewSet, basename='stats')
 
 urlpatterns = [
     path('admin/', admin.site.urls),
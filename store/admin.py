@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Order, ProductOrderPosition, ProductCollection, Product, ProductReview
+from .models import ArchivedOrder, ArchivedOrderPosition, Order, ProductOrderPosition, ProductCollection, Product, \
+    ProductReview
 
 
 @admin.register(Product)
@@ -24,3 +25,12 @@ class OrderAdmin(admin.ModelAdmin):
 @admin.register(ProductCollection)
 class ProductCollectionAdmin(admin.ModelAdmin):
     pass
+
+
+class ArchivedOrderPositionInline(admin.TabularInline):
+    model = ArchivedOrderPosition
+
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(admin.ModelAdmin):
+    inlines = [ArchivedOrderPositionInline]
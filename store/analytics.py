@@ -0,0 +1,178 @@
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+
+from django.db import connections, router, transaction
+from django.db.models import Count, DecimalField, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .jobs import discard_jobs, enqueue
+from .models import (ArchivedOrder, ArchivedOrderPosition, Order, OrderStatusDay, ProductOrderPosition,
+                     ProductSalesDay)
+from .sharding import order_shards, sharding_enabled
+
+ROLLUPS = {
+    ProductSalesDay: (('product_id', 'day'), ('quantity', 'revenue')),
+    OrderStatusDay: (('order_status', 'day'), ('orders', 'revenue')),
+}
+UPSERT_BATCH_SIZE = 200
+
+
+def order_state(order, positions=None):
+    """
+    Снимок заказа для роллапов: статус, день создания и позиции
+    (продукт, количество, цена за единицу). Без `positions` берутся
+    позиции заказа (из prefetch, если он был).
+    """
+    if positions is None:
+        positions = order.positions.all()
+    return (
+        str(order.order_status),
+        timezone.localdate(order.created_at),
+        tuple((position.product_id, position.quantity, position.unit_price) for position in positions),
+    )
+
+
+class SalesDelta:
+    """
+    Изменения роллапов продаж, накопленные по одному или нескольким заказам.
+    Заказ входит в продажи своего продукта и в статус за день создания заказа;
+    изменение заказа - это вычитание старого снимка и добавление нового.
+    """
+
+    def __init__(self):
+        self.products = defaultdict(lambda: [0, Decimal(0)])
+        self.statuses = defaultdict(lambda: [0, Decimal(0)])
+
+    def add(self, state, sign=1):
+        if state is None:
+            return
+        status, day, positions = state
+        revenue = Decimal(0)
+        for product_id, quantity, unit_price in positions:
+            row = self.products[(product_id, day)]
+            row[0] += sign * quantity
+            row[1] += sign * quantity * unit_price
+            revenue += quantity * unit_price
+        row = self.statuses[(status, day)]
+        row[0] += sign
+        row[1] += sign * revenue
+
+    def change(self, before, after):
+        self.add(before, -1)
+        self.add(after, 1)
+
+    def apply(self, using=None):
+        using = using or router.db_for_write(ProductSalesDay)
+        upsert(ProductSalesDay, self.products, using)
+        upsert(OrderStatusDay, self.statuses, using)
+
+    def as_payload(self):
+        """Ненулевые изменения в виде JSON: [ключ, день ISO, количество, выручка строкой]."""
+        return {
+            name: [[key, day.isoformat(), count, str(amount)] for (key, day), (count, amount) in rows.items()
+                   if count or amount]
+            for name, rows in (('products', self.products), ('statuses', self.statuses))
+        }
+
+    @classmethod
+    def from_payload(cls, products=(), statuses=()):
+        delta = cls()
+        for rows, payload in ((delta.products, products), (delta.statuses, statuses)):
+            for key, day, count, amount in payload:
+                rows[(key, date.fromisoformat(day))] = [count, Decimal(amount)]
+        return delta
+
+    def schedule(self, using=None):
+        """
+        Ставит применение изменений в фоновую очередь после фиксации транзакции
+        базы `using`, в которой меняются заказы.
+        """
+        payload = self.as_payload()
+        if any(payload.values()):
+            enqueue('store.apply_sales_delta', payload, using=using)
+
+
+def record_order_change(before, after, using=None):
+    """
+    Ставит в очередь изменение роллапов по заказу; `before` / `after` - снимки
+    order_state или None, `using` - база транзакции, в которой меняется заказ.
+    """
+    delta = SalesDelta()
+    delta.change(before, after)
+    delta.schedule(using)
+
+
+def upsert(model, deltas, using):
+    """
+    Прибавляет `deltas` ({ключ: значения}) к строкам роллапа одним
+    INSERT ... ON CONFLICT DO UPDATE на пачку: строки создаются при первой
+    продаже, а параллельные изменения складываются в базе, а не в Python.
+    Ключи сортируются, чтобы параллельные транзакции блокировали строки
+    в одном порядке.
+    """
+    rows = sorted((key, values) for key, values in deltas.items() if any(values))
+    if not rows:
+        return
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    key_names, value_names = ROLLUPS[model]
+    fields = [model._meta.get_field(name) for name in key_names + value_names]
+    table = quote(model._meta.db_table)
+    columns = [quote(field.column) for field in fields]
+    conflict = ', '.join(columns[:len(key_names)])
+    assignments = ', '.join(f'{column} = {table}.{column} + EXCLUDED.{column}' for column in columns[len(key_names):])
+    row_sql = f"({', '.join(['%s'] * len(columns))})"
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+            batch = rows[start:start + UPSERT_BATCH_SIZE]
+            params = []
+            for key, values in batch:
+                params += [field.get_db_prep_save(value, connection) for field, value in zip(fields, (*key, *values))]
+            cursor.execute(
+                f"INSERT INTO {table} ({', '.join(columns)}) VALUES {', '.join([row_sql] * len(batch))} "
+                f"ON CONFLICT ({conflict}) DO UPDATE SET {assignments}",
+                params,
+            )
+
+
+def rebuild_sales_stats(chunk_size=10000, using='default'):
+    """
+    Пересчитывает роллапы по всем заказам, включая архивные (store.archive),
+    в одной транзакции: таблицы очищаются и заполняются заново агрегатами по
+    порциям заказов (диапазоны ID). При шардировании заказы читаются со всех
+    шардов, роллапы пишутся в `using`. Невыполненные задачи
+    store.apply_sales_delta (в том числе FAILED) удаляются в начале
+    транзакции: их изменения уже учтены пересчетом.
+    """
+    revenue = Sum(F('quantity') * F('unit_price'), output_field=DecimalField(max_digits=16, decimal_places=2))
+    processed = 0
+    with transaction.atomic(using=using):
+        discard_jobs('store.apply_sales_delta')
+        ProductSalesDay.objects.using(using).all().delete()
+        OrderStatusDay.objects.using(using).all().delete()
+        for source in (order_shards() if sharding_enabled() else [using]):
+            for order_model, position_model in ((Order, ProductOrderPosition),
+                                                (ArchivedOrder, ArchivedOrderPosition)):
+                orders = order_model.objects.using(source)
+                last_id = 0
+                while True:
+                    ids = list(orders.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:chunk_size])
+                    if not ids:
+                        break
+                    positions = position_model.objects.using(source).filter(order_id__gte=ids[0],
+                                                                            order_id__lte=ids[-1])
+                    positions = positions.annotate(day=TruncDate('order__created_at')).order_by()
+                    delta = SalesDelta()
+                    for row in positions.values('product_id', 'day').annotate(sold=Sum('quantity'), amount=revenue):
+                        delta.products[(row['product_id'], row['day'])] = [row['sold'], row['amount']]
+                    for row in positions.values('order__order_status', 'day').annotate(amount=revenue):
+                        delta.statuses[(row['order__order_status'], row['day'])][1] = row['amount']
+                    counts = orders.filter(id__gte=ids[0], id__lte=ids[-1]).annotate(day=TruncDate('created_at'))
+                    for row in counts.order_by().values('order_status', 'day').annotate(orders=Count('id')):
+                        delta.statuses[(row['order_status'], row['day'])][0] = row['orders']
+                    delta.apply(using)
+                    processed += len(ids)
+                    last_id = ids[-1]
+    return processed
@@ -0,0 +1,126 @@
+from datetime import timedelta
+from functools import cmp_to_key
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ArchivedOrder, ArchivedOrderPosition, Order, OrderStatusChoices, ProductOrderPosition
+
+INCLUDE_ARCHIVED_PARAM = 'include_archived'
+
+
+def archive_age():
+    return timedelta(days=getattr(settings, 'STORE_ORDER_ARCHIVE_AFTER_DAYS', 365))
+
+
+def include_archived(request):
+    return request.query_params.get(INCLUDE_ARCHIVED_PARAM, '').lower() in ('1', 'true', 'yes')
+
+
+def archivable_orders(cutoff, using='default'):
+    return Order.objects.using(using).filter(order_status=OrderStatusChoices.DONE, updated_at__lt=cutoff)
+
+
+def archive_chunk(ids, cutoff, using='default'):
+    """
+    Переносит заказы `ids` с позициями в архив в одной транзакции.
+    Заказы заново отбираются под блокировкой, поэтому заказ, который успели
+    изменить после выборки, остается на месте. Порция копируется и удаляется
+    атомарно, поэтому заказ с ID, уже занятым в архиве, - это конфликт данных:
+    IntegrityError откатывает порцию, и живой заказ не удаляется.
+    """
+    with transaction.atomic(using=using):
+        orders = list(archivable_orders(cutoff, using).filter(id__in=ids).select_for_update())
+        if not orders:
+            return 0
+        order_ids = [order.id for order in orders]
+        positions = ProductOrderPosition.objects.using(using).filter(order_id__in=order_ids)
+        ArchivedOrder.objects.using(using).bulk_create([
+            ArchivedOrder(id=order.id, user_id=order.user_id, order_status=order.order_status, total=order.total,
+                          created_at=order.created_at, updated_at=order.updated_at)
+            for order in orders
+        ])
+        ArchivedOrderPosition.objects.using(using).bulk_create([
+            ArchivedOrderPosition(id=position.id, order_id=position.order_id, product_id=position.product_id,
+                                  quantity=position.quantity, unit_price=position.unit_price)
+            for position in positions
+        ])
+        positions.delete()
+        Order.objects.using(using).filter(id__in=order_ids).delete()
+        return len(order_ids)
+
+
+def archive_orders(older_than=None, chunk_size=1000, limit=None, using='default', progress=None):
+    """
+    Переносит выполненные (DONE) заказы, не менявшиеся дольше `older_than`
+    (по умолчанию STORE_ORDER_ARCHIVE_AFTER_DAYS), в ArchivedOrder порциями
+    по `chunk_size`, каждая порция - отдельная транзакция. Прерванный запуск
+    можно просто повторить: перенесенные заказы уже удалены из Order.
+    Роллапы продаж не меняются - архивный заказ остается в статистике.
+    """
+    cutoff = timezone.now() - (archive_age() if older_than is None else older_than)
+    archived = 0
+    last_id = 0
+    while limit is None or archived < limit:
+        size = chunk_size if limit is None else min(chunk_size, limit - archived)
+        ids = list(archivable_orders(cutoff, using).filter(id__gt=last_id).order_by('id')
+                   .values_list('id', flat=True)[:size])
+        if not ids:
+            break
+        archived += archive_chunk(ids, cutoff, using)
+        last_id = ids[-1]
+        if progress:
+            progress(archived)
+    return archived
+
+
+def ordering_key(ordering):
+    fields = [(name.lstrip('-'), name.startswith('-')) for name in ordering]
+
+    def compare(first, second):
+        for field, descending in fields:
+            a, b = getattr(first, field), getattr(second, field)
+            if a != b:
+                return 1 if (a > b) != descending else -1
+        return 0
+    return cmp_to_key(compare)
+
+
+class ArchiveUnion:
+    """
+    Заказы вместе с архивом для постраничного вывода: filter / order_by
+    применяются к обоим queryset, а срез берет начало каждого и сливает
+    результаты в порядке сортировки. Поддерживает ровно то, что нужно
+    KeysetPagination и сериализатору списка.
+    """
+
+    def __init__(self, *querysets, ordering=()):
+        self.querysets = querysets
+        self.ordering = ordering
+        self.model = querysets[0].model
+
+    @property
+    def query(self):
+        """Запрос первой части: аннотации и поля у частей совпадают (нужно KeysetPagination)."""
+        return self.querysets[0].query
+
+    def filter(self, *args, **kwargs):
+        return ArchiveUnion(*(queryset.filter(*args, **kwargs) for queryset in self.querysets), ordering=self.ordering)
+
+    def order_by(self, *ordering):
+        return ArchiveUnion(*(queryset.order_by(*ordering) for queryset in self.querysets), ordering=ordering)
+
+    def __getitem__(self, item):
+        if not isinstance(item, slice) or item.start or item.step or item.stop is None:
+            raise TypeError('ArchiveUnion поддерживает только срез [:n]')
+        return self.merge(queryset[:item.stop] for queryset in self.querysets)[:item.stop]
+
+    def __iter__(self):
+        return iter(self.merge(self.querysets))
+
+    def merge(self, parts):
+        rows = [row for part in parts for row in part]
+        if self.ordering:
+            rows.sort(key=ordering_key(self.ordering))
+        return rows
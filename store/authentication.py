@@ -0,0 +1,210 @@
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+SHARED_KEY_PREFIX = 'store:token'
+
+
+def token_cache_settings():
+    options = {'MAX_SIZE': 10000, 'TTL': 30, 'SHARED_CACHE': None, 'SHARED_TTL': 300}
+    options.update(getattr(settings, 'STORE_TOKEN_CACHE', {}))
+    return options
+
+
+class TokenUserCache:
+    """
+    Ограниченный LRU кэш токен -> (снимок пользователя, версия) с временем
+    жизни записей. Потокобезопасный; помнит токены каждого пользователя,
+    чтобы сбрасывать их разом.
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._user_keys = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            user, version, expires_at = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return user, version
+
+    def set(self, key, user, version=None):
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (user, version, time.monotonic() + self.ttl)
+            self._user_keys.setdefault(user.pk, set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            for key in list(self._user_keys.get(user_id, ())):
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._user_keys.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        keys = self._user_keys.get(entry[0].pk)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._user_keys[entry[0].pk]
+
+
+_options = token_cache_settings()
+local_cache = TokenUserCache(_options['MAX_SIZE'], _options['TTL'])
+
+
+def shared_cache():
+    alias = token_cache_settings()['SHARED_CACHE']
+    return caches[alias] if alias else None
+
+
+def shared_key(key):
+    return f'{SHARED_KEY_PREFIX}:{hashlib.sha256(key.encode("utf-8")).hexdigest()}'
+
+
+def version_key(user_id):
+    return f'{SHARED_KEY_PREFIX}:version:{user_id}'
+
+
+def user_version(cache, user_id):
+    """
+    Версия токенов пользователя в общем кэше. Если счетчика нет (еще не
+    создан или вытеснен), он начинается с текущего времени в миллисекундах,
+    чтобы не совпасть ни с одной версией, под которой уже лежат снимки.
+    """
+    key = version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, int(time.time() * 1000), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def _bump_version(user_id):
+    cache = shared_cache()
+    if cache is None:
+        return
+    key = version_key(user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, int(time.time() * 1000), timeout=None)
+
+
+def invalidate_user(user_id, using=None):
+    """
+    Сбрасывает снимки пользователя: в локальном кэше процесса и сдвигом его
+    версии в общем кэше, после чего локальные записи других процессов и
+    общие снимки с прежней версией не принимаются. Сброс выполняется сразу и
+    еще раз после коммита: иначе снимок, прочитанный параллельным запросом
+    до коммита, остался бы в кэше.
+    """
+
+    def invalidate():
+        local_cache.invalidate_user(user_id)
+        _bump_version(user_id)
+
+    invalidate()
+    transaction.on_commit(invalidate, using=using)
+
+
+def invalidate_token(key, user_id, using=None):
+    """Сбрасывает снимки токена `key` пользователя `user_id` (см. invalidate_user)."""
+
+    def invalidate():
+        local_cache.invalidate(key)
+        _bump_version(user_id)
+
+    invalidate()
+    transaction.on_commit(invalidate, using=using)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication без запроса к базе на каждый запрос.
+
+    Снимок пользователя хранится в LRU кэше процесса (`STORE_TOKEN_CACHE`:
+    `MAX_SIZE`, `TTL`) и, если задан `SHARED_CACHE`, в общем кэше Django.
+    Удаление токена и сохранение пользователя (например, смена `is_active`
+    или `is_staff`) сбрасывают записи сигналами. С общим кэшем каждая
+    запись помнит версию токенов пользователя и при попадании сверяется с
+    текущей (один запрос к общему кэшу вместо запроса к базе), поэтому сброс
+    виден всем процессам сразу; без общего кэша локальная запись в других
+    процессах живет не дольше `TTL`.
+    """
+
+    def authenticate_credentials(self, key):
+        cache = shared_cache()
+        user = self.get_local(cache, key)
+        if user is None:
+            user, version = self.get_shared(cache, key)
+            if user is None:
+                user, _ = super().authenticate_credentials(key)
+                version = self.set_shared(cache, key, user)
+            local_cache.set(key, user, version)
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed('User inactive or deleted.')
+        user = copy.copy(user)
+        return user, Token(key=key, user=user)
+
+    @staticmethod
+    def get_local(cache, key):
+        entry = local_cache.get(key)
+        if entry is None:
+            return None
+        user, version = entry
+        if cache is not None and version != user_version(cache, user.pk):
+            local_cache.invalidate(key)
+            return None
+        return user
+
+    @staticmethod
+    def get_shared(cache, key):
+        entry = cache.get(shared_key(key)) if cache is not None else None
+        if entry is None:
+            return None, None
+        user, version = entry
+        if version != user_version(cache, user.pk):
+            return None, None
+        return user, version
+
+    @staticmethod
+    def set_shared(cache, key, user):
+        if cache is None:
+            return None
+        version = user_version(cache, user.pk)
+        cache.set(shared_key(key), (user, version), token_cache_settings()['SHARED_TTL'])
+        return version
@@ -0,0 +1,450 @@
+import asyncio
+import http.client
+import io
+import json
+import math
+import random
+import re
+import subprocess
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from urllib.parse import unquote, urlsplit
+
+from django.contrib.auth import get_user_model
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from .models import Order, Product, ProductCollection, ProductReview
+
+MODES = ('wsgi', 'asgi', 'http')
+DEFAULT_HOST = '127.0.0.1:8000'
+DETAIL_PATH = re.compile(r'^/api/v1/(?P<resource>[\w-]+)/(?P<id>\d+)/')
+ID_FIELDS = ('product', 'product_id')
+RESOURCES = {
+    'products': Product,
+    'product-collections': ProductCollection,
+    'product-reviews': ProductReview,
+    'orders': Order,
+}
+OWNED_RESOURCES = ('product-reviews', 'orders')
+ID_SAMPLE_SIZE = 10000
+
+
+class Scenario:
+    """Один запрос из `requests.http`: имя (комментарий перед запросом), метод, путь, заголовки и тело."""
+
+    def __init__(self, name, method, path, headers, body, weight=1):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.headers = headers
+        self.body = body
+        self.weight = weight
+
+    @property
+    def token(self):
+        value = self.headers.get('Authorization', '')
+        return value[len('Token '):] if value.startswith('Token ') else None
+
+
+def parse_http_file(text):
+    """
+    Разбирает файл в формате HTTP клиента IDE: запросы разделены строками `###`,
+    комментарий перед запросом задает имя сценария, `# @weight N` - его вес.
+    """
+    scenarios = []
+    for block in re.split(r'^###.*$', text, flags=re.M):
+        name, weight, request_line = None, 1, None
+        headers = {}
+        body = None
+        for line in block.splitlines():
+            stripped = line.strip()
+            if request_line is None:
+                weight_match = re.match(r'^(?:#|//)\s*@weight\s+(\d+)$', stripped)
+                if weight_match:
+                    weight = int(weight_match.group(1))
+                elif stripped.startswith(('#', '//')):
+                    name = name or stripped.lstrip('#/').strip()
+                elif stripped:
+                    request_line = stripped
+            elif body is None:
+                if stripped:
+                    header, _, value = stripped.partition(':')
+                    headers[header.strip()] = value.strip()
+                else:
+                    body = []
+            else:
+                body.append(line)
+        if request_line is None:
+            continue
+        method, url = request_line.split()[:2]
+        parts = urlsplit(url)
+        path = parts.path + (f'?{parts.query}' if parts.query else '')
+        content = '\n'.join(body or []).strip() or None
+        scenarios.append(Scenario(name or f'{method} {parts.path}', method.upper(), path, headers, content, weight))
+    return scenarios
+
+
+def ensure_tokens(scenarios, admin_token, using='default'):
+    """
+    Создает пользователей для токенов из сценариев: токен `admin_token`
+    принадлежит администратору, остальные - обычным пользователям.
+    Возвращает словарь токен -> ID пользователя.
+    """
+    User = get_user_model()
+    users = {}
+    for key in sorted({scenario.token for scenario in scenarios if scenario.token}):
+        token = Token.objects.using(using).select_related('user').filter(key=key).first()
+        if token is None:
+            user = User.objects.db_manager(using).create_user(f'bench_{key[:8]}', is_staff=key == admin_token)
+            token = Token.objects.using(using).create(key=key, user=user)
+        users[key] = token.user_id
+    return users
+
+
+class IdPool:
+    """
+    Существующие ID объектов для подстановки в пути и тела запросов.
+    Заказы и отзывы выбираются среди объектов пользователя, от имени которого идет запрос.
+    """
+
+    def __init__(self, rng, using='default'):
+        self.rng = rng
+        self.using = using
+        self.cache = {}
+
+    def pick(self, resource, user_id=None):
+        key = (resource, user_id if resource in OWNED_RESOURCES else None)
+        if key not in self.cache:
+            queryset = RESOURCES[resource].objects.using(self.using)
+            if key[1] is not None:
+                queryset = queryset.filter(user_id=key[1])
+            self.cache[key] = list(queryset.order_by('-id').values_list('id', flat=True)[:ID_SAMPLE_SIZE])
+        ids = self.cache[key]
+        return self.rng.choice(ids) if ids else None
+
+
+class PreparedRequest:
+
+    def __init__(self, name, method, path, headers, body):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.headers = headers
+        self.body = body
+
+
+def prepare(scenario, ids, users):
+    """Подставляет в сценарий существующие ID продуктов, подборок, заказов и отзывов."""
+    user_id = users.get(scenario.token)
+    path = scenario.path
+    match = DETAIL_PATH.match(path)
+    if match and match.group('resource') in RESOURCES:
+        object_id = ids.pick(match.group('resource'), user_id)
+        if object_id is not None:
+            path = f"{path[:match.start('id')]}{object_id}{path[match.end('id'):]}"
+    body = scenario.body
+    if body is not None:
+        try:
+            body = json.dumps(replace_ids(json.loads(body), ids))
+        except ValueError:
+            pass
+    return PreparedRequest(scenario.name, scenario.method, path, scenario.headers,
+                           body.encode('utf-8') if body is not None else b'')
+
+
+def replace_ids(data, ids):
+    if isinstance(data, list):
+        return [replace_ids(item, ids) for item in data]
+    if isinstance(data, dict):
+        result = {}
+        for key, value in data.items():
+            if key in ID_FIELDS and isinstance(value, int):
+                value = ids.pick('products') or value
+            result[key] = replace_ids(value, ids)
+        return result
+    return data
+
+
+def build_plan(scenarios, total, seed, ids, users):
+    """Последовательность запросов с учетом весов сценариев; при одном `seed` она одинакова."""
+    rng = random.Random(seed)
+    chosen = rng.choices(scenarios, weights=[scenario.weight for scenario in scenarios], k=total)
+    return [prepare(scenario, ids, users) for scenario in chosen]
+
+
+def wsgi_environ(request, host):
+    path, _, query = request.path.partition('?')
+    server_name, _, port = host.partition(':')
+    environ = {
+        'REQUEST_METHOD': request.method,
+        'SCRIPT_NAME': '',
+        'PATH_INFO': unquote(path),
+        'QUERY_STRING': query,
+        'SERVER_NAME': server_name,
+        'SERVER_PORT': port or '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'REMOTE_ADDR': '127.0.0.1',
+        'CONTENT_LENGTH': str(len(request.body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(request.body),
+        'wsgi.errors': io.StringIO(),
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+        'HTTP_HOST': host,
+    }
+    for name, value in request.headers.items():
+        name = name.upper().replace('-', '_')
+        if name == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+        else:
+            environ[f'HTTP_{name}'] = value
+    return environ
+
+
+def wsgi_sender(host):
+    app = WSGIHandler()
+
+    def send(request):
+        status = []
+        result = app(wsgi_environ(request, host), lambda value, headers, exc_info=None: status.append(value))
+        try:
+            for _ in result:
+                pass
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        return int(status[0].split()[0])
+
+    return send
+
+
+def asgi_sender(host):
+    app = ASGIHandler()
+    server_name, _, port = host.partition(':')
+
+    async def send(request):
+        path, _, query = request.path.partition('?')
+        headers = [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in request.headers.items()]
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': request.method,
+            'scheme': 'http',
+            'path': unquote(path),
+            'raw_path': path.encode('latin-1'),
+            'query_string': query.encode('latin-1'),
+            'root_path': '',
+            'headers': headers + [(b'host', host.encode('latin-1')),
+                                  (b'content-length', str(len(request.body)).encode('latin-1'))],
+            'client': ('127.0.0.1', 0),
+            'server': (server_name, int(port or 80)),
+        }
+        status = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': request.body, 'more_body': False}
+
+        async def send_message(message):
+            if message['type'] == 'http.response.start':
+                status.append(message['status'])
+
+        await app(scope, receive, send_message)
+        return status[0]
+
+    return send
+
+
+def http_sender(host):
+    server_name, _, port = host.partition(':')
+
+    def send(request):
+        connection = http.client.HTTPConnection(server_name, int(port or 80), timeout=60)
+        try:
+            connection.request(request.method, request.path, body=request.body or None, headers=request.headers)
+            response = connection.getresponse()
+            response.read()
+            return response.status
+        finally:
+            connection.close()
+
+    return send
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+
+@contextmanager
+def local_server():
+    """Многопоточный WSGI сервер Django на свободном порту; отдает адрес `host:port`."""
+    server = ThreadedWSGIServer(('127.0.0.1', 0), QuietRequestHandler, allow_reuse_address=False)
+    server.set_app(WSGIHandler())
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield '%s:%s' % server.server_address[:2]
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+
+def run_sync(send, plan, concurrency):
+    """Выполняет план в `concurrency` потоках; возвращает (замеры, время прогона)."""
+    samples = []
+    lock = threading.Lock()
+    requests = iter(plan)
+
+    def worker():
+        while True:
+            with lock:
+                request = next(requests, None)
+            if request is None:
+                return
+            start = time.perf_counter()
+            try:
+                status = send(request)
+            except Exception:
+                status = 0
+            duration = time.perf_counter() - start
+            with lock:
+                samples.append((request.name, status, duration))
+
+    start = time.perf_counter()
+    if concurrency == 1:
+        worker()
+    else:
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    return samples, time.perf_counter() - start
+
+
+def run_async(send, plan, concurrency):
+    samples = []
+    requests = iter(plan)
+
+    async def worker():
+        for request in requests:
+            start = time.perf_counter()
+            try:
+                status = await send(request)
+            except Exception:
+                status = 0
+            samples.append((request.name, status, time.perf_counter() - start))
+
+    async def main():
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    start = time.perf_counter()
+    asyncio.run(main())
+    return samples, time.perf_counter() - start
+
+
+def run_mode(mode, plan, concurrency, host=DEFAULT_HOST, base_url=None):
+    if mode == 'wsgi':
+        return run_sync(wsgi_sender(host), plan, concurrency)
+    if mode == 'asgi':
+        return run_async(asgi_sender(host), plan, concurrency)
+    if base_url:
+        return run_sync(http_sender(urlsplit(base_url).netloc), plan, concurrency)
+    with local_server() as address:
+        return run_sync(http_sender(address), plan, concurrency)
+
+
+def percentile(values, fraction):
+    """Перцентиль по методу ближайшего ранга для отсортированного списка."""
+    if not values:
+        return None
+    return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+
+def summarize(samples, elapsed):
+    """Запросы в секунду и перцентили задержки (мс) в целом и по каждому сценарию."""
+    by_name = defaultdict(list)
+    statuses = defaultdict(Counter)
+    for name, status, duration in samples:
+        by_name[name].append(duration * 1000)
+        statuses[name][str(status)] += 1
+    endpoints = {}
+    for name, durations in by_name.items():
+        durations.sort()
+        endpoints[name] = {
+            'requests': len(durations),
+            'rps': round(len(durations) / elapsed, 2),
+            'mean_ms': round(sum(durations) / len(durations), 3),
+            'p50_ms': round(percentile(durations, 0.50), 3),
+            'p95_ms': round(percentile(durations, 0.95), 3),
+            'p99_ms': round(percentile(durations, 0.99), 3),
+            'statuses': dict(statuses[name]),
+        }
+    durations = sorted(duration * 1000 for _, _, duration in samples)
+    return {
+        'requests': len(samples),
+        'elapsed_s': round(elapsed, 3),
+        'rps': round(len(samples) / elapsed, 2) if elapsed else 0.0,
+        'p50_ms': round(percentile(durations, 0.50), 3) if durations else None,
+        'p95_ms': round(percentile(durations, 0.95), 3) if durations else None,
+        'p99_ms': round(percentile(durations, 0.99), 3) if durations else None,
+        'errors': sum(1 for _, status, _ in samples if not status or status >= 500),
+        'endpoints': endpoints,
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(scenarios, modes, concurrency_levels, total, seed, admin_token, host=DEFAULT_HOST,
+                  base_url=None, using='default'):
+    """
+    Прогоняет сценарии во всех режимах и при всех уровнях конкурентности.
+    План запросов строится один раз, поэтому режимы сравниваются на одинаковой нагрузке
+    (запросы на запись меняют данные, так что повторные прогоны видят уже измененную базу).
+    """
+    users = ensure_tokens(scenarios, admin_token, using=using)
+    plan = build_plan(scenarios, total, seed, IdPool(random.Random(seed), using=using), users)
+    runs = []
+    for mode in modes:
+        for concurrency in concurrency_levels:
+            samples, elapsed = run_mode(mode, plan, concurrency, host=host, base_url=base_url)
+            runs.append({'mode': mode, 'concurrency': concurrency, **summarize(samples, elapsed)})
+    return {
+        'revision': git_revision(),
+        'created_at': timezone.now().isoformat(),
+        'seed': seed,
+        'requests_per_run': total,
+        'runs': runs,
+    }
+
+
+def compare_runs(previous, current):
+    """Строки сравнения p95 и rps с прошлым прогоном: (режим, конкурентность, сценарий, было, стало)."""
+    old_runs = {(run['mode'], run['concurrency']): run for run in previous['runs']}
+    rows = []
+    for run in current['runs']:
+        old = old_runs.get((run['mode'], run['concurrency']))
+        if old is None:
+            continue
+        for name, stats in run['endpoints'].items():
+            old_stats = old['endpoints'].get(name)
+            if old_stats is not None:
+                rows.append((run['mode'], run['concurrency'], name, old_stats, stats))
+    return rows
@@ -0,0 +1,174 @@
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+from .routing import current_read_database
+
+KEY_PREFIX = 'store:response'
+STATS_KEYS = {'hits': f'{KEY_PREFIX}:stats:hits', 'misses': f'{KEY_PREFIX}:stats:misses'}
+CACHED_HEADERS = ('ETag', 'Last-Modified')
+
+
+def cache_settings():
+    options = {'ENABLED': True, 'CACHE': 'default', 'TIMEOUT': 300}
+    options.update(getattr(settings, 'STORE_RESPONSE_CACHE', {}))
+    return options
+
+
+def get_cache():
+    return caches[cache_settings()['CACHE']]
+
+
+def generation_key(label):
+    return f'{KEY_PREFIX}:generation:{label}'
+
+
+def get_generations(labels):
+    """
+    Текущие поколения моделей. Если счетчика нет в кэше (еще не создан
+    или вытеснен), он начинается с текущего времени в миллисекундах,
+    чтобы не совпасть ни с одним поколением, под которым уже лежат ответы.
+    """
+    cache = get_cache()
+    keys = [generation_key(label) for label in labels]
+    generations = cache.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            cache.add(key, int(time.time() * 1000), timeout=None)
+            generations[key] = cache.get(key)
+    return [generations[key] for key in keys]
+
+
+def bump_generation(label):
+    """
+    Сдвигает поколение модели, после чего все закэшированные ответы,
+    зависящие от нее, перестают находиться по ключу и вытесняются по таймауту.
+    Поколение сдвигается сразу и еще раз после коммита: иначе ответ,
+    собранный параллельным запросом из данных до коммита, остался бы в кэше.
+    """
+    _bump(label)
+    transaction.on_commit(lambda: _bump(label))
+
+
+def _bump(label):
+    cache = get_cache()
+    key = generation_key(label)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, int(time.time() * 1000), timeout=None)
+
+
+def _count(name):
+    cache = get_cache()
+    key = STATS_KEYS[name]
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=None)
+
+
+def get_stats():
+    values = get_cache().get_many(list(STATS_KEYS.values()))
+    stats = {name: values.get(key, 0) for name, key in STATS_KEYS.items()}
+    total = stats['hits'] + stats['misses']
+    stats['hit_ratio'] = stats['hits'] / total if total else 0.0
+    return stats
+
+
+def reset_stats():
+    get_cache().delete_many(list(STATS_KEYS.values()))
+
+
+def normalized_query(request):
+    return urlencode(sorted(request.GET.lists()), doseq=True)
+
+
+class CachedResponseMixin:
+    """
+    Кэширует отрендеренные ответы list / retrieve для анонимных пользователей.
+
+    Ключ - имя вьюсета, действие, поколения моделей из `cache_dependencies`,
+    схема и хост (в ответе абсолютные ссылки next / previous), путь,
+    нормализованная строка запроса и формат ответа. Поколения сдвигаются
+    сигналами при изменении моделей, поэтому устаревшие ответы не отдаются.
+    На попадании в кэш запросов к базе нет, условные заголовки берутся из записи.
+    Ответ, прочитанный с реплики, не кэшируется: отставание реплики иначе
+    сохранилось бы под новым поколением на весь TIMEOUT.
+    """
+    cache_dependencies = ()
+    cached_actions = ('list', 'retrieve')
+
+    def response_cache_enabled(self, request):
+        return (
+            cache_settings()['ENABLED']
+            and self.action in self.cached_actions
+            and not request.user.is_authenticated
+        )
+
+    def get_response_cache_key(self, request):
+        generations = get_generations(self.cache_dependencies)
+        renderer = request.accepted_renderer
+        source = '|'.join([request.scheme, request.get_host(), request.path, normalized_query(request),
+                           renderer.format, request.accepted_media_type])
+        digest = hashlib.md5(source.encode('utf-8')).hexdigest()
+        version = '.'.join(str(generation) for generation in generations)
+        return f'{KEY_PREFIX}:{self.basename}:{self.action}:{version}:{digest}'
+
+    def cached_response(self, request, handler, *args, **kwargs):
+        if not self.response_cache_enabled(request):
+            return handler(request, *args, **kwargs)
+        cache = get_cache()
+        key = self.get_response_cache_key(request)
+        entry = cache.get(key)
+        if entry is not None:
+            _count('hits')
+            return self.response_from_entry(request, entry)
+
+        _count('misses')
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200 and current_read_database() is None:
+            timeout = cache_settings()['TIMEOUT']
+            response.add_post_render_callback(
+                lambda rendered: cache.set(key, self.entry_from_response(rendered), timeout)
+            )
+        response['X-Cache'] = 'MISS'
+        return response
+
+    @staticmethod
+    def entry_from_response(response):
+        return {
+            'content': response.content,
+            'content_type': response['Content-Type'],
+            'headers': {name: response[name] for name in CACHED_HEADERS if response.has_header(name)},
+        }
+
+    @staticmethod
+    def response_from_entry(request, entry):
+        headers = entry['headers']
+        last_modified = headers.get('Last-Modified')
+        response = get_conditional_response(
+            request,
+            etag=headers.get('ETag'),
+            last_modified=parse_http_date_safe(last_modified) if last_modified else None,
+        )
+        if response is None:
+            response = HttpResponse(entry['content'], content_type=entry['content_type'])
+        for name, value in headers.items():
+            response[name] = value
+        response['X-Cache'] = 'HIT'
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request, super().retrieve, *args, **kwargs)
+
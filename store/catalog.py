@@ -0,0 +1,180 @@
+import csv
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.db import connections, transaction
+from django.utils import timezone
+
+from . import search
+from .cache import bump_generation
+from .models import Product
+
+FIELDS = ('sku', 'name', 'description', 'price')
+FORMATS = ('jsonl', 'csv')
+CONTENT_TYPES = {
+    'jsonl': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+MAX_ERRORS = 100
+
+
+class ImportResult:
+
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.failed = 0
+        self.errors = []
+
+    def add_error(self, line, message):
+        self.failed += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append({'line': line, 'error': message})
+
+    def as_dict(self):
+        return {
+            'created': self.created,
+            'updated': self.updated,
+            'unchanged': self.unchanged,
+            'failed': self.failed,
+            'errors': self.errors,
+        }
+
+
+def format_from_name(name, default='jsonl'):
+    for fmt in FORMATS:
+        if name.endswith(f'.{fmt}'):
+            return fmt
+    return default
+
+
+def read_rows(lines, fmt):
+    """
+    Построчно читает каталог из итератора строк (str или bytes)
+    и отдает пары (номер строки, dict). Файл целиком в память не загружается.
+    """
+    lines = (line.decode('utf-8') if isinstance(line, bytes) else line for line in lines)
+    if fmt == 'csv':
+        reader = csv.DictReader(lines)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as exc:
+            yield number, exc
+            continue
+        yield number, row
+
+
+def clean_row(row):
+    if isinstance(row, Exception):
+        raise ValueError(f'некорректный JSON: {row}')
+    if not isinstance(row, dict):
+        raise ValueError('строка должна быть объектом')
+    sku = str(row.get('sku') or '').strip()
+    name = str(row.get('name') or '').strip()
+    if not sku:
+        raise ValueError('не указан артикул (sku)')
+    if len(sku) > Product._meta.get_field('sku').max_length:
+        raise ValueError('слишком длинный артикул')
+    if not name or len(name) > Product._meta.get_field('name').max_length:
+        raise ValueError('название должно быть непустым и не длиннее 200 символов')
+    try:
+        price = Decimal(str(row.get('price'))).quantize(Decimal('0.01'))
+    except (InvalidOperation, ValueError):
+        raise ValueError('некорректная цена')
+    if price.is_nan() or price < 0 or price.adjusted() >= 8:
+        raise ValueError('некорректная цена')
+    return {'sku': sku, 'name': name, 'description': str(row.get('description') or ''), 'price': price}
+
+
+def import_products(rows, chunk_size=5000, using='default'):
+    """
+    Загружает продукты из итератора `read_rows` порциями по `chunk_size`.
+    Ключ - артикул: существующие продукты обновляются через bulk_update
+    (только если что-то изменилось), новые создаются через bulk_create.
+    Каждая порция сохраняется в отдельной транзакции.
+    """
+    result = ImportResult()
+    chunk = {}
+    for number, row in rows:
+        try:
+            data = clean_row(row)
+        except ValueError as exc:
+            result.add_error(number, str(exc))
+            continue
+        chunk[data['sku']] = data
+        if len(chunk) >= chunk_size:
+            _import_chunk(chunk, result, using)
+            chunk = {}
+    if chunk:
+        _import_chunk(chunk, result, using)
+    return result
+
+
+def _import_chunk(chunk, result, using):
+    products = Product.objects.using(using)
+    now = timezone.now()
+    with transaction.atomic(using=using):
+        existing = products.filter(sku__in=list(chunk)).only('id', *FIELDS).in_bulk(field_name='sku')
+        to_update = []
+        to_create = []
+        for sku, data in chunk.items():
+            product = existing.get(sku)
+            if product is None:
+                to_create.append(Product(**data))
+            elif any(getattr(product, field) != data[field] for field in FIELDS):
+                for field in FIELDS:
+                    setattr(product, field, data[field])
+                product.updated_at = now
+                to_update.append(product)
+            else:
+                result.unchanged += 1
+        if to_update:
+            products.bulk_update(to_update, ['name', 'description', 'price', 'updated_at'])
+        if to_create:
+            products.bulk_create(to_create)
+            if not connections[using].features.can_return_rows_from_bulk_insert:
+                ids = dict(products.filter(sku__in=[p.sku for p in to_create]).values_list('sku', 'id'))
+                for product in to_create:
+                    product.id = ids[product.sku]
+        search.update_index([product.id for product in to_update + to_create], using=using)
+    if to_update or to_create:
+        bump_generation('store.product')
+    result.created += len(to_create)
+    result.updated += len(to_update)
+
+
+class Echo:
+    """Объект-заглушка для csv.writer: возвращает записанную строку вместо буферизации."""
+
+    def write(self, value):
+        return value
+
+
+def export_rows(queryset, fmt, chunk_size=2000):
+    """
+    Строки выгрузки каталога. Продукты читаются итератором (на PostgreSQL -
+    серверным курсором), поэтому память не зависит от размера каталога.
+    """
+    rows = queryset.order_by('id').values_list('id', *FIELDS).iterator(chunk_size=chunk_size)
+    if fmt == 'csv':
+        writer = csv.writer(Echo())
+        yield writer.writerow(('id',) + FIELDS)
+        for row in rows:
+            yield writer.writerow(row)
+        return
+    for product_id, sku, name, description, price in rows:
+        yield json.dumps({
+            'id': product_id,
+            'sku': sku,
+            'name': name,
+            'description': description,
+            'price': str(price),
+        }, ensure_ascii=False) + '\n'
@@ -0,0 +1,68 @@
+import hashlib
+
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+class ConditionalGetMixin:
+    """
+    Условные запросы для list / retrieve (ETag, Last-Modified, 304).
+
+    Валидаторы считаются одним агрегирующим запросом по отфильтрованному
+    queryset: COUNT и MAX(updated_at), а также MAX по связанным меткам
+    времени из `conditional_fields` (например, для вложенных продуктов) и
+    число связанных строк из `conditional_counts`: удаление связанного объекта
+    не меняет ни одной метки времени, но меняет это число. Сериализация при этом не выполняется. В ETag входит полный путь с
+    параметрами запроса, поэтому разные фильтры и страницы не смешиваются.
+    """
+    conditional_fields = ('updated_at',)
+    conditional_counts = ()
+
+    def get_validators(self, queryset):
+        aggregates = {f'last_{index}': Max(field) for index, field in enumerate(self.conditional_fields)}
+        aggregates.update({f'count_{index}': Count(field) for index, field in enumerate(self.conditional_counts)})
+        values = queryset.order_by().aggregate(count=Count('pk', distinct=True), **aggregates)
+        timestamps = [values[f'last_{index}'] for index in range(len(self.conditional_fields))]
+        timestamps = [timestamp for timestamp in timestamps if timestamp is not None]
+        last_modified = max(timestamps) if timestamps else None
+
+        key = '|'.join([
+            self.request.get_full_path(),
+            self.request.accepted_renderer.format,
+            str(values['count']),
+            *(str(values[f'count_{index}']) for index in range(len(self.conditional_counts))),
+            *(timestamp.isoformat() for timestamp in timestamps),
+        ])
+        etag = quote_etag(hashlib.md5(key.encode('utf-8')).hexdigest())
+        return etag, last_modified
+
+    def conditional_response(self, request, validators, handler, *args, **kwargs):
+        etag, last_modified = validators
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if timestamp is not None:
+                response['Last-Modified'] = http_date(timestamp)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        validators = self.get_validators(self.filter_queryset(self.get_queryset()))
+        return self.conditional_response(request, validators, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            queryset = self.filter_queryset(self.get_queryset()).filter(
+                **{self.lookup_field: kwargs[lookup_url_kwarg]}
+            )
+            etag, last_modified = self.get_validators(queryset)
+        except (TypeError, ValueError, ValidationError):
+            return super().retrieve(request, *args, **kwargs)
+        if last_modified is None:
+            return super().retrieve(request, *args, **kwargs)
+        return self.conditional_response(request, (etag, last_modified), super().retrieve, *args, **kwargs)
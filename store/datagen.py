@@ -0,0 +1,303 @@
+import multiprocessing
+import random
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+from functools import lru_cache
+from itertools import accumulate
+
+import django
+from django.contrib.auth import get_user_model
+from django.core.management.color import no_style
+from django.db import connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from . import search
+from .analytics import rebuild_sales_stats
+from .models import Order, OrderStatusChoices, Product, ProductCollection, ProductOrderPosition, ProductReview
+from .ratings import rebuild_ratings
+from .sharding import assign_ids, reserve_block, shard_for_user, sharding_enabled, sync_sequences
+
+STATUS_WEIGHTS = ((OrderStatusChoices.NEW, 10), (OrderStatusChoices.IN_PROGRESS, 15), (OrderStatusChoices.DONE, 75))
+GRADES = (1, 2, 3, 3, 4, 4, 5, 5, 5, 5)
+
+
+class Skewed:
+    """
+    Выборка ID по закону Ципфа: объект ранга k выбирается с весом 1 / k^s.
+    Ранги сопоставлены ID случайной перестановкой, поэтому популярные
+    объекты разбросаны по всему диапазону, а не собраны в начале.
+    """
+
+    def __init__(self, ids, skew, seed, name):
+        self.ids = list(ids)
+        rng = random.Random(f'{seed}:{name}:permutation')
+        rng.shuffle(self.ids)
+        self.cum_weights = list(accumulate(1 / rank ** skew for rank in range(1, len(self.ids) + 1)))
+
+    def pick(self, rng):
+        return self.ids[bisect_left(self.cum_weights, rng.random() * self.cum_weights[-1])]
+
+
+@lru_cache(maxsize=8)
+def skewed(first_id, count, extra, skew, seed, name):
+    return Skewed(list(range(first_id, first_id + count)) + list(extra), skew, seed, name)
+
+
+def product_price(plan, product_id):
+    """Цена продукта зависит только от его номера и seed, поэтому позиции заказов не читают продукты из базы."""
+    number = product_id - plan.first_ids['products']
+    return Decimal((number * 2654435761 + plan.seed * 40503) % 500000 + 100) / 100
+
+
+def mix(*values):
+    result = 0
+    for value in values:
+        result = (result * 1000003 + value) & 0xFFFFFFFF
+    return result
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """Временно отключает auto_now / auto_now_add, чтобы сохранить сгенерированные даты."""
+    fields = [field for model in models for field in model._meta.concrete_fields
+              if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Plan:
+    """Параметры генерации и диапазоны ID, общие для всех порций и процессов."""
+
+    def __init__(self, users, products, reviews, orders, collections, seed=0, skew=1.1, days=365, positions=3,
+                 collection_size=20, owners=(), using='default'):
+        self.users = users
+        self.products = products
+        self.reviews = reviews
+        self.orders = orders
+        self.collections = collections
+        self.seed = seed
+        self.skew = skew
+        self.days = days
+        self.positions = positions
+        self.collection_size = collection_size
+        self.owners = tuple(owners)
+        self.using = using
+        self.end = timezone.now().replace(microsecond=0)
+        self.sharded = sharding_enabled()
+        self.first_ids = {
+            'users': next_id(get_user_model(), using),
+            'products': next_id(Product, using),
+            'orders': reserve_block(Order, orders)[0] if self.sharded and orders else next_id(Order, using),
+            'collections': next_id(ProductCollection, using),
+        }
+
+    @property
+    def start(self):
+        return self.end - timedelta(days=self.days)
+
+    def moment(self, value):
+        return self.start + timedelta(seconds=value % (self.days * 86400 or 1))
+
+    def user_picker(self):
+        if not self.users and not self.owners:
+            return None
+        return skewed(self.first_ids['users'], self.users, self.owners, self.skew, self.seed, 'users')
+
+    def product_picker(self):
+        if not self.products:
+            return None
+        return skewed(self.first_ids['products'], self.products, (), self.skew, self.seed, 'products')
+
+
+def next_id(model, using):
+    return (model.objects.using(using).aggregate(value=Max('id'))['value'] or 0) + 1
+
+
+def make_users(plan, rng, offset, count):
+    User = get_user_model()
+    first = plan.first_ids['users'] + offset
+    User.objects.using(plan.using).bulk_create([
+        User(id=user_id, username=f'user_{user_id}', password='!', date_joined=plan.moment(rng.getrandbits(32)))
+        for user_id in range(first, first + count)
+    ])
+    return count
+
+
+def make_products(plan, rng, offset, count):
+    first = plan.first_ids['products'] + offset
+    products = []
+    for product_id in range(first, first + count):
+        created_at = plan.moment(rng.getrandbits(32))
+        products.append(Product(
+            id=product_id, name=f'Товар {product_id}', description=f'Описание товара {product_id}',
+            price=product_price(plan, product_id), created_at=created_at, updated_at=created_at,
+        ))
+    Product.objects.using(plan.using).bulk_create(products)
+    return count
+
+
+def make_reviews(plan, rng, offset, count):
+    """
+    Пары (пользователь, продукт) выбираются со смещением в сторону активных
+    пользователей и популярных продуктов. Оценка и дата зависят только от пары,
+    поэтому повторная пара из другой порции дает ту же строку и пропускается.
+    """
+    users, products = plan.user_picker(), plan.product_picker()
+    if users is None or products is None:
+        return 0
+    pairs = {(users.pick(rng), products.pick(rng)) for _ in range(count)}
+    reviews = []
+    for user_id, product_id in sorted(pairs):
+        key = mix(plan.seed, user_id, product_id)
+        created_at = plan.moment(key)
+        reviews.append(ProductReview(user_id=user_id, product_id=product_id, review=f'Отзыв {key}',
+                                     grade=GRADES[key % len(GRADES)], created_at=created_at, updated_at=created_at))
+    ProductReview.objects.using(plan.using).bulk_create(reviews, ignore_conflicts=True)
+    return len(reviews)
+
+
+def make_orders(plan, rng, offset, count):
+    """
+    При шардировании ID заказов берутся из блока IdSequence, зарезервированного
+    в Plan, заказ с позициями пишется на шард своего пользователя, а ID позиций
+    выдает IdAllocator.
+    """
+    users, products = plan.user_picker(), plan.product_picker()
+    if users is None or products is None:
+        return 0
+    first = plan.first_ids['orders'] + offset
+    statuses, status_weights = zip(*STATUS_WEIGHTS)
+    orders, positions = defaultdict(list), defaultdict(list)
+    for order_id in range(first, first + count):
+        size = min(plan.products, 1 + int(rng.expovariate(1 / max(plan.positions - 1, 0.001))))
+        items = {}
+        while len(items) < size:
+            items.setdefault(products.pick(rng), rng.randint(1, 5))
+        created_at = plan.moment(rng.getrandbits(32))
+        status = rng.choices(statuses, weights=status_weights)[0]
+        updated_at = created_at
+        if status != OrderStatusChoices.NEW:
+            updated_at = min(plan.end, created_at + timedelta(hours=rng.randint(1, 72)))
+        user_id = users.pick(rng)
+        alias = shard_for_user(user_id) if plan.sharded else plan.using
+        total = Decimal(0)
+        for product_id, quantity in items.items():
+            price = product_price(plan, product_id)
+            total += price * quantity
+            positions[alias].append(ProductOrderPosition(order_id=order_id, product_id=product_id,
+                                                         quantity=quantity, unit_price=price))
+        orders[alias].append(Order(id=order_id, user_id=user_id, order_status=status, total=total,
+                                   created_at=created_at, updated_at=updated_at))
+    for alias in sorted(orders):
+        with transaction.atomic(using=alias):
+            Order.objects.using(alias).bulk_create(orders[alias])
+            ProductOrderPosition.objects.using(alias).bulk_create(assign_ids(positions[alias]))
+    return count
+
+
+def make_collections(plan, rng, offset, count):
+    products = plan.product_picker()
+    first = plan.first_ids['collections'] + offset
+    collections, links = [], []
+    Through = ProductCollection.products.through
+    for collection_id in range(first, first + count):
+        created_at = plan.moment(rng.getrandbits(32))
+        collections.append(ProductCollection(id=collection_id, title=f'Подборка {collection_id}',
+                                             text=f'Текст подборки {collection_id}',
+                                             created_at=created_at, updated_at=created_at))
+        if products is not None:
+            size = min(plan.products, rng.randint(1, 2 * plan.collection_size))
+            members = set()
+            while len(members) < size:
+                members.add(products.pick(rng))
+            links += [Through(productcollection_id=collection_id, product_id=product_id)
+                      for product_id in sorted(members)]
+    ProductCollection.objects.using(plan.using).bulk_create(collections)
+    Through.objects.using(plan.using).bulk_create(links)
+    return count
+
+
+GENERATORS = {
+    'users': make_users,
+    'products': make_products,
+    'reviews': make_reviews,
+    'orders': make_orders,
+    'collections': make_collections,
+}
+PHASES = (('users', 'products'), ('reviews', 'orders', 'collections'))
+
+
+def run_chunk(task):
+    """Генерирует одну порцию в отдельной транзакции. Seed порции зависит только от ее номера."""
+    plan, name, index, offset, count = task
+    rng = random.Random(f'{plan.seed}:{name}:{index}')
+    with explicit_timestamps(get_user_model(), Product, ProductReview, Order, ProductCollection):
+        with transaction.atomic(using=plan.using):
+            return name, GENERATORS[name](plan, rng, offset, count)
+
+
+def chunk_tasks(plan, name, chunk_size):
+    total = getattr(plan, name)
+    return [(plan, name, index, offset, min(chunk_size, total - offset))
+            for index, offset in enumerate(range(0, total, chunk_size))]
+
+
+def init_worker():
+    django.setup()
+
+
+def generate_store_data(users=1000, products=10000, reviews=50000, orders=50000, collections=100, seed=0, skew=1.1,
+                        days=365, positions=3, collection_size=20, owners=(), chunk_size=10000, workers=1,
+                        search_index=True, using='default', progress=None):
+    """
+    Заполняет базу синтетическими данными со смещенным распределением:
+    популярные продукты и активные пользователи выбираются по закону Ципфа (`skew`).
+    ID задаются явно диапазонами, поэтому порции независимы и при одном `seed`
+    дают одинаковые данные при любом числе процессов `workers`.
+    Возвращает количество созданных записей по таблицам.
+    """
+    plan = Plan(users, products, reviews, orders, collections, seed=seed, skew=skew, days=days, positions=positions,
+                collection_size=collection_size, owners=owners, using=using)
+    created = dict.fromkeys(GENERATORS, 0)
+    reviews_before = ProductReview.objects.using(using).count()
+    pool = None
+    if workers > 1 and connections[using].vendor != 'sqlite':
+        connections.close_all()
+        pool = multiprocessing.Pool(workers, initializer=init_worker)
+    try:
+        for phase in PHASES:
+            tasks = [task for name in phase for task in chunk_tasks(plan, name, chunk_size)]
+            results = pool.imap_unordered(run_chunk, tasks) if pool else map(run_chunk, tasks)
+            for name, count in results:
+                created[name] += count
+                if progress:
+                    progress(name, created[name])
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+
+    created['reviews'] = ProductReview.objects.using(using).count() - reviews_before
+
+    connection = connections[using]
+    statements = connection.ops.sequence_reset_sql(no_style(), [get_user_model(), Product, Order, ProductCollection])
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+    if plan.sharded:
+        sync_sequences()
+    rebuild_ratings(using=using)
+    rebuild_sales_stats(chunk_size=chunk_size, using=using)
+    if search_index:
+        search.rebuild_index(using=using)
+    return created
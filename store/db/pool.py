@@ -0,0 +1,262 @@
+import os
+import threading
+import time
+from collections import deque
+from functools import partial
+
+from ..instrumentation import current_metrics
+
+POOL_DEFAULTS = {
+    'MIN_SIZE': 0,
+    'MAX_SIZE': 10,
+    'TIMEOUT': 5.0,
+    'MAX_IDLE': 300.0,
+    'MAX_LIFETIME': 3600.0,
+    'CHECK_AFTER': 5.0,
+}
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class PooledConnection:
+    __slots__ = ('raw', 'created', 'last_used')
+
+    def __init__(self, raw, now):
+        self.raw = raw
+        self.created = now
+        self.last_used = now
+
+
+class ConnectionPool:
+    """
+    Пул соединений с базой, общий для всех потоков процесса.
+
+    Соединение берется из пула (последнее возвращенное, т.е. самое «теплое»)
+    или создается, если открыто меньше `max_size`; иначе checkout ждет
+    освобождения до `timeout` секунд и бросает PoolTimeout. Соединение,
+    пролежавшее без дела дольше `check_after` секунд, перед выдачей
+    проверяется `check`, сломанное закрывается и заменяется. Простаивающие
+    дольше `max_idle` секунд закрываются, пока открыто больше `min_size`;
+    старше `max_lifetime` секунд - закрываются при возврате. После fork
+    унаследованные соединения забываются без закрытия: сокеты принадлежат
+    родительскому процессу.
+    """
+
+    def __init__(self, check=None, min_size=0, max_size=10, timeout=5.0, max_idle=300.0, max_lifetime=3600.0,
+                 check_after=5.0, clock=time.monotonic):
+        self.check = check
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.check_after = check_after
+        self.clock = clock
+        self.condition = threading.Condition()
+        self.pid = os.getpid()
+        self.idle = deque()
+        self.busy = {}
+        self.opening = 0
+        self.counters = {'checkouts': 0, 'waits': 0, 'wait_time': 0.0, 'timeouts': 0, 'opened': 0, 'closed': 0}
+
+    @classmethod
+    def from_settings(cls, options, check=None):
+        options = {**POOL_DEFAULTS, **options}
+        return cls(check=check, **{name.lower(): value for name, value in options.items()})
+
+    @property
+    def size(self):
+        return len(self.idle) + len(self.busy) + self.opening
+
+    def checkout(self, connect):
+        """Соединение из пула или новое от `connect()`; возвращает (соединение, время ожидания в секундах)."""
+        start = self.clock()
+        waited = 0.0
+        while True:
+            entry, stale, wait = self.acquire(start)
+            waited += wait
+            close_all(stale)
+            if entry is None:
+                try:
+                    entry = PooledConnection(connect(), self.clock())
+                except BaseException:
+                    self.release_slot()
+                    raise
+                with self.condition:
+                    self.counters['opened'] += 1
+            elif self.clock() - entry.last_used >= self.check_after and not self.is_healthy(entry.raw):
+                self.discard(entry)
+                continue
+            with self.condition:
+                self.opening -= 1
+                self.busy[id(entry.raw)] = entry
+                self.counters['checkouts'] += 1
+                self.counters['wait_time'] += waited
+            return entry.raw, waited
+
+    def acquire(self, start):
+        """Под блокировкой: свободное соединение из пула или None как разрешение открыть новое."""
+        wait = 0.0
+        with self.condition:
+            self.check_fork()
+            stale = self.evict()
+            while not self.idle and self.size >= self.max_size:
+                remaining = start + self.timeout - self.clock()
+                if remaining <= 0:
+                    self.counters['timeouts'] += 1
+                    close_all(stale)
+                    raise PoolTimeout(f'Нет свободного соединения в пуле за {self.timeout} с (открыто {self.size})')
+                if not wait:
+                    self.counters['waits'] += 1
+                waited_from = self.clock()
+                self.condition.wait(remaining)
+                wait += self.clock() - waited_from
+                self.check_fork()
+            self.opening += 1
+            return (self.idle.pop() if self.idle else None), stale, wait
+
+    def release_slot(self):
+        with self.condition:
+            self.opening -= 1
+            self.condition.notify()
+
+    def checkin(self, raw, reusable=True):
+        """Возвращает соединение в пул; неисправное (`reusable=False`) или слишком старое закрывается."""
+        with self.condition:
+            entry = self.busy.pop(id(raw), None)
+            now = self.clock()
+            keep = (reusable and entry is not None and os.getpid() == self.pid
+                    and now - entry.created < self.max_lifetime)
+            if keep:
+                entry.last_used = now
+                self.idle.append(entry)
+            stale = self.evict()
+            self.condition.notify()
+        close_all(stale)
+        if not keep:
+            self.close(raw)
+
+    def evict(self):
+        """Под блокировкой: забирает из пула простаивающие дольше max_idle соединения сверх min_size."""
+        now = self.clock()
+        stale = []
+        while self.idle and self.size > self.min_size and now - self.idle[0].last_used >= self.max_idle:
+            stale.append(self.idle.popleft().raw)
+        return [partial(self.close, raw) for raw in stale]
+
+    def discard(self, entry):
+        with self.condition:
+            self.opening -= 1
+            self.condition.notify()
+        self.close(entry.raw)
+
+    def is_healthy(self, raw):
+        if self.check is None:
+            return True
+        try:
+            return bool(self.check(raw))
+        except Exception:
+            return False
+
+    def close(self, raw):
+        with self.condition:
+            self.counters['closed'] += 1
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    def check_fork(self):
+        if os.getpid() != self.pid:
+            self.pid = os.getpid()
+            self.idle.clear()
+            self.busy.clear()
+            self.opening = 0
+
+    def close_idle(self):
+        with self.condition:
+            stale = [partial(self.close, entry.raw) for entry in self.idle]
+            self.idle.clear()
+        close_all(stale)
+
+    def stats(self):
+        with self.condition:
+            return {
+                'size': self.size,
+                'in_use': len(self.busy),
+                'idle': len(self.idle),
+                'max_size': self.max_size,
+                **self.counters,
+            }
+
+
+def close_all(callbacks):
+    for callback in callbacks:
+        callback()
+
+
+def get_pool(key, options, check=None):
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = ConnectionPool.from_settings(options, check=check)
+        return _pools[key]
+
+
+def close_pools(alias=None):
+    """Закрывает простаивающие соединения пулов базы `alias` (или всех баз)."""
+    with _pools_lock:
+        pools = [pool for (pool_alias, _), pool in _pools.items() if alias is None or pool_alias == alias]
+    for pool in pools:
+        pool.close_idle()
+
+
+def check_connection(raw):
+    cursor = raw.cursor()
+    try:
+        cursor.execute('SELECT 1')
+    finally:
+        cursor.close()
+    return True
+
+
+class PooledDatabaseWrapperMixin:
+    """
+    Подмешивается к DatabaseWrapper бэкенда: новое соединение берется из пула
+    базы (настройки - ключ POOL в DATABASES), а закрытое Django соединение
+    возвращается в пул вместо закрытия. Перед возвратом незавершенная
+    транзакция откатывается. Время ожидания и загрузка пула попадают в
+    метрики запроса (store.instrumentation).
+    """
+
+    def get_pool(self, conn_params):
+        key = (self.alias, repr(sorted(conn_params.items())))
+        return get_pool(key, self.settings_dict.get('POOL', {}), check=check_connection)
+
+    def get_new_connection(self, conn_params):
+        pool = self.get_pool(conn_params)
+        try:
+            raw, wait = pool.checkout(partial(super().get_new_connection, conn_params))
+        except PoolTimeout as exc:
+            raise self.Database.OperationalError(str(exc)) from exc
+        self.pool = pool
+        metrics = current_metrics()
+        if metrics is not None:
+            metrics.pool_checkout(wait, len(pool.busy), pool.max_size)
+        return raw
+
+    def _close(self):
+        if self.connection is not None:
+            self.pool.checkin(self.connection, reusable=self.reset_connection(self.connection))
+
+    @staticmethod
+    def reset_connection(raw):
+        try:
+            raw.rollback()
+        except Exception:
+            return False
+        return True
@@ -0,0 +1,15 @@
+from django.db.backends.postgresql import base, creation
+
+from ..pool import PooledDatabaseWrapperMixin, close_pools
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        close_pools(self.connection.alias)
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    """PostgreSQL (psycopg2) с пулом соединений store.db.pool."""
+    creation_class = DatabaseCreation
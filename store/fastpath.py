@@ -0,0 +1,218 @@
+import decimal
+import functools
+import operator
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from .instrumentation import current_metrics
+from .sparse import request_selection
+
+IDENTITY_FIELDS = (serializers.IntegerField, serializers.CharField, serializers.BooleanField)
+
+
+class Unsupported(Exception):
+    """Сериализатор нельзя собрать из values(): поле не из колонки модели."""
+
+
+def fast_list_enabled():
+    return getattr(settings, 'STORE_FAST_LIST_SERIALIZATION', False)
+
+
+def decimal_converter(field):
+    coerce_to_string = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+    if not coerce_to_string or field.localize or field.decimal_places is None:
+        return field.to_representation
+    exponent = decimal.Decimal('.1') ** field.decimal_places
+    context = decimal.getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
+    rounding = field.rounding
+
+    def convert(value):
+        if not isinstance(value, decimal.Decimal):
+            value = decimal.Decimal(str(value).strip())
+        return '{:f}'.format(value.quantize(exponent, rounding=rounding, context=context))
+    return convert
+
+
+def datetime_converter(field, current_timezone):
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    field_timezone = getattr(field, 'timezone', current_timezone)
+    if output_format is None or output_format.lower() != ISO_8601 or field_timezone is None:
+        return field.to_representation
+
+    def convert(value):
+        if timezone.is_aware(value):
+            value = value.astimezone(field_timezone)
+        else:
+            value = timezone.make_aware(value, field_timezone)
+        value = value.isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+    return convert
+
+
+def value_converter(field, current_timezone):
+    """Функция колонка -> значение ответа; None - значение выводится как есть."""
+    if isinstance(field, serializers.DecimalField):
+        return decimal_converter(field)
+    if isinstance(field, serializers.DateTimeField):
+        return datetime_converter(field, current_timezone)
+    if isinstance(field, serializers.FloatField):
+        return float
+    if isinstance(field, serializers.PrimaryKeyRelatedField):
+        if field.pk_field is not None:
+            raise Unsupported(field.field_name)
+        return None
+    if isinstance(field, serializers.ChoiceField):
+        if all(isinstance(key, str) for key in field.choice_strings_to_values.values()):
+            return None
+        return field.to_representation
+    if isinstance(field, IDENTITY_FIELDS):
+        return None
+    if isinstance(field, serializers.RelatedField):
+        raise Unsupported(field.field_name)
+    return field.to_representation
+
+
+def column_getter(column, convert):
+    if convert is None:
+        return operator.itemgetter(column)
+
+    def get(row):
+        value = row[column]
+        return None if value is None else convert(value)
+    return get
+
+
+def nested_getter(column, converter):
+    def get(row):
+        return None if row[column] is None else converter(row)
+    return get
+
+
+class RowConverter:
+    """
+    Собранный заранее сериализатор для строк `values()`: список колонок
+    запроса и по одной функции преобразования на поле. Вложенный сериализатор
+    одного объекта читает колонки связи (`user__username`) из той же строки,
+    список (`many=True` по обратной связи) загружается отдельным запросом.
+    """
+
+    def __init__(self, serializer, current_timezone, prefix=''):
+        model = serializer.Meta.model
+        self.columns = []
+        self.getters = []
+        self.relations = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if len(field.source_attrs) != 1:
+                raise Unsupported(name)
+            source = field.source_attrs[0]
+            try:
+                target = model._meta.get_field(source)
+            except FieldDoesNotExist:
+                raise Unsupported(name)
+            if isinstance(field, serializers.ListSerializer):
+                if prefix or not target.one_to_many:
+                    raise Unsupported(name)
+                child = RowConverter(field.child, current_timezone)
+                self.relations.append((source, target.field.attname, target.related_model, child))
+                self.getters.append((name, operator.itemgetter(source)))
+            elif isinstance(field, serializers.Serializer):
+                if not (target.many_to_one or target.one_to_one):
+                    raise Unsupported(name)
+                nested = RowConverter(field, current_timezone, prefix=f'{prefix}{source}__')
+                if nested.relations:
+                    raise Unsupported(name)
+                self.columns += nested.columns
+                self.getters.append((name, nested_getter(f'{prefix}{source}__{target.target_field.name}', nested)))
+            else:
+                if target.many_to_many or target.one_to_many:
+                    raise Unsupported(name)
+                column = f'{prefix}{source}'
+                self.columns.append(column)
+                self.getters.append((name, column_getter(column, value_converter(field, current_timezone))))
+        self.pk_column = f'{prefix}{model._meta.pk.name}'
+        if self.pk_column not in self.columns:
+            self.columns.append(self.pk_column)
+
+    def __call__(self, row):
+        return {name: get(row) for name, get in self.getters}
+
+    def load_relations(self, rows, using):
+        if not self.relations:
+            return
+        ids = [row[self.pk_column] for row in rows]
+        for source, fk_column, related_model, child in self.relations:
+            grouped = {}
+            related_rows = related_model._default_manager.using(using).filter(**{f'{fk_column}__in': ids})
+            for related in related_rows.values(fk_column, *child.columns):
+                grouped.setdefault(related[fk_column], []).append(child(related))
+            for row in rows:
+                row[source] = grouped.get(row[self.pk_column], [])
+
+    def convert(self, rows, using):
+        self.load_relations(rows, using)
+        return [self(row) for row in rows]
+
+
+@functools.lru_cache(maxsize=None)
+def compiled_converter(serializer_class, current_timezone):
+    """RowConverter для сериализатора или None, если собрать его нельзя."""
+    try:
+        return RowConverter(serializer_class(), current_timezone)
+    except Unsupported:
+        return None
+
+
+class FastListMixin:
+    """
+    Быстрый list только для чтения (`STORE_FAST_LIST_SERIALIZATION`): ответ
+    строится из строк `values()` заранее собранным преобразователем, без
+    экземпляров моделей и полей сериализатора. JSON совпадает с обычным
+    ответом байт в байт. С `?fields=` / `?omit=` и для сериализаторов
+    с вычисляемыми полями используется обычный путь.
+    """
+
+    def list(self, request, *args, **kwargs):
+        converter = self.fast_list_converter(request)
+        if converter is None:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(None)
+        columns = list(converter.columns)
+        for name in self.pagination_columns(queryset):
+            if name not in columns:
+                columns.append(name)
+        rows = queryset.values(*columns)
+        page = self.paginate_queryset(rows)
+        rows = list(rows) if page is None else page
+        metrics = current_metrics()
+        if metrics is None:
+            data = converter.convert(rows, queryset.db)
+        else:
+            with metrics.measure('serialize'):
+                data = converter.convert(rows, queryset.db)
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+    def fast_list_converter(self, request):
+        if not fast_list_enabled() or request.method not in ('GET', 'HEAD'):
+            return None
+        if request_selection(request) != (None, None):
+            return None
+        return compiled_converter(self.get_serializer_class(), timezone.get_current_timezone())
+
+    def pagination_columns(self, queryset):
+        paginator = self.paginator
+        if paginator is None or not hasattr(paginator, 'get_ordering'):
+            return []
+        return [name.lstrip('-') for name in paginator.get_ordering(self.request, queryset, self)]
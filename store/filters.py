@@ -1,35 +1,85 @@
+import datetime
+
+from django.utils import timezone
 from django_filters import rest_framework as filters
-from store.models import Product, ProductReview, Order
+from django_filters.constants import EMPTY_VALUES
+from store.models import Order, OrderStatusDay, Product, ProductReview, ProductSalesDay
+from store.search import search_products
+
+
+class DateRangeFilter(filters.DateFilter):
+    """
+    Фильтр datetime-поля по дате. Вместо `__date`, то есть функции над колонкой,
+    сравнивает поле с границами суток в текущем часовом поясе, поэтому запрос
+    идет по обычному индексу на поле.
+    """
+
+    def filter(self, qs, value):
+        if value in EMPTY_VALUES:
+            return qs
+        start = timezone.make_aware(datetime.datetime.combine(value, datetime.time.min))
+        end = timezone.make_aware(datetime.datetime.combine(value + datetime.timedelta(days=1), datetime.time.min))
+        return self.get_method(qs)(**{f'{self.field_name}__gte': start, f'{self.field_name}__lt': end})
 
 
 class ProductFilter(filters.FilterSet):
+    search = filters.CharFilter(method='filter_search')
+
+    def filter_search(self, queryset, name, value):
+        return search_products(queryset, value)
+
     class Meta:
         model = Product
         fields = {
             'price': ['exact', 'lte', 'gte'],
             'name': ['exact', 'iexact', 'icontains'],
-            'description': ['icontains']
+            'description': ['icontains'],
+            'rating_avg': ['gte', 'lte'],
+            'rating_count': ['gte', 'lte'],
         }
 
 
 class ProductReviewFilter(filters.FilterSet):
+    created_at__date = DateRangeFilter(field_name='created_at')
+
     class Meta:
         model = ProductReview
         fields = {
             'user': ['exact'],
-            'created_at': ['date'],
             'product': ['exact'],
         }
 
 
 class OrderFilter(filters.FilterSet):
+    order_status__iexact = filters.CharFilter(method='filter_status')
+    created_at__date = DateRangeFilter(field_name='created_at')
+    updated_at__date = DateRangeFilter(field_name='updated_at')
+
+    def filter_status(self, queryset, name, value):
+        # Статусы хранятся в верхнем регистре (OrderStatusChoices), поэтому
+        # регистронезависимое сравнение сводится к точному и идет по индексу.
+        return queryset.filter(order_status=value.upper())
 
     class Meta:
         model = Order
         fields = {
-            'order_status': ['iexact'],
             'total': ['exact', 'lte', 'gte'],
-            'created_at': ['date'],
-            'updated_at': ['date'],
             'products__id': ['exact']
         }
+
+
+class StatusStatsFilter(filters.FilterSet):
+    date_from = filters.DateFilter(field_name='day', lookup_expr='gte')
+    date_to = filters.DateFilter(field_name='day', lookup_expr='lte')
+
+    class Meta:
+        model = OrderStatusDay
+        fields = ()
+
+
+class SalesStatsFilter(StatusStatsFilter):
+    product = filters.BaseInFilter(field_name='product_id')
+
+    class Meta:
+        model = ProductSalesDay
+        fields = ()
@@ -0,0 +1,169 @@
+import functools
+import json
+import logging
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger('store.instrumentation')
+
+_current_metrics = ContextVar('store_request_metrics', default=None)
+
+
+def instrumentation_settings():
+    options = {'ENABLED': False, 'LOG': False}
+    options.update(getattr(settings, 'STORE_INSTRUMENTATION', {}))
+    return options
+
+
+def current_metrics():
+    """Метрики текущего запроса или None, если инструментирование выключено."""
+    return _current_metrics.get()
+
+
+class RequestMetrics:
+    """
+    Метрики одного запроса: количество SQL запросов, время в базе и именованные
+    отрезки времени (сериализация, рендеринг). Экземпляр подключается к
+    соединениям через `execute_wrapper` и считает все выполненные запросы.
+    Пул соединений (store.db.pool) добавляет время ожидания соединения и
+    загрузку пула в момент выдачи.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.durations = {}
+        self.total = 0.0
+        self.pool_wait = None
+        self.pool_usage = None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+
+    def pool_checkout(self, wait, in_use, max_size):
+        self.pool_wait = (self.pool_wait or 0.0) + wait
+        self.pool_usage = (in_use, max_size)
+
+    def add(self, name, duration):
+        self.durations[name] = self.durations.get(name, 0.0) + duration
+
+    @contextmanager
+    def measure(self, name):
+        """Засекает отрезок `name`; время запросов к базе внутри него не учитывается."""
+        start = time.perf_counter()
+        db_time = self.db_time
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start - (self.db_time - db_time))
+
+    def as_dict(self):
+        data = {'queries': self.queries, 'db_ms': round(self.db_time * 1000, 3)}
+        for name, duration in self.durations.items():
+            data[f'{name}_ms'] = round(duration * 1000, 3)
+        if self.pool_usage is not None:
+            data['pool_wait_ms'] = round(self.pool_wait * 1000, 3)
+            data['pool_in_use'], data['pool_max_size'] = self.pool_usage
+        data['total_ms'] = round(self.total * 1000, 3)
+        return data
+
+    def server_timing(self):
+        metrics = [f'db;dur={self.db_time * 1000:.3f};desc="{self.queries} queries"']
+        for name, duration in self.durations.items():
+            metrics.append(f'{name};dur={duration * 1000:.3f}')
+        if self.pool_usage is not None:
+            in_use, max_size = self.pool_usage
+            metrics.append(f'pool;dur={self.pool_wait * 1000:.3f};desc="{in_use}/{max_size} in use"')
+        metrics.append(f'total;dur={self.total * 1000:.3f}')
+        return ', '.join(metrics)
+
+
+class ServerTimingMiddleware:
+    """
+    Отдает метрики запроса в заголовке `Server-Timing` и, если включено,
+    пишет их строкой JSON в лог `store.instrumentation`.
+
+    Включается настройкой `STORE_INSTRUMENTATION['ENABLED']`; при выключенной
+    настройке Django исключает middleware из цепочки (MiddlewareNotUsed).
+    """
+
+    def __init__(self, get_response):
+        options = instrumentation_settings()
+        if not options['ENABLED']:
+            raise MiddlewareNotUsed
+        self.log = options['LOG']
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = _current_metrics.set(metrics)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics))
+                response = self.get_response(request)
+        finally:
+            _current_metrics.reset(token)
+        metrics.total = time.perf_counter() - start
+        response['Server-Timing'] = metrics.server_timing()
+        if self.log:
+            logger.info(json.dumps({
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                **metrics.as_dict(),
+            }))
+        return response
+
+
+@functools.lru_cache(maxsize=None)
+def timed_serializer_class(serializer_class):
+    """Подкласс сериализатора, который засекает время построения `data`."""
+
+    def data(self):
+        metrics = current_metrics()
+        if metrics is None:
+            return super(timed, self).data
+        with metrics.measure('serialize'):
+            return super(timed, self).data
+
+    timed = type(serializer_class.__name__, (serializer_class,), {
+        '__module__': serializer_class.__module__,
+        'data': property(data),
+    })
+    return timed
+
+
+class InstrumentedViewMixin:
+    """
+    Добавляет к метрикам запроса время сериализации и рендеринга ответа DRF.
+    Без включенного `ServerTimingMiddleware` ничего не делает.
+    """
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        if current_metrics() is not None:
+            serializer.__class__ = timed_serializer_class(serializer.__class__)
+        return serializer
+
+    def finalize_response(self, request, *args, **kwargs):
+        response = super().finalize_response(request, *args, **kwargs)
+        metrics = current_metrics()
+        if metrics is not None and hasattr(response, 'add_post_render_callback') and not response.is_rendered:
+            start = time.perf_counter()
+            db_time = metrics.db_time
+            response.add_post_render_callback(
+                lambda rendered: metrics.add('render', time.perf_counter() - start - (metrics.db_time - db_time))
+            )
+        return response
@@ -0,0 +1,290 @@
+import json
+import logging
+import multiprocessing
+import os
+import random
+import signal
+import socket
+import threading
+import traceback
+from datetime import timedelta
+
+import django
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from .models import Job, JobStatusChoices
+
+logger = logging.getLogger('store.jobs')
+
+TASKS = {}
+
+
+class LeaseLost(Exception):
+    """Задачу, пока она выполнялась, вернули в очередь по истечении аренды."""
+
+
+def job_settings():
+    options = {
+        'EAGER': False,
+        'DATABASE': 'default',
+        'MAX_ATTEMPTS': 5,
+        'BACKOFF': 2,
+        'MAX_BACKOFF': 600,
+        'LEASE': 300,
+        'POLL_INTERVAL': 1,
+        'BATCH_SIZE': 10,
+        'KEEP_DONE': 24 * 3600,
+    }
+    options.update(getattr(settings, 'STORE_JOBS', {}))
+    return options
+
+
+def task(name, max_attempts=None):
+    """Регистрирует функцию как фоновую задачу `name`; аргументы задачи - JSON-совместимые именованные."""
+
+    def register(func):
+        TASKS[name] = (func, max_attempts)
+        return func
+
+    return register
+
+
+def enqueue(name, payload=None, delay=0, using=None):
+    """
+    Ставит задачу `name` с аргументами `payload` в очередь вместе с текущей
+    транзакцией базы `using` (по умолчанию - базы очереди): откаченная
+    транзакция не оставляет задач, а воркер не увидит задачу раньше данных,
+    которые она обрабатывает. Если `using` - база очереди, задача пишется в той
+    же транзакции и не теряется при сбое; для другой базы - после ее фиксации
+    (transaction.on_commit). В режиме EAGER задача выполняется немедленно
+    в текущем потоке (тесты, разработка).
+    """
+    func, max_attempts = TASKS[name]
+    payload = payload or {}
+    options = job_settings()
+    if options['EAGER']:
+        func(**payload)
+        return
+    json.dumps(payload)  # несериализуемые аргументы - ошибка здесь, а не после фиксации
+    job = Job(name=name, payload=payload, max_attempts=max_attempts or options['MAX_ATTEMPTS'])
+
+    def insert():
+        job.run_at = timezone.now() + timedelta(seconds=delay)
+        job.save(using=options['DATABASE'], force_insert=True)
+
+    if (using or options['DATABASE']) == options['DATABASE']:
+        insert()
+    else:
+        transaction.on_commit(insert, using=using)
+
+
+def discard_jobs(name, using=None):
+    """
+    Удаляет невыполненные задачи `name` (в очереди, выполняющиеся и с ошибкой)
+    под блокировкой строк; выполняющаяся задача затем не сможет отметиться
+    выполненной, и ее изменения откатятся. Возвращает число удаленных задач.
+    """
+    using = using or job_settings()['DATABASE']
+    with transaction.atomic(using=using):
+        pending = Job.objects.using(using).filter(name=name).exclude(status=JobStatusChoices.DONE)
+        ids = list(pending.select_for_update().values_list('id', flat=True))
+        return Job.objects.using(using).filter(id__in=ids).delete()[0]
+
+
+def backoff(attempts):
+    """Пауза перед повтором: экспоненциальная от BACKOFF с разбросом ±20%, не больше MAX_BACKOFF."""
+    options = job_settings()
+    delay = min(options['BACKOFF'] * 2 ** (attempts - 1), options['MAX_BACKOFF'])
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def claim_jobs(worker, limit, using=None):
+    """
+    Забирает до `limit` готовых к выполнению задач и помечает их RUNNING за
+    воркером `worker`. На PostgreSQL строки выбираются SELECT ... FOR UPDATE
+    SKIP LOCKED, поэтому воркеры не ждут друг друга; где SKIP LOCKED нет
+    (SQLite), задача достается тому, чей условный UPDATE сработал первым.
+    """
+    using = using or job_settings()['DATABASE']
+    now = timezone.now()
+    jobs = Job.objects.using(using)
+    with transaction.atomic(using=using):
+        queued = jobs.filter(status=JobStatusChoices.QUEUED, run_at__lte=now).order_by('run_at', 'id')
+        claim = {'status': JobStatusChoices.RUNNING, 'locked_by': worker, 'started_at': now}
+        if connections[using].features.has_select_for_update_skip_locked:
+            ids = list(queued.select_for_update(skip_locked=True).values_list('id', flat=True)[:limit])
+            jobs.filter(id__in=ids).update(**claim)
+        else:
+            ids = [job_id for job_id in queued.values_list('id', flat=True)[:limit]
+                   if jobs.filter(id=job_id, status=JobStatusChoices.QUEUED).update(**claim)]
+    return list(jobs.filter(id__in=ids).order_by('run_at', 'id'))
+
+
+def run_job(job, using=None):
+    """
+    Выполняет задачу. Функция и отметка о выполнении фиксируются одной
+    транзакцией в базе очереди, поэтому изменения задачи в этой же базе
+    применяются ровно один раз. При ошибке задача возвращается в очередь
+    с паузой backoff или, если попытки кончились, помечается FAILED.
+    """
+    using = using or job_settings()['DATABASE']
+    jobs = Job.objects.using(using).filter(id=job.id, locked_by=job.locked_by, status=JobStatusChoices.RUNNING)
+    try:
+        func, _ = TASKS[job.name]
+        with transaction.atomic(using=using):
+            if not jobs.select_for_update().exists():  # строка задачи блокируется раньше данных, как в discard_jobs
+                raise LeaseLost(job.id)
+            func(**job.payload)
+            if not jobs.update(status=JobStatusChoices.DONE, finished_at=timezone.now()):
+                raise LeaseLost(job.id)
+        status = JobStatusChoices.DONE
+    except LeaseLost:
+        logger.warning('Задача %s возвращена в очередь или удалена, пока выполнялась', job.id)
+        return None
+    except Exception:
+        attempts = job.attempts + 1
+        status = JobStatusChoices.FAILED if attempts >= job.max_attempts else JobStatusChoices.QUEUED
+        jobs.update(status=status, attempts=attempts, run_at=timezone.now() + backoff(attempts), locked_by='',
+                    last_error=traceback.format_exc(limit=5), finished_at=timezone.now())
+    logger.info(json.dumps({
+        'job': job.id,
+        'name': job.name,
+        'status': status,
+        'attempt': job.attempts + 1,
+        'wait_ms': round((job.started_at - job.run_at).total_seconds() * 1000, 3),
+        'run_ms': round((timezone.now() - job.started_at).total_seconds() * 1000, 3),
+    }))
+    return status
+
+
+def requeue_stale(using=None):
+    """Возвращает в очередь задачи, которые выполняются дольше LEASE секунд (упавший воркер)."""
+    options = job_settings()
+    using = using or options['DATABASE']
+    deadline = timezone.now() - timedelta(seconds=options['LEASE'])
+    return Job.objects.using(using).filter(status=JobStatusChoices.RUNNING, started_at__lt=deadline).update(
+        status=JobStatusChoices.QUEUED, locked_by='', run_at=timezone.now())
+
+
+def purge_done(using=None):
+    options = job_settings()
+    using = using or options['DATABASE']
+    deadline = timezone.now() - timedelta(seconds=options['KEEP_DONE'])
+    return Job.objects.using(using).filter(status=JobStatusChoices.DONE, finished_at__lt=deadline).delete()[0]
+
+
+def queue_stats(using=None, window=300, sample=1000):
+    """
+    Глубина очереди по статусам, возраст самой старой готовой задачи и
+    задержка / время выполнения (среднее и p95) задач, выполненных за
+    последние `window` секунд (не больше `sample` последних).
+    """
+    using = using or job_settings()['DATABASE']
+    now = timezone.now()
+    jobs = Job.objects.using(using)
+    depth = dict.fromkeys(JobStatusChoices.values, 0)
+    depth.update(jobs.order_by().values_list('status').annotate(count=Count('id')))
+    oldest = jobs.filter(status=JobStatusChoices.QUEUED, run_at__lte=now).aggregate(value=Min('run_at'))['value']
+    done = jobs.filter(status=JobStatusChoices.DONE, finished_at__gte=now - timedelta(seconds=window))
+    done = list(done.order_by('-finished_at').values_list('run_at', 'started_at', 'finished_at')[:sample])
+    return {
+        'depth': depth,
+        'oldest_queued_seconds': round((now - oldest).total_seconds(), 3) if oldest else 0,
+        'done_recently': len(done),
+        'wait_ms': summary([started - run_at for run_at, started, _ in done]),
+        'run_ms': summary([finished - started for _, started, finished in done]),
+    }
+
+
+def summary(durations):
+    values = sorted(duration.total_seconds() * 1000 for duration in durations)
+    if not values:
+        return {'avg': 0, 'p95': 0}
+    return {'avg': round(sum(values) / len(values), 3), 'p95': round(values[int(0.95 * (len(values) - 1))], 3)}
+
+
+class Worker:
+    """
+    Цикл воркера: забирает задачи порциями по BATCH_SIZE и выполняет их,
+    при пустой очереди ждет POLL_INTERVAL секунд. Раз в LEASE секунд
+    возвращает в очередь зависшие задачи и удаляет старые выполненные.
+    В режиме `burst` выходит, как только готовых задач не осталось.
+    """
+
+    def __init__(self, name, stop=None, burst=False, using=None):
+        self.name = name
+        self.stop = stop or threading.Event()
+        self.burst = burst
+        self.using = using or job_settings()['DATABASE']
+        self.processed = 0
+
+    def run(self):
+        options = job_settings()
+        maintained_at = None
+        try:
+            while not self.stop.is_set():
+                now = timezone.now()
+                if maintained_at is None or now - maintained_at > timedelta(seconds=options['LEASE']):
+                    requeue_stale(self.using)
+                    purge_done(self.using)
+                    maintained_at = now
+                jobs = claim_jobs(self.name, options['BATCH_SIZE'], self.using)
+                for job in jobs:
+                    run_job(job, self.using)
+                    self.processed += 1
+                if not jobs:
+                    if self.burst:
+                        break
+                    self.stop.wait(options['POLL_INTERVAL'])
+        finally:
+            connections.close_all()
+        return self.processed
+
+
+def worker_name(thread=0):
+    return f'{socket.gethostname()}:{os.getpid()}:{thread}'
+
+
+def run_threads(threads=1, stop=None, burst=False, using=None):
+    """Запускает `threads` воркеров в потоках текущего процесса и ждет их; возвращает число выполненных задач."""
+    stop = stop or threading.Event()
+    workers = [Worker(worker_name(index), stop=stop, burst=burst, using=using) for index in range(threads)]
+    if threads == 1:
+        return workers[0].run()
+    pool = [threading.Thread(target=worker.run, name=worker.name) for worker in workers]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return sum(worker.processed for worker in workers)
+
+
+def run_process(threads, stop, burst, using, processed):
+    django.setup()
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # остановку по Ctrl+C передает родитель через `stop`
+    count = run_threads(threads, stop=stop, burst=burst, using=using)
+    with processed.get_lock():
+        processed.value += count
+
+
+def run_workers(processes=1, threads=1, stop=None, burst=False, using=None):
+    """
+    Запускает `processes` процессов по `threads` воркеров и ждет их завершения
+    (`stop` - multiprocessing.Event для остановки); возвращает число
+    выполненных задач.
+    """
+    stop = stop or multiprocessing.Event()
+    if processes == 1:
+        return run_threads(threads, stop=stop, burst=burst, using=using)
+    processed = multiprocessing.Value('i', 0)
+    connections.close_all()
+    children = [multiprocessing.Process(target=run_process, args=(threads, stop, burst, using, processed))
+                for _ in range(processes)]
+    for child in children:
+        child.start()
+    for child in children:
+        child.join()
+    return processed.value
@@ -0,0 +1,31 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from store.archive import archive_orders
+from store.sharding import order_shards
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит выполненные заказы старше --days дней в архив порциями. '
+        'Каждая порция - отдельная транзакция, прерванный запуск можно повторить.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=getattr(settings, 'STORE_ORDER_ARCHIVE_AFTER_DAYS', 365),
+                            help='Возраст заказа (по дате последнего изменения)')
+        parser.add_argument('--limit', type=int, help='Перенести не больше указанного количества заказов')
+        parser.add_argument('--database', help='По умолчанию - все шарды заказов')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        total = 0
+        for alias in ([options['database']] if options['database'] else order_shards()):
+            limit = None if options['limit'] is None else options['limit'] - total
+            total += archive_orders(
+                older_than=timedelta(days=options['days']), chunk_size=options['chunk_size'], limit=limit,
+                using=alias, progress=lambda count: self.stdout.write(f'{alias}: перенесено заказов: {count}'),
+            )
+        self.stdout.write(self.style.SUCCESS(f'Всего перенесено в архив: {total}'))
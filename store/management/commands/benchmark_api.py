@@ -0,0 +1,92 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from store.benchmark import DEFAULT_HOST, MODES, compare_runs, ensure_tokens, parse_http_file, run_benchmark
+from store.datagen import generate_store_data
+
+ADMIN_TOKEN = '8d10b87e89200a69ecccd94e8a5102707d7c0e4a'
+
+
+def comma_list(value, cast=str):
+    return [cast(item) for item in value.split(',') if item]
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест API по сценариям из requests.http: in-process через WSGI / ASGI '
+        'и через локальный HTTP сервер. Запросы на запись меняют данные - запускайте на отдельной базе.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', default=str(settings.BASE_DIR / 'requests.http'))
+        parser.add_argument('--mode', default='wsgi,asgi,http', help=f'Через запятую: {", ".join(MODES)}')
+        parser.add_argument('--concurrency', default='1,4,16', help='Уровни конкурентности через запятую')
+        parser.add_argument('--requests', type=int, default=1000, help='Запросов на каждый прогон')
+        parser.add_argument('--weight', action='append', default=[], metavar='NAME=WEIGHT',
+                            help='Вес сценариев, в имени которых есть NAME; можно указать несколько раз')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--no-seed', action='store_true', help='Не заполнять базу, использовать имеющиеся данные')
+        parser.add_argument('--products', type=int, default=1000)
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--reviews', type=int, default=2000)
+        parser.add_argument('--orders', type=int, default=2000)
+        parser.add_argument('--collections', type=int, default=50)
+        parser.add_argument('--admin-token', default=ADMIN_TOKEN, help='Токен из сценариев, который принадлежит админу')
+        parser.add_argument('--host', default=DEFAULT_HOST, help='Заголовок Host для in-process запросов')
+        parser.add_argument('--base-url', help='Адрес уже запущенного сервера для режима http')
+        parser.add_argument('--output', help='Файл для сохранения результатов в JSON')
+        parser.add_argument('--compare', help='JSON прошлого прогона для сравнения')
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        modes = comma_list(options['mode'])
+        if set(modes) - set(MODES):
+            raise CommandError(f'Неизвестный режим: {", ".join(sorted(set(modes) - set(MODES)))}')
+        with open(options['file'], encoding='utf-8') as stream:
+            scenarios = parse_http_file(stream.read())
+        for item in options['weight']:
+            pattern, _, weight = item.rpartition('=')
+            for scenario in scenarios:
+                if pattern in scenario.name:
+                    scenario.weight = int(weight)
+        scenarios = [scenario for scenario in scenarios if scenario.weight > 0]
+        if not scenarios:
+            raise CommandError('Нет сценариев для прогона')
+
+        using = options['database']
+        if not options['no_seed']:
+            owners = ensure_tokens(scenarios, options['admin_token'], using=using).values()
+            generate_store_data(users=options['users'], products=options['products'], reviews=options['reviews'],
+                                orders=options['orders'], collections=options['collections'], seed=options['seed'],
+                                owners=owners, using=using)
+
+        results = run_benchmark(
+            scenarios, modes, comma_list(options['concurrency'], int), options['requests'], options['seed'],
+            options['admin_token'], host=options['host'], base_url=options['base_url'], using=using,
+        )
+        for run in results['runs']:
+            self.stdout.write(
+                f"{run['mode']} x{run['concurrency']}: {run['rps']} rps, p50 {run['p50_ms']} ms, "
+                f"p95 {run['p95_ms']} ms, p99 {run['p99_ms']} ms, ошибок {run['errors']}"
+            )
+            for name, stats in sorted(run['endpoints'].items()):
+                self.stdout.write(
+                    f"    {name}: {stats['requests']} запросов, p50 {stats['p50_ms']} ms, "
+                    f"p95 {stats['p95_ms']} ms, p99 {stats['p99_ms']} ms, статусы {stats['statuses']}"
+                )
+
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as stream:
+                previous = json.load(stream)
+            self.stdout.write(f"Сравнение с {previous.get('revision') or options['compare']}:")
+            for mode, concurrency, name, old, new in compare_runs(previous, results):
+                change = (new['p95_ms'] - old['p95_ms']) / old['p95_ms'] if old['p95_ms'] else 0.0
+                self.stdout.write(f"    {mode} x{concurrency} {name}: p95 {old['p95_ms']} -> {new['p95_ms']} ms "
+                                  f"({change:+.1%})")
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as stream:
+                json.dump(results, stream, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Результаты сохранены в {options['output']}"))
@@ -0,0 +1,79 @@
+import io
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from store.benchmark import DEFAULT_HOST, percentile
+from store.datagen import generate_store_data
+from store.parsers import FastJSONParser
+from store.renderers import FastJSONRenderer
+
+from .benchmark_serialization import ENDPOINTS, measure_list
+
+VARIANTS = {
+    'drf': (JSONRenderer(), JSONParser()),
+    'orjson': (FastJSONRenderer(), FastJSONParser()),
+}
+
+
+def measure(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return sorted(timings), result
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает рендеринг и разбор JSON списков продуктов и заказов рендерером и парсером DRF '
+        'и их версиями на orjson (store.renderers, store.parsers) и проверяет, что результаты совпадают.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--endpoint', action='append', choices=sorted(ENDPOINTS),
+                            help='Какие list проверять; по умолчанию все')
+        parser.add_argument('--repeat', type=int, default=200, help='Повторов на каждый вариант')
+        parser.add_argument('--page-size', type=int, default=100)
+        parser.add_argument('--host', default=DEFAULT_HOST, help='Заголовок Host запросов')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--no-seed', action='store_true', help='Не заполнять базу, использовать имеющиеся данные')
+        parser.add_argument('--products', type=int, default=1000)
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--orders', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if not options['no_seed']:
+            generate_store_data(users=options['users'], products=options['products'], reviews=0,
+                                orders=options['orders'], collections=0, seed=options['seed'], search_index=False)
+        admin = User.objects.filter(is_staff=True).first()
+        if admin is None:
+            admin = User.objects.create_user('benchmark_admin', is_staff=True)
+        params = {'page_size': options['page_size']}
+        repeat = options['repeat']
+
+        for name in options['endpoint'] or sorted(ENDPOINTS):
+            _, data, _ = measure_list(ENDPOINTS[name], admin, params, 1, False, options['host'])
+            results = {}
+            for variant, (renderer, parser) in VARIANTS.items():
+                rendered = measure(lambda: renderer.render(data, 'application/json'), repeat)
+                content = rendered[1]
+                parsed = measure(lambda: parser.parse(io.BytesIO(content)), repeat)
+                results[variant] = rendered, parsed
+                self.stdout.write(
+                    f'{name} {variant}: {len(content)} байт, '
+                    f'рендеринг p50 {percentile(rendered[0], 0.5) * 1000:.3f} ms, '
+                    f'разбор p50 {percentile(parsed[0], 0.5) * 1000:.3f} ms'
+                )
+            for step, index in (('рендеринг', 0), ('разбор', 1)):
+                speedup = sum(results['drf'][index][0]) / sum(results['orjson'][index][0])
+                self.stdout.write(f'{name}: {step} x{speedup:.2f}')
+            if results['drf'][0][1] != results['orjson'][0][1]:
+                raise CommandError(f'{name}: JSON рендерера DRF и orjson различается')
+            if results['drf'][1][1] != results['orjson'][1][1]:
+                raise CommandError(f'{name}: результаты разбора DRF и orjson различаются')
+        self.stdout.write(self.style.SUCCESS('Ответы совпадают'))
@@ -0,0 +1,80 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from store.benchmark import DEFAULT_HOST, percentile
+from store.datagen import generate_store_data
+from store.views import OrdersViewSet, ProductsViewSet
+
+ENDPOINTS = {
+    'products': ProductsViewSet,
+    'orders': OrdersViewSet,
+}
+
+
+def measure_list(viewset, user, params, repeat, fast, host=DEFAULT_HOST):
+    """Время `repeat` запросов к list вьюсета (с рендерингом JSON) и тело последнего ответа."""
+    view = viewset.as_view({'get': 'list'})
+    factory = APIRequestFactory()
+    timings = []
+    with override_settings(STORE_FAST_LIST_SERIALIZATION=fast):
+        for _ in range(repeat):
+            request = factory.get('/', params, HTTP_ACCEPT='application/json', HTTP_HOST=host)
+            force_authenticate(request, user=user)
+            start = time.perf_counter()
+            response = view(request)
+            response.render()
+            timings.append(time.perf_counter() - start)
+    if response.status_code != 200:
+        raise CommandError(f'{viewset.__name__}: статус {response.status_code}')
+    return sorted(timings), response.data, response.content
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность list продуктов и заказов с обычной '
+        'сериализацией и с быстрым путем STORE_FAST_LIST_SERIALIZATION и проверяет, что ответы совпадают.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--endpoint', action='append', choices=sorted(ENDPOINTS),
+                            help='Какие list проверять; по умолчанию все')
+        parser.add_argument('--repeat', type=int, default=50, help='Запросов на каждый вариант')
+        parser.add_argument('--page-size', type=int, default=100)
+        parser.add_argument('--host', default=DEFAULT_HOST, help='Заголовок Host запросов')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--no-seed', action='store_true', help='Не заполнять базу, использовать имеющиеся данные')
+        parser.add_argument('--products', type=int, default=1000)
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--orders', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if not options['no_seed']:
+            generate_store_data(users=options['users'], products=options['products'], reviews=0,
+                                orders=options['orders'], collections=0, seed=options['seed'], search_index=False)
+        admin = User.objects.filter(is_staff=True).first()
+        if admin is None:
+            admin = User.objects.create_user('benchmark_admin', is_staff=True)
+        params = {'page_size': options['page_size']}
+
+        for name in options['endpoint'] or sorted(ENDPOINTS):
+            viewset = ENDPOINTS[name]
+            results = {}
+            for fast in (False, True):
+                measure_list(viewset, admin, params, 1, fast, options['host'])
+                results[fast] = measure_list(viewset, admin, params, options['repeat'], fast, options['host'])
+            rows = len(results[False][1]['results'])
+            for fast, (timings, data, content) in results.items():
+                total = sum(timings)
+                self.stdout.write(
+                    f"{name} {'fast' if fast else 'regular'}: {rows * len(timings) / total:.0f} строк/с, "
+                    f"p50 {percentile(timings, 0.5) * 1000:.3f} ms, p95 {percentile(timings, 0.95) * 1000:.3f} ms"
+                )
+            regular_total, fast_total = sum(results[False][0]), sum(results[True][0])
+            self.stdout.write(f'{name}: ускорение x{regular_total / fast_total:.2f}')
+            if results[False][2] != results[True][2]:
+                raise CommandError(f'{name}: ответы быстрого пути и сериализатора различаются')
+        self.stdout.write(self.style.SUCCESS('Ответы совпадают'))
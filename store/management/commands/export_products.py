@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from store.catalog import FORMATS, export_rows, format_from_name
+from store.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Выгружает каталог продуктов в JSONL или CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default='-', help='Путь к файлу или "-" для вывода в stdout')
+        parser.add_argument('--format', choices=FORMATS, help='По умолчанию определяется по расширению файла')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        output = options['output']
+        fmt = options['format'] or format_from_name(output)
+        queryset = Product.objects.using(options['database'])
+        rows = export_rows(queryset, fmt, chunk_size=options['chunk_size'])
+        if output == '-':
+            for chunk in rows:
+                self.stdout.write(chunk, ending='')
+            return
+        with open(output, 'w', encoding='utf-8', newline='') as stream:
+            stream.writelines(rows)
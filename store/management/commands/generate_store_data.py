@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from store.datagen import generate_store_data
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу синтетическими пользователями, товарами, отзывами, заказами и подборками '
+        'с популярными товарами и активными пользователями (распределение Ципфа)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--products', type=int, default=10000)
+        parser.add_argument('--reviews', type=int, default=50000, help='Дубликаты пар пользователь-товар пропускаются')
+        parser.add_argument('--orders', type=int, default=50000)
+        parser.add_argument('--collections', type=int, default=100)
+        parser.add_argument('--positions', type=float, default=3, help='Среднее число позиций в заказе')
+        parser.add_argument('--collection-size', type=int, default=20, help='Среднее число товаров в подборке')
+        parser.add_argument('--days', type=int, default=365, help='За сколько последних дней создаются записи')
+        parser.add_argument('--skew', type=float, default=1.1, help='Показатель распределения Ципфа')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--workers', type=int, default=1, help='Число процессов (на SQLite всегда 1)')
+        parser.add_argument('--chunk-size', type=int, default=10000)
+        parser.add_argument('--skip-search-index', action='store_true')
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        using = options['database']
+        if options['workers'] > 1 and connections[using].vendor == 'sqlite':
+            self.stdout.write('SQLite не поддерживает параллельную запись, данные создаются в одном процессе')
+        created = generate_store_data(
+            users=options['users'], products=options['products'], reviews=options['reviews'],
+            orders=options['orders'], collections=options['collections'], seed=options['seed'],
+            skew=options['skew'], days=options['days'], positions=options['positions'],
+            collection_size=options['collection_size'], chunk_size=options['chunk_size'],
+            workers=options['workers'], search_index=not options['skip_search_index'], using=using,
+            progress=lambda name, count: self.stdout.write(f'{name}: {count}'),
+        )
+        summary = ', '.join(f'{name}: {count}' for name, count in created.items())
+        self.stdout.write(self.style.SUCCESS(f'Создано записей - {summary}'))
@@ -0,0 +1,32 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from store.catalog import FORMATS, format_from_name, import_products, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Загружает каталог продуктов из файла JSONL или CSV (ключ - артикул sku)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к файлу или "-" для чтения из stdin')
+        parser.add_argument('--format', choices=FORMATS, help='По умолчанию определяется по расширению файла')
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or format_from_name(path)
+        try:
+            stream = sys.stdin if path == '-' else open(path, encoding='utf-8', newline='')
+        except OSError as exc:
+            raise CommandError(exc)
+        with stream:
+            result = import_products(read_rows(stream, fmt), chunk_size=options['chunk_size'],
+                                     using=options['database'])
+        for error in result.errors:
+            self.stderr.write(f"строка {error['line']}: {error['error']}")
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано: {result.created}, обновлено: {result.updated}, '
+            f'без изменений: {result.unchanged}, ошибок: {result.failed}'
+        ))
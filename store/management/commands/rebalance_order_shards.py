@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from store.sharding import order_shards, rebalance_orders
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит заказы и архивные заказы на шарды, назначенные пользователям при текущем '
+        'STORE_ORDER_SHARDING. Запускается после добавления шарда; прерванный запуск можно повторить.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Только посчитать заказы для переноса')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'Шарды: {", ".join(order_shards())}')
+        moved = rebalance_orders(
+            chunk_size=options['chunk_size'], dry_run=options['dry_run'],
+            progress=lambda source, target, count: self.stdout.write(f'{source} -> {target}: {count}'),
+        )
+        for (source, target), count in sorted(moved.items()):
+            self.stdout.write(f'{source} -> {target}: {count} заказов')
+        verb = 'К переносу' if options['dry_run'] else 'Перенесено'
+        self.stdout.write(self.style.SUCCESS(f'{verb} заказов: {sum(moved.values())}'))
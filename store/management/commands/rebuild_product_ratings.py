@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from store.ratings import rebuild_ratings
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает среднюю оценку и количество отзывов у всех продуктов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+        parser.add_argument('--chunk-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        total = rebuild_ratings(chunk_size=options['chunk_size'], using=options['database'])
+        self.stdout.write(self.style.SUCCESS(f'Пересчитано продуктов: {total}'))
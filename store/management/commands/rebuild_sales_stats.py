@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from store.analytics import rebuild_sales_stats
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает роллапы продаж по товарам и статусам заказов за каждый день по всем заказам'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+        parser.add_argument('--chunk-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        total = rebuild_sales_stats(chunk_size=options['chunk_size'], using=options['database'])
+        self.stdout.write(self.style.SUCCESS(f'Пересчитано заказов: {total}'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from store.cache import get_stats, reset_stats
+
+
+class Command(BaseCommand):
+    help = 'Показывает счетчики попаданий и промахов кэша ответов каталога'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Обнулить счетчики после вывода')
+
+    def handle(self, *args, **options):
+        stats = get_stats()
+        self.stdout.write(f"hits: {stats['hits']}, misses: {stats['misses']}, hit ratio: {stats['hit_ratio']:.2%}")
+        if options['reset']:
+            reset_stats()
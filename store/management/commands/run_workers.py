@@ -0,0 +1,33 @@
+import multiprocessing
+import signal
+
+from django.core.management.base import BaseCommand
+
+from store.jobs import job_settings, queue_stats, run_workers
+
+
+class Command(BaseCommand):
+    help = (
+        'Запускает воркеры фоновых задач (store.jobs). SIGINT / SIGTERM останавливают воркеры '
+        'после текущей задачи; с --burst команда завершается, когда готовых задач не осталось.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1)
+        parser.add_argument('--threads', type=int, default=1, help='Число воркеров в каждом процессе')
+        parser.add_argument('--burst', action='store_true', help='Выйти, когда очередь опустеет')
+        parser.add_argument('--database', default=None, help='База очереди (по умолчанию STORE_JOBS["DATABASE"])')
+
+    def handle(self, *args, **options):
+        using = options['database'] or job_settings()['DATABASE']
+        stop = multiprocessing.Event()
+        handlers = {signum: signal.signal(signum, lambda *_: stop.set()) for signum in (signal.SIGINT, signal.SIGTERM)}
+        self.stdout.write(f'Воркеров: {options["processes"]} x {options["threads"]}, очередь: {using}')
+        try:
+            processed = run_workers(processes=options['processes'], threads=options['threads'], stop=stop,
+                                    burst=options['burst'], using=using)
+        finally:
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
+        depth = ', '.join(f'{status}: {count}' for status, count in queue_stats(using)['depth'].items())
+        self.stdout.write(self.style.SUCCESS(f'Выполнено задач: {processed} ({depth})'))
@@ -0,0 +1,60 @@
+from django.conf import settings
+from django.db import migrations
+
+POSTGRES_FORWARD = [
+    """
+    CREATE TABLE store_product_search (
+        product_id integer PRIMARY KEY REFERENCES store_product (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED,
+        document tsvector NOT NULL
+    )
+    """,
+    'CREATE INDEX store_product_search_document_idx ON store_product_search USING gin (document)',
+    """
+    INSERT INTO store_product_search (product_id, document)
+    SELECT id, setweight(to_tsvector(%s::regconfig, name), 'A')
+        || setweight(to_tsvector(%s::regconfig, description), 'B')
+    FROM store_product
+    """,
+]
+
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE store_product_fts USING fts5(name, description, tokenize='unicode61 remove_diacritics 2')",
+    'INSERT INTO store_product_fts (rowid, name, description) SELECT id, name, description FROM store_product',
+]
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        # та же конфигурация, что у store.search.search_config(); после ее смены - rebuild_search_index
+        config = getattr(settings, 'STORE_SEARCH_CONFIG', 'russian')
+        statements = [(statement, (config,) * statement.count('%s')) for statement in POSTGRES_FORWARD]
+    elif connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+            if not cursor.fetchone()[0]:
+                return
+        statements = [(statement, ()) for statement in SQLITE_FORWARD]
+    else:
+        return
+    for statement, params in statements:
+        schema_editor.execute(statement, params)
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        schema_editor.execute('DROP TABLE IF EXISTS store_product_search')
+    elif connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS store_product_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0002_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,31 @@
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def fill_unit_price(apps, schema_editor):
+    Product = apps.get_model('store', 'Product')
+    ProductOrderPosition = apps.get_model('store', 'ProductOrderPosition')
+    ProductOrderPosition.objects.update(
+        unit_price=Subquery(Product.objects.filter(id=OuterRef('product_id')).values('price')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0004_product_rating'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productorderposition',
+            name='unit_price',
+            field=models.DecimalField(decimal_places=2, max_digits=10, null=True, verbose_name='Цена за единицу'),
+        ),
+        migrations.RunPython(fill_unit_price, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='productorderposition',
+            name='unit_price',
+            field=models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Цена за единицу'),
+        ),
+    ]
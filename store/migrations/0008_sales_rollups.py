@@ -0,0 +1,54 @@
+# Generated by Django 3.1.7 on 2026-10-18 06:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0007_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderStatusDay',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_status', models.TextField(choices=[('NEW', 'Открыто'), ('IN_PROGRESS', 'Выполняется'), ('DONE', 'Выполнен')], verbose_name='Статус')),
+                ('day', models.DateField(verbose_name='День')),
+                ('orders', models.BigIntegerField(default=0, verbose_name='Заказов')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='Сумма заказов')),
+            ],
+            options={
+                'verbose_name': 'Заказы по статусу за день',
+                'verbose_name_plural': 'Заказы по статусам и дням',
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductSalesDay',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='День')),
+                ('quantity', models.BigIntegerField(default=0, verbose_name='Продано штук')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='Выручка')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_days', to='store.product', verbose_name='Товар')),
+            ],
+            options={
+                'verbose_name': 'Продажи товара за день',
+                'verbose_name_plural': 'Продажи товаров по дням',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='orderstatusday',
+            constraint=models.UniqueConstraint(fields=('order_status', 'day'), name='order_status_day_unique'),
+        ),
+        migrations.AddIndex(
+            model_name='productsalesday',
+            index=models.Index(fields=['day', 'product'], name='product_sales_day_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='productsalesday',
+            constraint=models.UniqueConstraint(fields=('product', 'day'), name='product_sales_day_unique'),
+        ),
+    ]
@@ -18,9 +18,13 @@ class TimestampFields(models.Model):
 
 
 class Product(TimestampFields):
+    sku = models.CharField(max_length=64, unique=True, null=True, blank=True, verbose_name='Артикул')
     name = models.CharField(max_length=200, verbose_name='Название')
     description = models.TextField(verbose_name='Описание')
     price = models.DecimalField(verbose_name='Цена', max_digits=10, decimal_places=2)
+    rating_avg = models.FloatField(verbose_name='Средняя оценка', default=0, editable=False)
+    rating_count = models.PositiveIntegerField(verbose_name='Количество отзывов', default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(verbose_name='Сумма оценок', default=0, editable=False)
 
     def __str__(self):
         return self.name
@@ -28,6 +32,13 @@ class Product(TimestampFields):
     class Meta:
         verbose_name = 'Товар'
         verbose_name_plural = 'Товары'
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='product_created_at_id_idx'),
+            models.Index(fields=['updated_at'], name='product_updated_at_idx'),
+            models.Index(fields=['price', 'id'], name='product_price_id_idx'),
+            models.Index(fields=['rating_avg', 'id'], name='product_rating_avg_id_idx'),
+            models.Index(fields=['rating_count', 'id'], name='product_rating_count_id_idx'),
+        ]
 
 
 class ProductReview(TimestampFields):
@@ -42,13 +53,19 @@ class ProductReview(TimestampFields):
     class Meta:
         verbose_name = 'Отзыв'
         verbose_name_plural = 'Отзывы'
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='review_created_at_id_idx'),
+            models.Index(fields=['updated_at'], name='review_updated_at_idx'),
+        ]
         unique_together = ["user", "product"]
 
 
 class ProductOrderPosition(models.Model):
-    product = models.ForeignKey(Product, related_name='orders', on_delete=models.CASCADE, verbose_name='Товар')
+    product = models.ForeignKey(Product, related_name='orders', on_delete=models.CASCADE, verbose_name='Товар',
+                                db_constraint=False)
     order = models.ForeignKey("Order", related_name='positions', on_delete=models.CASCADE, verbose_name='Заказ')
     quantity = models.PositiveIntegerField(default=1, verbose_name='Количество')
+    unit_price = models.DecimalField(verbose_name='Цена за единицу', max_digits=10, decimal_places=2)
 
     class Meta:
         verbose_name = 'Позиция'
@@ -56,7 +73,8 @@ class ProductOrderPosition(models.Model):
 
 
 class Order(TimestampFields):
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, verbose_name='Пользователь', on_delete=models.CASCADE)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, verbose_name='Пользователь', on_delete=models.CASCADE,
+                             db_constraint=False)
     order_status = models.TextField(choices=OrderStatusChoices.choices, default=OrderStatusChoices.NEW,
                                     verbose_name='Статус')
     products = models.ManyToManyField(Product, related_name='order',
@@ -69,6 +87,13 @@ class Order(TimestampFields):
     class Meta:
         verbose_name = 'Заказ'
         verbose_name_plural = 'Заказы'
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='order_created_at_id_idx'),
+            models.Index(fields=['user', 'created_at', 'id'], name='order_user_created_at_id_idx'),
+            models.Index(fields=['order_status', 'created_at', 'id'], name='order_status_created_at_id_idx'),
+            models.Index(fields=['updated_at'], name='order_updated_at_idx'),
+            models.Index(fields=['total'], name='order_total_idx'),
+        ]
 
 
 class ProductCollection(TimestampFields):
@@ -82,3 +107,123 @@ class ProductCollection(TimestampFields):
     class Meta:
         verbose_name = 'Подборка товаров'
         verbose_name_plural = 'Подборки товаров'
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='collection_created_at_id_idx'),
+        ]
+
+
+class ProductSalesDay(models.Model):
+    """Продажи продукта за день создания заказа (store.analytics)."""
+    product = models.ForeignKey(Product, related_name='sales_days', on_delete=models.CASCADE, verbose_name='Товар')
+    day = models.DateField(verbose_name='День')
+    quantity = models.BigIntegerField(default=0, verbose_name='Продано штук')
+    revenue = models.DecimalField(default=0, max_digits=16, decimal_places=2, verbose_name='Выручка')
+
+    class Meta:
+        verbose_name = 'Продажи товара за день'
+        verbose_name_plural = 'Продажи товаров по дням'
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'day'], name='product_sales_day_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['day', 'product'], name='product_sales_day_idx'),
+        ]
+
+
+class OrderStatusDay(models.Model):
+    """Заказы по статусу за день создания заказа (store.analytics)."""
+    order_status = models.TextField(choices=OrderStatusChoices.choices, verbose_name='Статус')
+    day = models.DateField(verbose_name='День')
+    orders = models.BigIntegerField(default=0, verbose_name='Заказов')
+    revenue = models.DecimalField(default=0, max_digits=16, decimal_places=2, verbose_name='Сумма заказов')
+
+    class Meta:
+        verbose_name = 'Заказы по статусу за день'
+        verbose_name_plural = 'Заказы по статусам и дням'
+        constraints = [
+            models.UniqueConstraint(fields=['order_status', 'day'], name='order_status_day_unique'),
+        ]
+
+
+class ArchivedOrderPosition(models.Model):
+    """Позиция заказа, перенесенного в архив (store.archive); ID совпадает с исходной позицией."""
+    id = models.IntegerField(primary_key=True)
+    product = models.ForeignKey(Product, related_name='archived_positions', on_delete=models.CASCADE,
+                                verbose_name='Товар', db_constraint=False)
+    order = models.ForeignKey('ArchivedOrder', related_name='positions', on_delete=models.CASCADE,
+                              verbose_name='Заказ')
+    quantity = models.PositiveIntegerField(default=1, verbose_name='Количество')
+    unit_price = models.DecimalField(verbose_name='Цена за единицу', max_digits=10, decimal_places=2)
+
+    class Meta:
+        verbose_name = 'Позиция архивного заказа'
+        verbose_name_plural = 'Позиции архивных заказов'
+
+
+class ArchivedOrder(models.Model):
+    """Выполненный заказ, перенесенный из Order в архив (store.archive); ID и даты сохраняются."""
+    id = models.IntegerField(primary_key=True)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, verbose_name='Пользователь', on_delete=models.CASCADE,
+                             db_constraint=False)
+    order_status = models.TextField(choices=OrderStatusChoices.choices, verbose_name='Статус')
+    products = models.ManyToManyField(Product, related_name='archived_orders',
+                                      through=ArchivedOrderPosition, verbose_name='Позиции')
+    total = models.DecimalField(verbose_name='Общая сумма', null=True, decimal_places=2, max_digits=10)
+    created_at = models.DateTimeField(verbose_name='Дата создания')
+    updated_at = models.DateTimeField(verbose_name='Дата обновления')
+    archived_at = models.DateTimeField(verbose_name='Дата архивации', auto_now_add=True)
+
+    def __str__(self):
+        return f'ID_{self.id} - {self.user}, total - {self.total}'
+
+    class Meta:
+        verbose_name = 'Архивный заказ'
+        verbose_name_plural = 'Архивные заказы'
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='archived_order_created_id_idx'),
+            models.Index(fields=['user', 'created_at', 'id'], name='archived_order_user_idx'),
+        ]
+
+
+class IdSequence(models.Model):
+    """Следующий свободный ID заказов / позиций для всех шардов (store.sharding.IdAllocator)."""
+    name = models.CharField(primary_key=True, max_length=50, verbose_name='Последовательность')
+    next_id = models.BigIntegerField(verbose_name='Следующий ID')
+
+    class Meta:
+        verbose_name = 'Последовательность ID'
+        verbose_name_plural = 'Последовательности ID'
+
+
+class JobStatusChoices(models.TextChoices):
+    QUEUED = 'QUEUED', 'В очереди'
+    RUNNING = 'RUNNING', 'Выполняется'
+    DONE = 'DONE', 'Выполнена'
+    FAILED = 'FAILED', 'Ошибка'
+
+
+class Job(models.Model):
+    """Фоновая задача (store.jobs): имя зарегистрированной функции и ее аргументы."""
+    name = models.CharField(max_length=100, verbose_name='Задача')
+    payload = models.JSONField(default=dict, verbose_name='Аргументы')
+    status = models.CharField(max_length=10, choices=JobStatusChoices.choices, default=JobStatusChoices.QUEUED,
+                              verbose_name='Статус')
+    attempts = models.PositiveIntegerField(default=0, verbose_name='Попыток')
+    max_attempts = models.PositiveIntegerField(verbose_name='Максимум попыток')
+    run_at = models.DateTimeField(verbose_name='Выполнить не раньше')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name='Начало выполнения')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='Окончание выполнения')
+    locked_by = models.CharField(max_length=100, blank=True, verbose_name='Воркер')
+    last_error = models.TextField(blank=True, verbose_name='Последняя ошибка')
+
+    def __str__(self):
+        return f'ID_{self.id} - {self.name} ({self.status})'
+
+    class Meta:
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        indexes = [
+            models.Index(fields=['status', 'run_at', 'id'], name='job_status_run_at_idx'),
+            models.Index(fields=['status', 'finished_at'], name='job_status_finished_at_idx'),
+        ]
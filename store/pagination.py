@@ -0,0 +1,218 @@
+import base64
+import binascii
+import datetime
+import decimal
+import json
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Постраничный вывод по ключу (keyset): вместо OFFSET страница начинается
+    строго после значений полей сортировки последней записи предыдущей страницы,
+    поэтому глубокие страницы стоят столько же, сколько первая.
+
+    Курсор непрозрачный - это base64 от значений полей сортировки и направления.
+    Сортировка берется из атрибута вьюсета `keyset_ordering`, по умолчанию
+    `(created_at, id)`; последнее поле должно быть уникальным. Клиент может
+    выбрать сортировку параметром `?ordering=` из `ordering_fields` вьюсета;
+    id добавляется в том же направлении, чтобы сортировку обслуживал индекс
+    `(поле, id)` без досортировки.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    ordering_param = 'ordering'
+    ordering = ('created_at', 'id')
+    invalid_cursor_message = 'Некорректный курсор'
+    display_page_controls = False
+
+    def __init__(self):
+        self.page_size = api_settings.PAGE_SIZE
+        self.max_page_size = getattr(settings, 'STORE_MAX_PAGE_SIZE', 100)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.ordering = self.get_ordering(request, queryset, view)
+        cursor = self.decode_cursor(request, queryset)
+        reverse = cursor is not None and cursor[1]
+
+        if cursor is not None:
+            queryset = queryset.filter(self.keyset_filter(self.ordering, cursor[0], reverse))
+        ordering = invert_ordering(self.ordering) if reverse else self.ordering
+        results = list(queryset.order_by(*ordering)[:self.page_size + 1])
+
+        has_following = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+            self.has_next, self.has_previous = True, has_following
+        else:
+            self.has_next, self.has_previous = has_following, cursor is not None
+
+        self.page = results
+        return results
+
+    def get_page_size(self, request):
+        page_size = self.page_size
+        if self.page_size_query_param in request.query_params:
+            try:
+                page_size = int(request.query_params[self.page_size_query_param])
+            except (TypeError, ValueError):
+                pass
+            else:
+                if page_size <= 0:
+                    page_size = self.page_size
+        if page_size and self.max_page_size:
+            page_size = min(page_size, self.max_page_size)
+        return page_size
+
+    def get_ordering(self, request, queryset, view):
+        requested = request.query_params.get(self.ordering_param, '')
+        if requested.lstrip('-') in getattr(view, 'ordering_fields', ()):
+            return requested, '-id' if requested.startswith('-') else 'id'
+        return tuple(getattr(view, 'keyset_ordering', self.ordering))
+
+    @staticmethod
+    def keyset_filter(ordering, values, reverse=False):
+        """
+        Условие "строго после `values`" для сортировки `ordering`:
+        (f1 > v1) OR (f1 = v1 AND f2 > v2) OR ...
+        Первое поле дополнительно ограничено нестрогим сравнением, чтобы
+        по нему можно было пройти диапазоном по индексу.
+        """
+        fields = [(name.lstrip('-'), name.startswith('-') != reverse) for name in ordering]
+        condition = Q()
+        equal = Q()
+        for (field, descending), value in zip(fields, values):
+            lookup = 'lt' if descending else 'gt'
+            condition |= equal & Q(**{f'{field}__{lookup}': value})
+            equal &= Q(**{field: value})
+        first_field, first_descending = fields[0]
+        bound = Q(**{f"{first_field}__{'lte' if first_descending else 'gte'}": values[0]})
+        return bound & condition
+
+    def get_position(self, instance):
+        values = []
+        for name in self.ordering:
+            field = name.lstrip('-')
+            if isinstance(instance, dict):
+                value = instance[field]
+            else:
+                value = instance
+                for attr in field.split('__'):
+                    value = getattr(value, attr)
+            values.append(value)
+        return values
+
+    def encode_cursor(self, position, reverse):
+        payload = json.dumps({'p': position, 'r': int(reverse)}, cls=CursorEncoder, separators=(',', ':'))
+        cursor = base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request, queryset):
+        """
+        Позиция и направление из курсора. Значения приводятся к типам полей
+        сортировки (`to_python`), поэтому подделанный курсор дает 404, а не 500.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            position, reverse = payload['p'], bool(payload['r'])
+        except (TypeError, ValueError, KeyError, UnicodeError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            position = [to_python(ordering_field(queryset, name.lstrip('-')), value)
+                        for name, value in zip(self.ordering, position)]
+        except (ValidationError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.page:
+            return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+        return self.encode_cursor(self.get_position(self.page[-1]), reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+        return self.encode_cursor(self.get_position(self.page[0]), reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+
+def ordering_field(queryset, name):
+    """Поле модели (через `__` по связям) или выражение аннотации `name` из queryset."""
+    annotation = queryset.query.annotations.get(name)
+    if annotation is not None:
+        return annotation.output_field
+    model = queryset.model
+    *relations, field_name = name.split('__')
+    for relation in relations:
+        model = model._meta.get_field(relation).related_model
+    return model._meta.get_field(field_name)
+
+
+def to_python(field, value):
+    if value is None:
+        if not field.null:
+            raise ValueError(f'{field.name} не может быть пустым')
+        return None
+    if isinstance(value, (dict, list)):
+        raise TypeError(f'Недопустимое значение {field.name}')
+    return field.to_python(value)
+
+
+class CursorEncoder(json.JSONEncoder):
+    """
+    В отличие от DjangoJSONEncoder не обрезает микросекунды: значение
+    в курсоре должно совпадать с хранимым в базе до последнего знака.
+    """
+
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.date, datetime.time)):
+            return o.isoformat()
+        if isinstance(o, (decimal.Decimal, uuid.UUID)):
+            return str(o)
+        return super().default(o)
+
+
+def invert_ordering(ordering):
+    return tuple(name[1:] if name.startswith('-') else f'-{name}' for name in ordering)
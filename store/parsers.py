@@ -0,0 +1,77 @@
+import json
+
+import orjson
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, JSONParser
+from rest_framework.settings import api_settings
+from rest_framework.utils.json import strict_constant
+
+from .renderers import FastJSONRenderer
+
+DIGITS = bytes(ord('0') if byte in b'0123456789' else ord(' ') for byte in range(256))
+LONG_NUMBER = b'0' * 19
+
+
+def loads(content, strict=True):
+    """
+    Разбирает JSON в байтах в UTF-8 с тем же результатом, что json.loads.
+    orjson целые больше 64 бит молча читает как float, поэтому тело с 19 и
+    более цифрами подряд (ищутся в копии, где цифры заменены нулями, а
+    остальное - пробелами), как и тело, которое orjson отклонил (числа вне
+    диапазона double вроде 1e400, одиночные суррогаты, NaN), разбирается
+    json.loads; NaN и Infinity при `strict` отклоняются, как в DRF.
+    """
+    if LONG_NUMBER not in content.translate(DIGITS):
+        try:
+            return orjson.loads(content)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(content, parse_constant=strict_constant if strict else None)
+
+
+class FastJSONParser(JSONParser):
+    """
+    JSONParser на orjson с тем же результатом и теми же ошибками, что у
+    JSONParser DRF: тела, которые orjson разбирает иначе или отклоняет,
+    разбирает json (см. `loads`). Тело в кодировке, отличной от UTF-8,
+    сначала перекодируется.
+    """
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        content = stream.read()
+        try:
+            if encoding.lower().replace('-', '') != 'utf8':
+                content = content.decode(encoding).encode('utf-8')
+            return loads(content, self.strict)
+        except ValueError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
+
+
+class JSONLinesParser(BaseParser):
+    """
+    Поток JSON объектов по одному на строку (JSON Lines / NDJSON).
+    Результат разбора - список объектов, пустые строки пропускаются.
+    """
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        items = []
+        for number, line in enumerate(stream, start=1):
+            line = line.decode(encoding).strip()
+            if not line:
+                continue
+            try:
+                items.append(loads(line.encode('utf-8'), api_settings.STRICT_JSON))
+            except ValueError as exc:
+                raise ParseError(f'JSON parse error in line {number} - {exc}')
+        return items
+
+
+class JSONLParser(JSONLinesParser):
+    media_type = 'application/jsonl'
@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.db import router
+from django.db.models import Count, F, Window
+from django.db.models.functions import RowNumber
+
+from .models import Product
+
+PREVIEW_ORDERING = ('created_at', 'id')
+
+
+def preview_size():
+    return getattr(settings, 'STORE_COLLECTION_PREVIEW_SIZE', 10)
+
+
+def collection_previews(collection_ids, size, using=None):
+    """
+    Первые `size` продуктов каждой подборки и общее число продуктов в ней
+    одним запросом: номер строки и размер подборки считаются оконными
+    функциями по связи, а внешний запрос отбрасывает строки дальше `size`.
+    Возвращает {id подборки: (количество, [продукты])}.
+    """
+    previews = {collection_id: (0, []) for collection_id in collection_ids}
+    if not previews:
+        return previews
+    using = using or router.db_for_read(Product)
+    partition = [F('product_collections__id')]
+    ranked = Product.objects.using(using).filter(product_collections__in=list(previews)).annotate(
+        preview_collection=F('product_collections__id'),
+        preview_rank=Window(RowNumber(), partition_by=partition,
+                            order_by=[F(name).asc() for name in PREVIEW_ORDERING]),
+        preview_total=Window(Count('id'), partition_by=partition),
+    )
+    sql, params = ranked.query.sql_with_params()
+    rows = Product.objects.using(using).raw(
+        f'SELECT * FROM ({sql}) ranked WHERE preview_rank <= %s ORDER BY preview_collection, preview_rank',
+        [*params, size],
+    )
+    for product in rows:
+        _, products = previews[product.preview_collection]
+        products.append(product)
+        previews[product.preview_collection] = (product.preview_total, products)
+    return previews
+
+
+def attach_previews(collections, size=None, using=None):
+    """Проставляет подборкам `preview_products` и `products_count` для сериализатора."""
+    collections = [collection for collection in collections if not hasattr(collection, 'preview_products')]
+    if not collections:
+        return
+    size = preview_size() if size is None else size
+    previews = collection_previews([collection.id for collection in collections], size,
+                                   using=using or collections[0]._state.db)
+    for collection in collections:
+        collection.products_count, collection.preview_products = previews[collection.id]
@@ -0,0 +1,70 @@
+from django.db import transaction
+from django.db.models import Case, Count, ExpressionWrapper, F, FloatField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce
+from django.utils import timezone
+
+from .cache import bump_generation
+from .models import Product, ProductReview
+
+
+def average_expression(grade_delta=0, count_delta=0):
+    """Средняя оценка после изменения суммы и количества на `grade_delta` / `count_delta`."""
+    return Case(
+        When(rating_count=-count_delta, then=Value(0.0)),
+        default=ExpressionWrapper(
+            Cast(F('rating_sum') + grade_delta, FloatField()) / (F('rating_count') + count_delta),
+            output_field=FloatField(),
+        ),
+        output_field=FloatField(),
+    )
+
+
+def apply_review_delta(product_id, grade_delta, count_delta):
+    """
+    Инкрементально обновляет агрегаты оценок продукта одним UPDATE.
+    Все выражения вычисляются по старым значениям строки, поэтому
+    параллельные отзывы не теряются. Вызывать внутри транзакции изменения отзыва.
+
+    Если агрегаты разошлись с отзывами (например, отзывы созданы в обход API)
+    и уменьшение увело бы их в минус, они пересчитываются для продукта целиком.
+    """
+    updated = Product.objects.filter(
+        id=product_id,
+        rating_count__gte=max(-count_delta, 0),
+        rating_sum__gte=max(-grade_delta, 0),
+    ).update(
+        rating_sum=F('rating_sum') + grade_delta,
+        rating_count=F('rating_count') + count_delta,
+        rating_avg=average_expression(grade_delta, count_delta),
+        updated_at=timezone.now(),
+    )
+    if not updated:
+        recalculate(Product.objects.filter(id=product_id))
+    bump_generation('store.product')
+
+
+def recalculate(products):
+    """Пересчитывает агрегаты оценок для продуктов из `products` по таблице отзывов."""
+    reviews = ProductReview.objects.using(products.db).filter(product=OuterRef('pk')).order_by().values('product')
+    products.update(
+        rating_count=Coalesce(Subquery(reviews.annotate(value=Count('id')).values('value')), 0),
+        rating_sum=Coalesce(Subquery(reviews.annotate(value=Sum('grade')).values('value')), 0),
+        updated_at=timezone.now(),
+    )
+    products.update(rating_avg=average_expression())
+
+
+def rebuild_ratings(chunk_size=10000, using='default'):
+    """Пересчитывает агрегаты оценок всех продуктов порциями по диапазонам ID."""
+    products = Product.objects.using(using)
+    updated = 0
+    last_id = 0
+    while True:
+        ids = list(products.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:chunk_size])
+        if not ids:
+            return updated
+        with transaction.atomic(using=using):
+            recalculate(products.filter(id__gte=ids[0], id__lte=ids[-1]))
+        bump_generation('store.product')
+        updated += len(ids)
+        last_id = ids[-1]
@@ -0,0 +1,84 @@
+import decimal
+import math
+
+import orjson
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+LINE_SEPARATORS = ((b'\xe2\x80\xa8', b'\\u2028'), (b'\xe2\x80\xa9', b'\\u2029'))
+
+_fallback = JSONEncoder().default
+
+
+def default(value):
+    if isinstance(value, decimal.Decimal):
+        if not value.is_finite():
+            raise ValueError(f'Out of range float values are not JSON compliant: {value!r}')
+        return float(value)
+    return _fallback(value)
+
+
+def has_non_finite(data, content):
+    """
+    Есть ли в данных NaN или Infinity, которые orjson записал в `content` как
+    null. Сначала без обхода в Python: null нет, все null - это None верхнего
+    уровня (как "previous" в ответе со страницей) или JSON, разобранный
+    обратно, равен данным. Иначе данные обходятся.
+    """
+    nulls = content.count(b'null')
+    if not nulls:
+        return False
+    top = list(data.values()) if isinstance(data, dict) else data if isinstance(data, list) else []
+    if nulls == top.count(None) or orjson.loads(content) == data:
+        return False
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, float):
+            if not math.isfinite(value):
+                return True
+        elif isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+    return False
+
+
+def dumps(data):
+    """
+    JSON в байтах через orjson, совпадающий с выводом JSONRenderer DRF при
+    UNICODE_JSON / COMPACT_JSON / STRICT_JSON: dict, list, str, числа, даты и
+    UUID кодируются в C без обхода в Python, Decimal - как float, остальное
+    (ленивые строки, QuerySet, timedelta...) - кодировщиком DRF. NaN и
+    Infinity orjson записывает как null, поэтому для них, как у json.dumps
+    при STRICT_JSON, поднимается ValueError (см. has_non_finite). Расходится
+    с json.dumps только записью float с экспонентой (1e16 вместо 1e+16).
+    """
+    content = orjson.dumps(data, default=default, option=OPTIONS)
+    if has_non_finite(data, content):
+        raise ValueError('Out of range float values are not JSON compliant')
+    for raw, escaped in LINE_SEPARATORS:
+        if raw in content:
+            content = content.replace(raw, escaped)
+    return content
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer на orjson. С отступами (`; indent=N`, Browsable API) и для
+    данных, которые orjson не кодирует (целые больше 64 бит, NaN и Infinity),
+    используется рендерер DRF: при STRICT_JSON он поднимает ValueError, без
+    него записывает NaN.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if indent is None and self.compact and not self.ensure_ascii and self.strict:
+            try:
+                return dumps(data)
+            except (orjson.JSONEncodeError, ValueError):
+                pass
+        return super().render(data, accepted_media_type, renderer_context)
@@ -0,0 +1,119 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.permissions import SAFE_METHODS
+
+PIN_KEY_PREFIX = 'store:primary-pin'
+
+_read_database = ContextVar('store_read_database', default=None)
+
+
+def routing_settings():
+    options = {'REPLICAS': {}, 'PIN_SECONDS': 5, 'CACHE': 'default'}
+    options.update(getattr(settings, 'STORE_DATABASE_ROUTING', {}))
+    return options
+
+
+def choose_replica(replicas, rng=random):
+    """Реплика, выбранная случайно пропорционально весу; None, если реплик нет."""
+    replicas = {alias: weight for alias, weight in replicas.items() if weight > 0}
+    if not replicas:
+        return None
+    aliases = list(replicas)
+    return rng.choices(aliases, weights=[replicas[alias] for alias in aliases])[0]
+
+
+def pin_key(user_id):
+    return f'{PIN_KEY_PREFIX}:{user_id}'
+
+
+def pin_to_primary(request):
+    """После записи клиент на PIN_SECONDS читает с основной базы, чтобы видеть свои изменения."""
+    options = routing_settings()
+    user = getattr(request, 'user', None)
+    if not options['REPLICAS'] or user is None or not user.is_authenticated:
+        return
+    caches[options['CACHE']].set(pin_key(user.pk), True, timeout=options['PIN_SECONDS'])
+
+
+def is_pinned(request):
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return False
+    return caches[routing_settings()['CACHE']].get(pin_key(user.pk), False)
+
+
+def read_database(request):
+    """База для чтения в запросе: реплика для безопасных методов, если клиент не закреплен за основной."""
+    options = routing_settings()
+    if request.method not in SAFE_METHODS or not options['REPLICAS'] or is_pinned(request):
+        return None
+    return choose_replica(options['REPLICAS'])
+
+
+def current_read_database():
+    """Реплика, с которой читает текущий запрос, или None."""
+    alias = _read_database.get()
+    return alias if alias in routing_settings()['REPLICAS'] else None
+
+
+class ReplicaRouter:
+    """
+    Чтение внутри запроса, для которого ReplicaReadMixin выбрал реплику,
+    идет на эту реплику; запись объектов, прочитанных с реплики, - на основную
+    базу, остальное роутер оставляет Django. Реплики задаются в
+    STORE_DATABASE_ROUTING['REPLICAS'] как {alias из DATABASES: вес}.
+    """
+
+    def db_for_read(self, model, **hints):
+        return current_read_database()
+
+    def db_for_write(self, model, **hints):
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db in routing_settings()['REPLICAS']:
+            return DEFAULT_DB_ALIAS
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *routing_settings()['REPLICAS']}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in routing_settings()['REPLICAS']:
+            return False
+        return None
+
+
+class ReplicaReadMixin:
+    """
+    Отправляет чтение GET / HEAD / OPTIONS запросов вьюсета на реплику
+    (ReplicaRouter). После успешной записи через вьюсет клиент закрепляется
+    за основной базой на STORE_DATABASE_ROUTING['PIN_SECONDS'] секунд.
+    """
+
+    read_database_token = None
+
+    def dispatch(self, request, *args, **kwargs):
+        # finalize_response не вызывается при необработанном исключении, поэтому реплика сбрасывается здесь
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            if self.read_database_token is not None:
+                _read_database.reset(self.read_database_token)
+                self.read_database_token = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        alias = read_database(request)
+        if alias is not None:
+            self.read_database_token = _read_database.set(alias)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            pin_to_primary(request)
+        return super().finalize_response(request, response, *args, **kwargs)
@@ -0,0 +1,133 @@
+import re
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+from .models import Product
+
+POSTGRES_TABLE = 'store_product_search'
+SQLITE_TABLE = 'store_product_fts'
+
+_available_tables = {}
+
+
+def search_config():
+    return getattr(settings, 'STORE_SEARCH_CONFIG', 'russian')
+
+
+def has_index(connection):
+    """Есть ли в базе `connection` теневая таблица полнотекстового поиска."""
+    if connection.alias not in _available_tables:
+        table = POSTGRES_TABLE if connection.vendor == 'postgresql' else SQLITE_TABLE
+        _available_tables[connection.alias] = table in connection.introspection.table_names()
+    return _available_tables[connection.alias]
+
+
+def fts5_query(query):
+    """Запрос FTS5 из пользовательской строки: все слова в кавычках, через AND."""
+    return ' '.join(f'"{word}"' for word in re.findall(r'\w+', query))
+
+
+def search_products(queryset, query):
+    """
+    Фильтрует продукты по полнотекстовому запросу и добавляет аннотацию
+    `search_rank` (чем больше, тем релевантнее).
+
+    На PostgreSQL используется tsvector из таблицы `store_product_search`
+    с GIN индексом, на SQLite - FTS5 таблица `store_product_fts`. ts_rank
+    возвращает real и приводится к float8: иначе значение в курсоре после
+    перевода в double не совпадает с рангом в базе и страницы на границе
+    одинаковых рангов теряют или повторяют строки.
+    Если индекса нет, поиск сводится к `icontains` по названию и описанию.
+    """
+    connection = connections[queryset.db]
+    table = Product._meta.db_table
+    if connection.vendor == 'postgresql' and has_index(connection):
+        config = search_config()
+        matched = RawSQL(
+            f'SELECT product_id FROM {POSTGRES_TABLE} WHERE document @@ plainto_tsquery(%s::regconfig, %s)',
+            (config, query),
+        )
+        rank = RawSQL(
+            f'SELECT ts_rank(s.document, plainto_tsquery(%s::regconfig, %s))::float8 FROM {POSTGRES_TABLE} s '
+            f'WHERE s.product_id = "{table}"."id"',
+            (config, query),
+            output_field=FloatField(),
+        )
+    elif connection.vendor == 'sqlite' and has_index(connection):
+        match = fts5_query(query)
+        if not match:
+            return queryset.none()
+        matched = RawSQL(f'SELECT rowid FROM {SQLITE_TABLE} WHERE {SQLITE_TABLE} MATCH %s', (match,))
+        rank = RawSQL(
+            f'SELECT -bm25({SQLITE_TABLE}, 10.0, 1.0) FROM {SQLITE_TABLE} '
+            f'WHERE {SQLITE_TABLE} MATCH %s AND rowid = "{table}"."id"',
+            (match,),
+            output_field=FloatField(),
+        )
+    else:
+        return queryset.filter(
+            Q(name__icontains=query) | Q(description__icontains=query)
+        ).annotate(search_rank=Value(0.0, output_field=FloatField()))
+    return queryset.filter(id__in=matched).annotate(search_rank=rank)
+
+
+def update_index(product_ids, using='default'):
+    """Переиндексирует продукты с указанными ID (добавленные, измененные)."""
+    product_ids = list(product_ids)
+    connection = connections[using]
+    if not product_ids or not has_index(connection):
+        return
+    table = Product._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                f'INSERT INTO {POSTGRES_TABLE} (product_id, document) '
+                f"SELECT id, setweight(to_tsvector(%s::regconfig, name), 'A') || "
+                f"setweight(to_tsvector(%s::regconfig, description), 'B') "
+                f'FROM {table} WHERE id = ANY(%s) '
+                f'ON CONFLICT (product_id) DO UPDATE SET document = EXCLUDED.document',
+                (search_config(), search_config(), product_ids),
+            )
+        else:
+            placeholders = ', '.join(['%s'] * len(product_ids))
+            cursor.execute(f'DELETE FROM {SQLITE_TABLE} WHERE rowid IN ({placeholders})', product_ids)
+            cursor.execute(
+                f'INSERT INTO {SQLITE_TABLE} (rowid, name, description) '
+                f'SELECT id, name, description FROM {table} WHERE id IN ({placeholders})',
+                product_ids,
+            )
+
+
+def remove_from_index(product_ids, using='default'):
+    product_ids = list(product_ids)
+    connection = connections[using]
+    if not product_ids or not has_index(connection):
+        return
+    placeholders = ', '.join(['%s'] * len(product_ids))
+    column = 'product_id' if connection.vendor == 'postgresql' else 'rowid'
+    table = POSTGRES_TABLE if connection.vendor == 'postgresql' else SQLITE_TABLE
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table} WHERE {column} IN ({placeholders})', product_ids)
+
+
+def rebuild_index(using='default', chunk_size=10000):
+    """Полностью перестраивает индекс, проходя по продуктам порциями."""
+    connection = connections[using]
+    if not has_index(connection):
+        return 0
+    table = POSTGRES_TABLE if connection.vendor == 'postgresql' else SQLITE_TABLE
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table}')
+    total = 0
+    last_id = 0
+    while True:
+        ids = list(Product.objects.using(using).filter(id__gt=last_id).order_by('id')
+                   .values_list('id', flat=True)[:chunk_size])
+        if not ids:
+            return total
+        update_index(ids, using=using)
+        total += len(ids)
+        last_id = ids[-1]
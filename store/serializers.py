@@ -1,22 +1,29 @@
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 from django.contrib.auth.models import User
+from django.db import connections, models, transaction
+from .analytics import SalesDelta, order_state, record_order_change
 from .models import Order, ProductOrderPosition, ProductCollection, Product, ProductReview
+from .previews import attach_previews
+from .ratings import apply_review_delta
+from .sharding import assign_ids, shard_for_user
+from .sparse import SparseFieldsMixin
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ('id', 'username', 'first_name', 'last_name',)
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Product
-        fields = ('id', 'name', 'description', 'price')
+        fields = ('id', 'sku', 'name', 'description', 'price', 'rating_avg', 'rating_count')
+        read_only_fields = ('rating_avg', 'rating_count')
 
 
-class ProductReviewSerializer(serializers.ModelSerializer):
+class ProductReviewSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     product = ProductSerializer(
         read_only=True,
     )
@@ -43,57 +50,148 @@ class ProductReviewSerializer(serializers.ModelSerializer):
         else:
             validated_data['user'] = self.context['request'].user
             validated_data['product'] = Product.objects.get(id=self.context['request'].data['product_id'])
-        return super().create(validated_data)
+        with transaction.atomic():
+            review = super().create(validated_data)
+            apply_review_delta(review.product_id, review.grade, 1)
+        return review
+
+    def update(self, instance, validated_data):
+        old_grade = instance.grade
+        with transaction.atomic():
+            review = super().update(instance, validated_data)
+            if review.grade != old_grade:
+                apply_review_delta(review.product_id, review.grade - old_grade, 0)
+        return review
+
+
+class ProductCollectionListSerializer(serializers.ListSerializer):
+
+    def to_representation(self, data):
+        collections = list(data.all() if isinstance(data, models.Manager) else data)
+        attach_previews(collections)
+        return super().to_representation(collections)
 
 
-class ProductCollectionSerializer(serializers.ModelSerializer):
+class ProductCollectionSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """
+    В ответе только первые STORE_COLLECTION_PREVIEW_SIZE продуктов подборки и их общее
+    количество; весь состав отдается постранично в /product-collections/{id}/products/.
+    """
     products = ProductSerializer(
         many=True,
-        read_only=True
+        read_only=True,
+        source='preview_products',
     )
+    products_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = ProductCollection
-        fields = ('id', 'title', 'text', 'products', 'created_at', 'updated_at')
+        fields = ('id', 'title', 'text', 'products', 'products_count', 'created_at', 'updated_at')
+        list_serializer_class = ProductCollectionListSerializer
+
+    def to_representation(self, instance):
+        attach_previews([instance])
+        return super().to_representation(instance)
 
     def validate(self, data):
-        products_list = self.context['request'].data['products']
-        id_list = []
-        for product in products_list:
-            id_list.append(product.get('product_id'))
-            if not Product.objects.filter(id=product['product_id']):
-                raise serializers.ValidationError(f"продукта с ID {product['product_id']} не существует")
+        products_list = self.context['request'].data.get('products')
+        if products_list is None:
+            self.product_ids = None
+            return data
+        try:
+            id_list = [int(product['product_id']) for product in products_list]
+        except (TypeError, ValueError, KeyError):
+            raise serializers.ValidationError('некорректный список продуктов')
         if len(set(id_list)) != len(id_list):
             raise serializers.ValidationError("продукты в одной подборке не могут повторяться")
-
+        existing = set(Product.objects.filter(id__in=id_list).values_list('id', flat=True))
+        missing = [product_id for product_id in id_list if product_id not in existing]
+        if missing:
+            raise serializers.ValidationError(f"продукта с ID {', '.join(map(str, missing))} не существует")
+        self.product_ids = id_list
         return data
 
     def create(self, validated_data):
-        product_ids_list = []
-        for product in self.context['request'].data['products']:
-            product_ids_list.append(product['product_id'])
-        validated_data['products'] = Product.objects.filter(id__in=product_ids_list)
-        return super().create(validated_data)
+        with transaction.atomic():
+            instance = super().create(validated_data)
+            if self.product_ids:
+                instance.products.add(*self.product_ids)
+        return instance
 
     def update(self, instance, validated_data):
-        product_ids_list = []
-        for product in self.context['request'].data['products']:
-            product_ids_list.append(product['product_id'])
-        instance.products.clear()
-        instance.products.add(*product_ids_list)
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
-        instance.save()
+        """
+        Состав подборки меняется разницей: удаляются и добавляются только
+        изменившиеся продукты (с сигналами m2m_changed), остальные связи не трогаются.
+        """
+        with transaction.atomic():
+            if self.product_ids is not None:
+                current = set(instance.products.values_list('id', flat=True))
+                removed = current.difference(self.product_ids)
+                added = [product_id for product_id in self.product_ids if product_id not in current]
+                if removed:
+                    instance.products.remove(*removed)
+                if added:
+                    instance.products.add(*added)
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+            instance.save()
         return instance
 
 
-class ProductOrderPositionSerializer(serializers.ModelSerializer):
+class PositionProductField(serializers.PrimaryKeyRelatedField):
+    """
+    Продукт позиции заказа. Если список позиций уже загрузил все продукты
+    одним запросом, берет продукт оттуда вместо отдельного запроса на позицию.
+    """
+
+    def to_internal_value(self, data):
+        products = getattr(self.parent.parent, 'products_by_id', None)
+        if products is None:
+            return super().to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            return products[int(data)]
+        except KeyError:
+            self.fail('does_not_exist', pk_value=data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+
+class ProductOrderPositionListSerializer(serializers.ListSerializer):
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            self.products_by_id = self.context.get('products_by_id')
+            if self.products_by_id is None:
+                self.products_by_id = Product.objects.in_bulk(position_product_ids(data))
+        return super().to_internal_value(data)
+
+
+def position_product_ids(positions):
+    ids = set()
+    for position in positions:
+        product_id = position.get('product') if isinstance(position, dict) else None
+        if isinstance(product_id, bool):
+            continue
+        try:
+            ids.add(int(product_id))
+        except (TypeError, ValueError):
+            pass
+    return ids
+
+
+class ProductOrderPositionSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    product = PositionProductField(queryset=Product.objects.all())
+
     class Meta:
         model = ProductOrderPosition
-        fields = ('id', 'product', 'quantity')
+        fields = ('id', 'product', 'quantity', 'unit_price')
+        read_only_fields = ('unit_price',)
+        list_serializer_class = ProductOrderPositionListSerializer
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     products = ProductOrderPositionSerializer(
         many=True,
         source="positions",
@@ -118,48 +216,123 @@ class OrderSerializer(serializers.ModelSerializer):
                 raise serializers.ValidationError('Продукты не должны повторяться в заказе')
         return data
 
+    @staticmethod
+    def build_positions(order, positions_data):
+        """
+        Позиции заказа с зафиксированной ценой за единицу. Цены берутся
+        из продуктов, загруженных при валидации, без дополнительных запросов.
+        """
+        return [
+            ProductOrderPosition(
+                product=position['product'],
+                quantity=position['quantity'],
+                unit_price=position['product'].price,
+                order=order,
+            )
+            for position in positions_data
+        ]
+
+    @staticmethod
+    def positions_total(positions_data):
+        return sum((position['product'].price * position['quantity'] for position in positions_data), 0)
+
     def create(self, validated_data):
-        validated_data['user'] = self.context['request'].user
-        products_data = validated_data.pop('positions')
-        validated_data['total'] = 0
-        for product in products_data:
-            price = Product.objects.get(id=product['product'].id).price
-            validated_data['total'] += price * product['quantity']
-        order = super().create(validated_data)
-
-        if products_data:
-            to_save = []
-            for products in products_data:
-                to_save.append(ProductOrderPosition(
-                    product=products['product'],
-                    quantity=products['quantity'],
-                    order_id=order.id,
-                ))
-            ProductOrderPosition.objects.bulk_create(to_save)
-
-            return order
+        user = validated_data['user'] = self.context['request'].user
+        positions_data = validated_data.pop('positions')
+        validated_data['total'] = self.positions_total(positions_data)
+        using = shard_for_user(user.pk)
+        with transaction.atomic(using=using):
+            order, = assign_ids([Order(**validated_data)])
+            order.save(force_insert=True, using=using)
+            positions = ProductOrderPosition.objects.using(using).bulk_create(
+                assign_ids(self.build_positions(order, positions_data)))
+            record_order_change(None, order_state(order, positions), using)
+        return order
 
     def update(self, instance, validated_data):
-        validated_data['user'] = instance.user
-        if 'positions' in validated_data:
-            positions_data = validated_data.pop('positions')
-            instance.positions.all().delete()
-            total = 0
-            for product in positions_data:
-                price = Product.objects.get(id=product['product'].id).price
-                total += price * product['quantity']
-            instance.total = total
-            if positions_data:
-                to_save = []
-                for products in positions_data:
-                    to_save.append(ProductOrderPosition(
-                        product=products['product'],
-                        quantity=products['quantity'],
-                        order_id=instance.id,
-                    ))
-                ProductOrderPosition.objects.bulk_create(to_save)
-
-        if 'order_status' in validated_data:
-            instance.order_status = validated_data.pop('order_status')
-        instance.save()
+        using = instance._state.db
+        with transaction.atomic(using=using):
+            positions = list(instance.positions.all())
+            before = order_state(instance, positions)
+            if 'positions' in validated_data:
+                positions_data = validated_data.pop('positions')
+                instance.positions.all().delete()
+                positions = ProductOrderPosition.objects.using(using).bulk_create(
+                    assign_ids(self.build_positions(instance, positions_data)))
+                instance.total = self.positions_total(positions_data)
+
+            if 'order_status' in validated_data:
+                instance.order_status = validated_data.pop('order_status')
+            instance.save()
+            record_order_change(before, order_state(instance, positions), using)
         return instance
+
+
+def bulk_create_orders(items, context):
+    """
+    Создает заказы из списка `items` пакетно: все продукты загружаются одним
+    запросом, заказы и позиции вставляются несколькими bulk_create.
+    Невалидные заказы пропускаются, для каждого элемента возвращается результат
+    с его индексом: `{'index', 'status': 'created', 'id'}` или `{'index', 'status': 'error', 'errors'}`.
+    """
+    product_ids = set()
+    for item in items:
+        if isinstance(item, dict) and isinstance(item.get('products'), list):
+            product_ids |= position_product_ids(item['products'])
+    context = dict(context, products_by_id=Product.objects.in_bulk(product_ids))
+
+    results = {}
+    valid = []
+    for index, item in enumerate(items):
+        serializer = OrderSerializer(data=item, context=context)
+        if serializer.is_valid():
+            valid.append((index, serializer.validated_data))
+        else:
+            results[index] = {'index': index, 'status': 'error', 'errors': serializer.errors}
+
+    user = context['request'].user
+    orders = []
+    for index, validated_data in valid:
+        positions_data = validated_data.pop('positions')
+        order = Order(user=user, total=OrderSerializer.positions_total(positions_data), **validated_data)
+        orders.append((index, order, positions_data))
+
+    using = shard_for_user(user.pk)
+    with transaction.atomic(), transaction.atomic(using=using, savepoint=False):
+        new_orders = assign_ids(order for _, order, _ in orders)
+        if connections[using].features.can_return_rows_from_bulk_insert or all(order.pk for order in new_orders):
+            Order.objects.using(using).bulk_create(new_orders, batch_size=1000)
+        else:
+            for order in new_orders:
+                order.save(using=using)
+        positions = []
+        sales = SalesDelta()
+        for _, order, positions_data in orders:
+            order_positions = OrderSerializer.build_positions(order, positions_data)
+            sales.add(order_state(order, order_positions))
+            positions += order_positions
+        ProductOrderPosition.objects.using(using).bulk_create(assign_ids(positions), batch_size=1000)
+        sales.schedule(using)
+
+    for index, order, _ in orders:
+        results[index] = {'index': index, 'status': 'created', 'id': order.id}
+    return [results[index] for index in range(len(items))]
+
+
+class SalesSerializer(serializers.Serializer):
+    quantity = serializers.IntegerField()
+    revenue = serializers.DecimalField(max_digits=16, decimal_places=2)
+
+
+class DaySalesSerializer(SalesSerializer):
+    day = serializers.DateField()
+
+
+class ProductSalesSerializer(SalesSerializer):
+    product = serializers.IntegerField(source='product_id')
+
+
+class StatusSalesSerializer(serializers.Serializer):
+    order_status = serializers.CharField()
+    orders = serializers.IntegerField()
+    revenue = serializers.DecimalField(max_digits=16, decimal_places=2)
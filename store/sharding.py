@@ -0,0 +1,269 @@
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import F, Max
+
+from .archive import ArchiveUnion
+from .models import ArchivedOrder, ArchivedOrderPosition, IdSequence, Order, ProductOrderPosition
+
+SHARDED_MODELS = (Order, ProductOrderPosition, ArchivedOrder, ArchivedOrderPosition)
+SEQUENCES = {
+    Order: ('order', (Order, ArchivedOrder)),
+    ProductOrderPosition: ('position', (ProductOrderPosition, ArchivedOrderPosition)),
+}
+MOVES = ((Order, ProductOrderPosition), (ArchivedOrder, ArchivedOrderPosition))
+
+
+def sharding_settings():
+    options = {'SHARDS': [], 'ID_BLOCK_SIZE': 1000}
+    options.update(getattr(settings, 'STORE_ORDER_SHARDING', {}))
+    return options
+
+
+def order_shards():
+    """Базы с заказами; без шардирования - только основная."""
+    return list(sharding_settings()['SHARDS']) or [DEFAULT_DB_ALIAS]
+
+
+def sharding_enabled():
+    return len(order_shards()) > 1
+
+
+def jump_hash(key, buckets):
+    """
+    Jump consistent hash (Lamping, Veach): номер бакета от 0 до `buckets` - 1.
+    При добавлении бакета в конец на него переезжает около 1/buckets ключей,
+    остальные остаются на месте.
+    """
+    bucket, jump = -1, 0
+    while jump < buckets:
+        bucket = jump
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        jump = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return bucket
+
+
+def shard_for_user(user_id):
+    shards = order_shards()
+    return shards[jump_hash(int(user_id), len(shards))]
+
+
+def gather(tasks):
+    """Выполняет задачи параллельно, каждую в своем потоке со своими подключениями к базам."""
+    tasks = list(tasks)
+    if len(tasks) < 2:
+        return [task() for task in tasks]
+    with ThreadPoolExecutor(max_workers=len(tasks)) as executor:
+        return list(executor.map(run_task, tasks))
+
+
+def run_task(task):
+    try:
+        return task()
+    finally:
+        connections.close_all()
+
+
+def scatter(func, aliases=None):
+    """`func(alias)` для каждого шарда параллельно; результаты в порядке шардов."""
+    return gather(partial(func, alias) for alias in (aliases or order_shards()))
+
+
+def find_shard(model, pk):
+    """Шард, на котором лежит объект `model` с первичным ключом `pk`, или None."""
+    try:
+        pk = model._meta.pk.to_python(pk)
+    except ValidationError:
+        return None
+    shards = order_shards()
+    found = scatter(lambda alias: model.objects.using(alias).filter(pk=pk).exists(), shards)
+    return next((alias for alias, exists in zip(shards, found) if exists), None)
+
+
+class ShardUnion(ArchiveUnion):
+    """Объединение queryset с разных шардов: части вычисляются параллельно."""
+
+    def merge(self, parts):
+        return super().merge(gather(partial(list, part) for part in parts))
+
+
+def max_id(models):
+    return max((model.objects.using(alias).aggregate(value=Max('id'))['value'] or 0
+                for model in models for alias in order_shards()), default=0)
+
+
+def reserve_block(model, size):
+    """Резервирует `size` ID подряд в IdSequence на основной базе; возвращает диапазон [start, end)."""
+    name, models = SEQUENCES[model]
+    sequences = IdSequence.objects.using(DEFAULT_DB_ALIAS)
+    with transaction.atomic(using=DEFAULT_DB_ALIAS):
+        if not sequences.filter(name=name).update(next_id=F('next_id') + size):
+            sequences.get_or_create(name=name, defaults={'next_id': max_id(models) + 1})
+            sequences.filter(name=name).update(next_id=F('next_id') + size)
+        end = sequences.get(name=name).next_id
+    return end - size, end
+
+
+class IdAllocator:
+    """
+    Глобально уникальные ID заказов и позиций для всех шардов по схеме hi/lo:
+    процесс резервирует в IdSequence блок из ID_BLOCK_SIZE значений одним
+    запросом и раздает ID из него, пока блок не кончится. ID растут, но между
+    процессами не строго по времени создания.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.blocks = {}
+
+    def allocate(self, model, count):
+        ids = []
+        with self.lock:
+            while len(ids) < count:
+                start, end = self.blocks.get(model, (0, 0))
+                if start >= end:
+                    start, end = reserve_block(model, max(sharding_settings()['ID_BLOCK_SIZE'], count - len(ids)))
+                taken = min(end - start, count - len(ids))
+                ids += range(start, start + taken)
+                self.blocks[model] = (start + taken, end)
+        return ids
+
+    def reset(self):
+        with self.lock:
+            self.blocks.clear()
+
+
+id_allocator = IdAllocator()
+
+
+def assign_ids(objs):
+    """При шардировании проставляет новым заказам / позициям ID из IdAllocator; без него ID выдает база."""
+    objs = list(objs)
+    new = [obj for obj in objs if obj.pk is None]
+    if new and sharding_enabled():
+        for obj, pk in zip(new, id_allocator.allocate(type(new[0]), len(new))):
+            obj.pk = pk
+    return objs
+
+
+def sync_sequences():
+    """Поднимает IdSequence выше максимальных ID на шардах (после переноса или загрузки данных в обход API)."""
+    sequences = IdSequence.objects.using(DEFAULT_DB_ALIAS)
+    for name, models in SEQUENCES.values():
+        value = max_id(models) + 1
+        with transaction.atomic(using=DEFAULT_DB_ALIAS):
+            sequences.get_or_create(name=name, defaults={'next_id': value})
+            sequences.filter(name=name, next_id__lt=value).update(next_id=value)
+    id_allocator.reset()
+
+
+def move_chunk(model, position_model, ids, source, target):
+    """
+    Переносит заказы `ids` с позициями с шарда `source` на `target`.
+    Копия фиксируется на `target` до удаления на `source`, поэтому после
+    сбоя заказ может временно оказаться на обоих шардах, но не пропасть;
+    повторный запуск копирует без дублей и удаляет оставшийся оригинал.
+    """
+    from .datagen import explicit_timestamps  # datagen -> analytics -> sharding
+
+    with transaction.atomic(using=source):
+        orders = list(model.objects.using(source).filter(id__in=ids).select_for_update())
+        positions = list(position_model.objects.using(source).filter(order_id__in=ids))
+        with explicit_timestamps(model), transaction.atomic(using=target):
+            model.objects.using(target).bulk_create(orders, ignore_conflicts=True)
+            position_model.objects.using(target).bulk_create(positions, ignore_conflicts=True)
+        position_model.objects.using(source).filter(order_id__in=ids).delete()
+        model.objects.using(source).filter(id__in=ids).delete()
+    return len(orders)
+
+
+def rebalance_orders(chunk_size=1000, dry_run=False, progress=None):
+    """
+    Переносит заказы (и архивные заказы) пользователей на шарды, которые им
+    назначает shard_for_user при текущем списке шардов. Возвращает
+    {(source, target): число заказов}.
+    """
+    moved = defaultdict(int)
+    for source in order_shards():
+        for model, position_model in MOVES:
+            user_ids = model.objects.using(source).order_by().values_list('user_id', flat=True).distinct()
+            targets = defaultdict(list)
+            for user_id in user_ids:
+                target = shard_for_user(user_id)
+                if target != source:
+                    targets[target].append(user_id)
+            for target, users in targets.items():
+                for start in range(0, len(users), chunk_size):
+                    orders = model.objects.using(source).filter(user_id__in=users[start:start + chunk_size])
+                    if dry_run:
+                        moved[(source, target)] += orders.count()
+                        continue
+                    while True:
+                        ids = list(orders.order_by('id').values_list('id', flat=True)[:chunk_size])
+                        if not ids:
+                            break
+                        moved[(source, target)] += move_chunk(model, position_model, ids, source, target)
+                        if progress:
+                            progress(source, target, moved[(source, target)])
+    if not dry_run:
+        sync_sequences()
+    return dict(moved)
+
+
+def purge_user(user_id, using):
+    """Удаляет заказы пользователя с остальных шардов (каскад внутри одной базы делает сам Django)."""
+    for alias in order_shards():
+        if alias != using:
+            for model in (Order, ArchivedOrder):
+                model.objects.using(alias).filter(user_id=user_id).delete()
+
+
+def purge_product(product_id, using):
+    for alias in order_shards():
+        if alias != using:
+            for model in (ProductOrderPosition, ArchivedOrderPosition):
+                model.objects.using(alias).filter(product_id=product_id).delete()
+
+
+class ShardRouter:
+    """
+    Заказы, позиции и их архив живут на шарде пользователя (shard_for_user),
+    остальные модели - на основной базе. Роутер выбирает базу по подсказке
+    `instance`: объект заказа остается на своей базе, новый заказ пользователя
+    идет на его шард, а связанные с заказом пользователи и товары читаются с
+    основной базы. Запросы без подсказки определяет следующий роутер, поэтому
+    код, работающий с заказами, указывает базу явно через using().
+    Без шардирования роутер ни на что не влияет.
+    """
+
+    def route(self, model, instance):
+        if instance is None or not sharding_enabled():
+            return None
+        sharded = isinstance(instance, SHARDED_MODELS)
+        if not issubclass(model, SHARDED_MODELS):
+            return DEFAULT_DB_ALIAS if sharded else None
+        if sharded and instance._state.db:
+            return instance._state.db
+        if isinstance(instance, get_user_model()) and instance.pk is not None:
+            return shard_for_user(instance.pk)
+        return None
+
+    def db_for_read(self, model, **hints):
+        return self.route(model, hints.get('instance'))
+
+    def db_for_write(self, model, **hints):
+        return self.route(model, hints.get('instance'))
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if not isinstance(obj1, SHARDED_MODELS) and not isinstance(obj2, SHARDED_MODELS):
+            return None
+        databases = {DEFAULT_DB_ALIAS, *order_shards()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
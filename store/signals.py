@@ -0,0 +1,61 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from . import search
+from .authentication import invalidate_token, invalidate_user
+from .cache import bump_generation
+from .models import Product, ProductCollection
+from .sharding import purge_product, purge_user, sharding_enabled
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, using, **kwargs):
+    search.update_index([instance.id], using=using)
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, using, **kwargs):
+    search.remove_from_index([instance.id], using=using)
+
+
+@receiver(post_delete, sender=Product)
+def purge_product_positions(sender, instance, using, **kwargs):
+    if sharding_enabled():
+        purge_product(instance.id, using)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_products(sender, **kwargs):
+    bump_generation('store.product')
+
+
+@receiver(post_save, sender=ProductCollection)
+@receiver(post_delete, sender=ProductCollection)
+def invalidate_collections(sender, **kwargs):
+    bump_generation('store.productcollection')
+
+
+@receiver(m2m_changed, sender=ProductCollection.products.through)
+def invalidate_collection_products(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_generation('store.productcollection')
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, using, **kwargs):
+    invalidate_token(instance.key, instance.user_id, using)
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def invalidate_user_tokens(sender, instance, using, **kwargs):
+    invalidate_user(instance.pk, using)
+
+
+@receiver(post_delete, sender=get_user_model())
+def purge_user_orders(sender, instance, using, **kwargs):
+    if sharding_enabled():
+        purge_user(instance.pk, using)
@@ -0,0 +1,218 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+FIELDS_PARAM = 'fields'
+OMIT_PARAM = 'omit'
+CONTEXT_KEY = 'sparse_fields'
+
+
+def parse_fields(value):
+    """
+    Разбирает `id,product.name,user` в дерево {'id': {}, 'product': {'name': {}}, 'user': {}}.
+    Пустой словарь - поле целиком (со всеми вложенными полями).
+    """
+    tree = {}
+    for item in value.split(','):
+        names = [name.strip() for name in item.split('.')]
+        if not all(names):
+            continue
+        node = tree
+        for index, name in enumerate(names):
+            if name in node and not node[name]:
+                break
+            if index == len(names) - 1:
+                node[name] = {}
+            else:
+                node = node.setdefault(name, {})
+    return tree
+
+
+def request_selection(request):
+    """Деревья `?fields=` и `?omit=` запроса; None, если параметр не задан."""
+    if request is None:
+        return None, None
+    params = request.query_params if hasattr(request, 'query_params') else request.GET
+    include = parse_fields(params[FIELDS_PARAM]) if params.get(FIELDS_PARAM) else None
+    omit = parse_fields(params[OMIT_PARAM]) if params.get(OMIT_PARAM) else None
+    return include, omit
+
+
+def subtree(tree, path):
+    """Узел дерева для вложенного сериализатора по пути `path`; None - без ограничений."""
+    node = tree
+    for name in path:
+        if not node:
+            return None
+        node = node.get(name)
+    return node or None
+
+
+def nested_fields(field):
+    if isinstance(field, serializers.ListSerializer):
+        field = field.child
+    if isinstance(field, serializers.Serializer):
+        return field.fields
+    return None
+
+
+def select_fields(fields, include, omit):
+    """Поля сериализатора, оставшиеся после `include` / `omit` одного уровня."""
+    return {
+        name: field for name, field in fields.items()
+        if (include is None or name in include) and not (omit and name in omit and not omit[name])
+    }
+
+
+def validate_selection(fields, tree, param, prefix=''):
+    unknown = []
+    for name, children in tree.items():
+        if name not in fields:
+            unknown.append(f'{prefix}{name}')
+        elif children:
+            nested = nested_fields(fields[name])
+            if nested is None:
+                unknown.append(f'{prefix}{name}.{next(iter(children))}')
+            else:
+                unknown += validate_selection(nested, children, param, f'{prefix}{name}.')
+    if unknown and not prefix:
+        raise ValidationError({param: [f'Неизвестные поля: {", ".join(unknown)}']})
+    return unknown
+
+
+class SparseFieldsMixin:
+    """
+    Выводит только поля из `?fields=` и без полей из `?omit=`, в том числе
+    во вложенных сериализаторах (`product.name`). Влияет только на ответ,
+    валидация входных данных видит все поля.
+    """
+
+    @property
+    def sparse_path(self):
+        path = []
+        node = self
+        while node.parent is not None:
+            if node.field_name:
+                path.insert(0, node.field_name)
+            node = node.parent
+        return path
+
+    @property
+    def _readable_fields(self):
+        selection = self.context.get(CONTEXT_KEY)
+        if selection is None:
+            selection = request_selection(self.context.get('request'))
+            if isinstance(self.context, dict):
+                self.context[CONTEXT_KEY] = selection
+        include, omit = selection
+        fields = self.fields
+        if include is not None or omit is not None:
+            path = self.sparse_path
+            fields = select_fields(fields, subtree(include, path) if include is not None else None,
+                                   subtree(omit, path))
+        for field in fields.values():
+            if not field.write_only:
+                yield field
+
+
+def model_field(model, name):
+    try:
+        return model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return None
+
+
+def loaded_paths(model, fields, include, omit, prefix=''):
+    """
+    Колонки для `.only()` по выбранным полям сериализатора и связи для prefetch
+    ({путь: (модель, поля, include, omit)}). None - поле не из колонки модели,
+    сузить запрос нельзя.
+    """
+    paths = {f'{prefix}{model._meta.pk.name}'}
+    prefetches = {}
+    for name, field in select_fields(fields, include, omit).items():
+        if field.write_only:
+            continue
+        source = field.source_attrs[0] if field.source_attrs else None
+        target = model_field(model, source) if source else None
+        if target is None:
+            return None, None
+        nested = nested_fields(field)
+        if target.many_to_many or target.one_to_many:
+            if not prefix:
+                prefetches[source] = (target.related_model, nested, subtree(include, [name]) if include else None,
+                                      subtree(omit, [name]))
+            continue
+        paths.add(f'{prefix}{source}')
+        if nested is not None and target.is_relation:
+            nested_paths, _ = loaded_paths(target.related_model, nested, subtree(include, [name]) if include else None,
+                                           subtree(omit, [name]), f'{prefix}{source}__')
+            if nested_paths is None:
+                return None, None
+            paths |= nested_paths
+    return paths, prefetches
+
+
+def flatten_related(tree, prefix=''):
+    for name, children in tree.items():
+        yield f'{prefix}{name}'
+        yield from flatten_related(children, f'{prefix}{name}__')
+
+
+class SparseFieldsViewMixin:
+    """
+    Сужает SQL под `?fields=` / `?omit=`: на чтении queryset загружает только
+    нужные колонки (`.only()`), а ненужные prefetch связи не выполняются.
+    """
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        include, omit = request_selection(self.request)
+        if include is None and omit is None:
+            return queryset
+        fields = self.get_serializer_class()(context=self.get_serializer_context()).fields
+        for tree, param in ((include, FIELDS_PARAM), (omit, OMIT_PARAM)):
+            if tree is not None:
+                validate_selection(fields, tree, param)
+        if self.request.method not in ('GET', 'HEAD'):
+            return queryset
+        return self.prune_queryset(queryset, fields, include, omit)
+
+    def prune_queryset(self, queryset, fields, include, omit):
+        paths, prefetches = loaded_paths(queryset.model, fields, include, omit)
+        if paths is None:
+            return queryset
+        paths |= self.required_paths(queryset)
+        sources = {field.source_attrs[0] for field in fields.values() if field.source_attrs}
+        lookups = []
+        for lookup in queryset._prefetch_related_lookups:
+            name = lookup.prefetch_to if isinstance(lookup, Prefetch) else lookup
+            if name not in prefetches:
+                if name not in sources:
+                    lookups.append(lookup)
+                continue
+            related_model, nested, nested_include, nested_omit = prefetches.pop(name)
+            nested_paths, _ = loaded_paths(related_model, nested, nested_include, nested_omit) if nested else (None, None)
+            if nested_paths is None or isinstance(lookup, Prefetch):
+                lookups.append(lookup)
+                continue
+            relation = model_field(queryset.model, name)
+            if relation.one_to_many:
+                nested_paths.add(relation.field.name)
+            lookups.append(Prefetch(name, queryset=related_model.objects.only(*nested_paths)))
+        queryset = queryset.prefetch_related(None).prefetch_related(*lookups)
+        if isinstance(queryset.query.select_related, dict):
+            related = [path for path in flatten_related(queryset.query.select_related) if path in paths]
+            queryset = queryset.select_related(None)
+            if related:
+                queryset = queryset.select_related(*related)
+        return queryset.only(*paths)
+
+    def required_paths(self, queryset):
+        """Колонки, без которых не обойтись: поля сортировки страницы."""
+        paginator = self.paginator
+        if self.action != 'list' or paginator is None or not hasattr(paginator, 'get_ordering'):
+            return set()
+        ordering = paginator.get_ordering(self.request, queryset, self)
+        return {name.lstrip('-') for name in ordering if model_field(queryset.model, name.lstrip('-'))}
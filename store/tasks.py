@@ -0,0 +1,8 @@
+from .analytics import SalesDelta
+from .jobs import task
+
+
+@task('store.apply_sales_delta')
+def apply_sales_delta(products=(), statuses=()):
+    """Применяет к роллапам изменения, накопленные запросом (SalesDelta.schedule)."""
+    SalesDelta.from_payload(products, statuses).apply()
@@ -1,9 +1,35 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models import Sum
+from django.http import Http404, StreamingHttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
-from .filters import ProductFilter, ProductReviewFilter, OrderFilter
-from .models import Order, ProductCollection, Product, ProductReview
-from rest_framework.viewsets import ModelViewSet
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import get_object_or_404
+from rest_framework.response import Response
+from rest_framework.status import HTTP_201_CREATED, HTTP_207_MULTI_STATUS
+from .analytics import order_state, record_order_change
+from .archive import ArchiveUnion, include_archived
+from .cache import CachedResponseMixin
+from .catalog import CONTENT_TYPES, FORMATS, export_rows, import_products, read_rows
+from .conditional import ConditionalGetMixin
+from .fastpath import FastListMixin
+from .filters import ProductFilter, ProductReviewFilter, OrderFilter, SalesStatsFilter, StatusStatsFilter
+from .instrumentation import InstrumentedViewMixin
+from .jobs import queue_stats
+from .models import ArchivedOrder, Order, OrderStatusDay, ProductCollection, Product, ProductReview, ProductSalesDay
+from .pagination import KeysetPagination
+from .parsers import FastJSONParser, JSONLinesParser, JSONLParser
+from .ratings import apply_review_delta
+from .routing import ReplicaReadMixin
+from .sharding import ShardUnion, find_shard, order_shards, shard_for_user, sharding_enabled
+from rest_framework.viewsets import GenericViewSet, ModelViewSet
 from .serializers import ProductSerializer, ProductReviewSerializer, ProductCollectionSerializer, \
-    OrderSerializer
+    OrderSerializer, bulk_create_orders, DaySalesSerializer, ProductSalesSerializer, SalesSerializer, \
+    StatusSalesSerializer
+from .sparse import SparseFieldsViewMixin
 from rest_framework.permissions import BasePermission, IsAuthenticated
 
 
@@ -28,27 +54,65 @@ class IsAdminOrOwner(BasePermission):
         return obj.user == request.user or request.user.is_staff
 
 
-class ProductsViewSet(ModelViewSet):
+class ProductsViewSet(InstrumentedViewMixin, ReplicaReadMixin, CachedResponseMixin, ConditionalGetMixin,
+                      SparseFieldsViewMixin, FastListMixin, ModelViewSet):
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
+    cache_dependencies = ('store.product',)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = ProductFilter
+    ordering_fields = ('price', 'rating_avg', 'rating_count', 'created_at')
 
     http_method_names = ['get', 'post', 'put', 'delete']
 
+    @property
+    def keyset_ordering(self):
+        if self.request.query_params.get('search'):
+            return ('-search_rank', 'id')
+        return KeysetPagination.ordering
+
+    @action(detail=False, methods=['get'], url_path='export')
+    def export_catalog(self, request):
+        """Потоковая выгрузка каталога (с учетом фильтров): `?output=jsonl` или `?output=csv`."""
+        fmt = request.query_params.get('output', 'jsonl')
+        if fmt not in FORMATS:
+            raise ValidationError(f'Поддерживаемые форматы: {", ".join(FORMATS)}')
+        response = StreamingHttpResponse(export_rows(self.filter_queryset(self.get_queryset()), fmt),
+                                         content_type=f'{CONTENT_TYPES[fmt]}; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="products.{fmt}"'
+        return response
+
+    @action(detail=False, methods=['post'], url_path='import')
+    def import_catalog(self, request):
+        """
+        Потоковая загрузка каталога из тела запроса: CSV (`Content-Type: text/csv`)
+        или JSON Lines (любой другой тип). Тело читается построчно, без разбора парсерами DRF.
+        """
+        fmt = 'csv' if request.content_type.startswith('text/csv') else 'jsonl'
+        stream = request.stream
+        result = import_products(read_rows(stream if stream is not None else [], fmt))
+        return Response(result.as_dict())
+
     def get_permissions(self):
-        if self.action in ['update', 'partial_update', 'destroy', 'create']:
+        if self.action in ['update', 'partial_update', 'destroy', 'create', 'export_catalog', 'import_catalog']:
             return [IsAdmin()]
         return []
 
 
-class ProductReviewsViewSet(ModelViewSet):
+class ProductReviewsViewSet(InstrumentedViewMixin, ReplicaReadMixin, ConditionalGetMixin, SparseFieldsViewMixin,
+                            ModelViewSet):
     queryset = ProductReview.objects.all().select_related('product', 'user')
     serializer_class = ProductReviewSerializer
+    conditional_fields = ('updated_at', 'product__updated_at')
     filter_backends = (DjangoFilterBackend,)
     filterset_class = ProductReviewFilter
     http_method_names = ['get', 'post', 'put', 'delete']
 
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+            apply_review_delta(instance.product_id, -instance.grade, -1)
+
     def get_permissions(self):
         if self.action in ['update', 'partial_update', 'destroy']:
             return [IsAdminOrOwner()]
@@ -57,19 +121,42 @@ class ProductReviewsViewSet(ModelViewSet):
         return []
 
 
-class ProductCollectionViewSet(ModelViewSet):
-    queryset = ProductCollection.objects.all().prefetch_related('products')
+class ProductCollectionViewSet(InstrumentedViewMixin, ReplicaReadMixin, CachedResponseMixin, ConditionalGetMixin,
+                               SparseFieldsViewMixin, ModelViewSet):
+    queryset = ProductCollection.objects.all()
     serializer_class = ProductCollectionSerializer
+    conditional_fields = ('updated_at', 'products__updated_at')
+    conditional_counts = ('products',)
+    cache_dependencies = ('store.product', 'store.productcollection')
+    filterset_class = None
+    ordering_fields = ()
     http_method_names = ['get', 'post', 'put', 'delete']
 
+    @property
+    def keyset_ordering(self):
+        if self.action == 'products' and self.request.query_params.get('search'):
+            return ('-search_rank', 'id')
+        return KeysetPagination.ordering
+
+    @action(detail=True, methods=['get'], serializer_class=ProductSerializer, filter_backends=(DjangoFilterBackend,),
+            filterset_class=ProductFilter, ordering_fields=ProductsViewSet.ordering_fields)
+    def products(self, request, pk=None):
+        """Все продукты подборки постранично, с фильтрами и сортировками списка продуктов."""
+        collection = get_object_or_404(ProductCollection.objects.only('id'), pk=pk)
+        queryset = self.filter_queryset(Product.objects.filter(product_collections=collection))
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return Response(self.get_serializer(queryset, many=True).data)
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
+
     def get_permissions(self):
         if self.action in ['create', 'update', 'partial_update', 'destroy']:
             return [IsAdmin()]
         return []
 
 
-class OrdersViewSet(ModelViewSet):
-    queryset = Order.objects.all().prefetch_related('products').select_related('user')
+class OrdersViewSet(InstrumentedViewMixin, SparseFieldsViewMixin, FastListMixin, ModelViewSet):
+    queryset = Order.objects.all().prefetch_related('positions').select_related('user')
     serializer_class = OrderSerializer
     filter_backends = (DjangoFilterBackend,)
     filterset_class = OrderFilter
@@ -80,9 +167,155 @@ class OrdersViewSet(ModelViewSet):
             self.queryset = self.queryset.filter(user=request.user)
         return super().list(request, *args, **kwargs)
 
+    def get_queryset(self):
+        """
+        Для изменения и удаления строка заказа блокируется (SELECT ... FOR
+        UPDATE) до того, как снимается состояние для роллапов: параллельные
+        изменения одного заказа не учитываются дважды.
+        """
+        queryset = super().get_queryset()
+        if self.action in ('update', 'partial_update', 'destroy'):
+            queryset = queryset.select_for_update(of=('self',))
+        return queryset
+
+    def write_database(self):
+        """База заказа из URL для транзакции изменения: его шард или база для записи заказов."""
+        alias = None
+        if sharding_enabled():
+            alias = find_shard(Order, self.kwargs[self.lookup_url_kwarg or self.lookup_field])
+        return alias or router.db_for_write(Order)
+
+    def archived_queryset(self):
+        queryset = ArchivedOrder.objects.all().prefetch_related('positions').select_related('user')
+        if self.action == 'list' and not self.request.user.is_staff:
+            queryset = queryset.filter(user=self.request.user)
+        return queryset
+
+    def shard_querysets(self, queryset):
+        """
+        Части `queryset` на шардах, где могут быть нужные заказы (store.sharding):
+        список пользователя - его шард, список администратора - все шарды,
+        отдельный заказ - шард, на котором он найден.
+        """
+        if not sharding_enabled():
+            return [queryset]
+        queryset = queryset.select_related(None).prefetch_related('user')
+        if self.action != 'list':
+            alias = find_shard(queryset.model, self.kwargs[self.lookup_url_kwarg or self.lookup_field])
+            return [queryset.using(alias) if alias else queryset.none()]
+        if not self.request.user.is_staff:
+            return [queryset.using(shard_for_user(self.request.user.pk))]
+        return [queryset.using(alias) for alias in order_shards()]
+
+    def filter_queryset(self, queryset):
+        """
+        С `?include_archived=1` список заказов включает архив (store.archive).
+        При шардировании части с разных шардов сливаются в один список.
+        """
+        querysets = [super(OrdersViewSet, self).filter_queryset(part) for part in self.shard_querysets(queryset)]
+        if self.action == 'list' and include_archived(self.request):
+            querysets += [OrderFilter(self.request.query_params, queryset=archived, request=self.request).qs
+                          for archived in self.shard_querysets(self.archived_queryset())]
+        if len(querysets) == 1:
+            return querysets[0]
+        return (ShardUnion if sharding_enabled() else ArchiveUnion)(*querysets)
+
+    def get_object(self):
+        try:
+            return super().get_object()
+        except Http404:
+            if self.action != 'retrieve' or not include_archived(self.request):
+                raise
+        archived, = self.shard_querysets(self.archived_queryset())
+        order = get_object_or_404(archived, pk=self.kwargs[self.lookup_url_kwarg or self.lookup_field])
+        self.check_object_permissions(self.request, order)
+        return order
+
+    def fast_list_converter(self, request):
+        if include_archived(request) or sharding_enabled():
+            return None
+        return super().fast_list_converter(request)
+
+    def create(self, request, *args, **kwargs):
+        with transaction.atomic():
+            return super().create(request, *args, **kwargs)
+
+    def update(self, request, *args, **kwargs):
+        with transaction.atomic(using=self.write_database()):
+            return super().update(request, *args, **kwargs)
+
+    def destroy(self, request, *args, **kwargs):
+        with transaction.atomic(using=self.write_database()):
+            return super().destroy(request, *args, **kwargs)
+
+    @action(detail=False, methods=['post'], parser_classes=[FastJSONParser, JSONLinesParser, JSONLParser])
+    def bulk(self, request):
+        """
+        Пакетное создание заказов: массив JSON или поток JSON Lines.
+        Если часть заказов не прошла валидацию, остальные все равно создаются,
+        а ответ приходит со статусом 207 и результатом по каждому элементу.
+        """
+        items = request.data
+        if not isinstance(items, list):
+            raise ValidationError('Ожидается список заказов')
+        max_size = getattr(settings, 'STORE_BULK_ORDERS_MAX_SIZE', 5000)
+        if len(items) > max_size:
+            raise ValidationError(f'В одном пакете может быть не больше {max_size} заказов')
+        results = bulk_create_orders(items, self.get_serializer_context())
+        has_errors = any(result['status'] == 'error' for result in results)
+        return Response(results, status=HTTP_207_MULTI_STATUS if has_errors else HTTP_201_CREATED)
+
+    def perform_destroy(self, instance):
+        before = order_state(instance)
+        instance.delete()
+        record_order_change(before, None, instance._state.db)
+
     def get_permissions(self):
         if self.action in ['retrieve', 'list', 'update', 'partial_update', 'destroy']:
             return [IsAuthenticated(), IsAdminOrOwner()]
-        elif self.action == 'create':
+        elif self.action in ['create', 'bulk']:
             return [IsAuthenticated()]
         return []
+
+
+class StatsViewSet(InstrumentedViewMixin, GenericViewSet):
+    """
+    Статистика продаж за период из роллапов store.analytics: итог, по дням,
+    по продуктам (первые `limit` по выручке) и по статусам заказов.
+    Фильтр `product` не влияет на разбивку по статусам.
+    """
+    queryset = ProductSalesDay.objects.all()
+    filter_backends = (DjangoFilterBackend,)
+    filterset_class = SalesStatsFilter
+    pagination_class = None
+    default_limit = 100
+
+    def list(self, request, *args, **kwargs):
+        sales = self.filter_queryset(self.get_queryset()).exclude(quantity=0, revenue=0).order_by()
+        statuses = StatusStatsFilter(request.query_params, queryset=OrderStatusDay.objects.all()).qs
+        statuses = statuses.exclude(orders=0, revenue=0).order_by()
+        try:
+            limit = max(int(request.query_params.get('limit', self.default_limit)), 0)
+        except ValueError:
+            raise ValidationError({'limit': ['Ожидается целое число']})
+        totals = sales.aggregate(quantity=Sum('quantity'), revenue=Sum('revenue'))
+        by_day = sales.values('day').annotate(quantity=Sum('quantity'), revenue=Sum('revenue')).order_by('day')
+        by_product = sales.values('product_id').annotate(quantity=Sum('quantity'), revenue=Sum('revenue'))
+        by_status = statuses.values('order_status').annotate(orders=Sum('orders'), revenue=Sum('revenue'))
+        return Response({
+            'totals': SalesSerializer({
+                'quantity': totals['quantity'] or 0,
+                'revenue': totals['revenue'] or Decimal(0),
+            }).data,
+            'by_day': DaySalesSerializer(by_day, many=True).data,
+            'by_product': ProductSalesSerializer(by_product.order_by('-revenue', 'product_id')[:limit], many=True).data,
+            'by_status': StatusSalesSerializer(by_status.order_by('order_status'), many=True).data,
+        })
+
+    @action(detail=False)
+    def jobs(self, request, *args, **kwargs):
+        """Очередь фоновых задач: глубина по статусам и задержка / время выполнения за последние 5 минут."""
+        return Response(queue_stats())
+
+    def get_permissions(self):
+        return [IsAuthenticated(), IsAdmin()]
@@ -1,7 +1,62 @@
+import re
+from collections import Counter
+from contextlib import contextmanager
+
 import pytest
+from django.core.cache import caches
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
 from model_bakery import baker
 from rest_framework.test import APIClient
 
+SQL_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+SQL_VALUE_LISTS = re.compile(r'\((?:\?, )+\?\)')
+
+
+def normalize_sql(sql):
+    """SQL без литералов: запросы, отличающиеся только параметрами, совпадают."""
+    return SQL_VALUE_LISTS.sub('(...)', SQL_LITERALS.sub('?', sql))
+
+
+def duplicated_queries(queries):
+    counts = Counter(normalize_sql(query['sql']) for query in queries)
+    return [(sql, count) for sql, count in counts.most_common() if count > 1]
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    yield
+    for cache in caches.all():
+        cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def eager_jobs(settings):
+    """Фоновые задачи выполняются сразу; очередь проверяется в test_jobs с EAGER=False."""
+    settings.STORE_JOBS = {'EAGER': True}
+
+
+@pytest.fixture
+def query_budget():
+    """
+    Контекстный менеджер `query_budget(max_queries)`: падает, если внутри
+    выполнено больше `max_queries` SQL запросов, и выводит повторяющиеся запросы.
+    """
+
+    @contextmanager
+    def budget(max_queries, using='default'):
+        with CaptureQueriesContext(connections[using]) as context:
+            yield context
+        if len(context) > max_queries:
+            lines = [f'{len(context)} SQL запросов при бюджете {max_queries}']
+            duplicated = duplicated_queries(context.captured_queries)
+            if duplicated:
+                lines.append('Повторяющиеся запросы:')
+                lines += [f'  {count} x {sql}' for sql, count in duplicated]
+            pytest.fail('\n'.join(lines), pytrace=False)
+
+    return budget
+
 
 @pytest.fixture
 def api_client():
@@ -37,4 +92,12 @@ def order_factory():
     def factory(**kwargs):
         return baker.make('Order', **kwargs)
 
-    return factory
\ No newline at end of file
+    return factory
+
+
+@pytest.fixture
+def order_position_factory():
+    def factory(**kwargs):
+        return baker.make('ProductOrderPosition', **kwargs)
+
+    return factory
@@ -1,8 +1,10 @@
 import pytest
 from django.contrib.auth.models import User
+from django.db.models.signals import m2m_changed
 from django.urls import reverse
 from store.models import ProductCollection
-from rest_framework.status import HTTP_200_OK, HTTP_201_CREATED, HTTP_403_FORBIDDEN, HTTP_204_NO_CONTENT
+from rest_framework.status import HTTP_200_OK, HTTP_201_CREATED, HTTP_403_FORBIDDEN, HTTP_204_NO_CONTENT, \
+    HTTP_304_NOT_MODIFIED, HTTP_400_BAD_REQUEST, HTTP_404_NOT_FOUND
 
 
 @pytest.mark.django_db
@@ -24,7 +26,7 @@ def test_product_collection_list(api_client, product_collection_factory):
     product_collections = product_collection_factory(_quantity=5)
     url = reverse('product-collections-list')
     resp = api_client.get(url)
-    result = resp.json()
+    result = resp.json()['results']
     expected_ids = {collection.id for collection in product_collections}
     result_ids = {collection['id'] for collection in result}
     assert resp.status_code == HTTP_200_OK
@@ -106,3 +108,127 @@ def test_product_collection_delete(api_client, product_collection_factory, user_
     api_client.force_authenticate(user=test_user)
     resp = api_client.delete(url, format='json')
     assert resp.status_code == expected_status
+
+
+@pytest.mark.django_db
+def test_product_collection_conditional_get(api_client, product_factory, product_collection_factory):
+    """Тест условного запроса подборки: изменение вложенного продукта меняет ETag"""
+    product = product_factory()
+    collection = product_collection_factory(products=[product])
+    url = reverse('product-collections-detail', args=(collection.id,))
+    etag = api_client.get(url)['ETag']
+    resp_not_modified = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    product.price = 1
+    product.save()
+    resp_modified = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert resp_not_modified.status_code == HTTP_304_NOT_MODIFIED
+    assert resp_modified.status_code == HTTP_200_OK
+
+
+@pytest.mark.django_db
+def test_product_collection_conditional_get_product_deleted(api_client, product_factory, product_collection_factory):
+    """Тест условного запроса подборок: удаление продукта из подборки меняет ETag списка и подборки"""
+    products = product_factory(_quantity=2)
+    collection = product_collection_factory(products=products)
+    urls = reverse('product-collections-list'), reverse('product-collections-detail', args=(collection.id,))
+    etags = [api_client.get(url)['ETag'] for url in urls]
+    products[0].delete()
+    responses = [api_client.get(url, HTTP_IF_NONE_MATCH=etag) for url, etag in zip(urls, etags)]
+    assert [resp.status_code for resp in responses] == [HTTP_200_OK, HTTP_200_OK]
+    assert [item['id'] for item in responses[1].json()['products']] == [products[1].id]
+
+
+@pytest.mark.django_db
+def test_product_collection_response_cache(api_client, product_factory, product_collection_factory):
+    """Тест сброса кэша подборок при изменении состава подборки"""
+    collection = product_collection_factory()
+    product = product_factory()
+    url = reverse('product-collections-detail', args=(collection.id,))
+    api_client.get(url)
+    resp_hit = api_client.get(url)
+    collection.products.add(product)
+    resp_changed = api_client.get(url)
+    assert resp_hit['X-Cache'] == 'HIT'
+    assert resp_changed['X-Cache'] == 'MISS'
+    assert [item['id'] for item in resp_changed.json()['products']] == [product.id]
+
+
+@pytest.mark.django_db
+def test_product_collection_update_diff(api_client, product_factory, product_collection_factory):
+    """Тест изменения состава подборки разницей: оставшиеся связи не пересоздаются, сигналы m2m_changed приходят"""
+    products = product_factory(_quantity=4)
+    collection = product_collection_factory(products=products[:3])
+    Through = ProductCollection.products.through
+    kept_link = Through.objects.get(productcollection=collection, product=products[0])
+    actions = []
+
+    def receiver(sender, action, pk_set, **kwargs):
+        actions.append((action, pk_set))
+
+    m2m_changed.connect(receiver, sender=Through)
+    try:
+        api_client.force_authenticate(user=User.objects.create_user('test_admin', is_staff=True))
+        payload = {
+            'title': collection.title,
+            'text': collection.text,
+            'products': [{'product_id': product.id} for product in (products[0], products[1], products[3])],
+        }
+        resp = api_client.put(reverse('product-collections-detail', args=(collection.id,)), payload, format='json')
+    finally:
+        m2m_changed.disconnect(receiver, sender=Through)
+    assert resp.status_code == HTTP_200_OK
+    assert Through.objects.filter(id=kept_link.id).exists()
+    assert ('post_remove', {products[2].id}) in actions
+    assert ('post_add', {products[3].id}) in actions
+    assert 'post_clear' not in [action for action, _ in actions]
+
+
+@pytest.mark.django_db
+def test_product_collection_missing_products(api_client, product_factory):
+    """Тест ошибки валидации со всеми несуществующими продуктами подборки"""
+    product = product_factory()
+    api_client.force_authenticate(user=User.objects.create_user('test_admin', is_staff=True))
+    payload = {
+        'title': 'test collection',
+        'text': 'collection text',
+        'products': [{'product_id': product.id}, {'product_id': product.id + 100}, {'product_id': product.id + 200}],
+    }
+    resp = api_client.post(reverse('product-collections-list'), payload, format='json')
+    assert resp.status_code == HTTP_400_BAD_REQUEST
+    assert f'{product.id + 100}, {product.id + 200}' in resp.json()['non_field_errors'][0]
+
+
+@pytest.mark.django_db
+def test_product_collection_preview(api_client, settings, product_factory, product_collection_factory):
+    """Тест списка подборок: количество продуктов и только первые STORE_COLLECTION_PREVIEW_SIZE из них"""
+    settings.STORE_COLLECTION_PREVIEW_SIZE = 2
+    products = product_factory(_quantity=5)
+    large = product_collection_factory(products=products)
+    small = product_collection_factory(products=products[4:])
+    empty = product_collection_factory()
+    resp = api_client.get(reverse('product-collections-list'))
+    result = {collection['id']: collection for collection in resp.json()['results']}
+    assert resp.status_code == HTTP_200_OK
+    assert result[large.id]['products_count'] == 5
+    assert [product['id'] for product in result[large.id]['products']] == [products[0].id, products[1].id]
+    assert result[small.id]['products_count'] == 1
+    assert [product['id'] for product in result[small.id]['products']] == [products[4].id]
+    assert result[empty.id]['products_count'] == 0 and result[empty.id]['products'] == []
+
+
+@pytest.mark.django_db
+def test_product_collection_products(api_client, product_factory, product_collection_factory):
+    """Тест постраничного вывода продуктов подборки с фильтрами списка продуктов"""
+    products = [product_factory(price=price) for price in (10, 20, 30, 40, 50)]
+    collection = product_collection_factory(products=products[:4])
+    product_collection_factory(products=products)
+    url = reverse('product-collections-products', args=(collection.id,))
+    first_page = api_client.get(url, {'page_size': 3}).json()
+    second_page = api_client.get(first_page['next']).json()
+    resp_filtered = api_client.get(url, {'price__gte': 25})
+    resp_missing = api_client.get(reverse('product-collections-products', args=(collection.id + 100,)))
+    ids = [product['id'] for product in first_page['results'] + second_page['results']]
+    assert ids == [product.id for product in products[:4]]
+    assert second_page['next'] is None
+    assert [product['id'] for product in resp_filtered.json()['results']] == [products[2].id, products[3].id]
+    assert resp_missing.status_code == HTTP_404_NOT_FOUND
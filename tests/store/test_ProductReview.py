@@ -1,5 +1,10 @@
+from io import StringIO
+
 import pytest
 from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework.status import HTTP_200_OK, HTTP_401_UNAUTHORIZED, HTTP_201_CREATED, HTTP_403_FORBIDDEN, \
     HTTP_400_BAD_REQUEST, HTTP_204_NO_CONTENT
@@ -24,7 +29,7 @@ def test_product_review_list(api_client, product_review_factory):
     product_reviews = product_review_factory(_quantity=5)
     url = reverse('product-reviews-list')
     resp = api_client.get(url)
-    result = resp.json()
+    result = resp.json()['results']
     expected_ids = {review.id for review in product_reviews}
     result_ids = {review['id'] for review in result}
     assert resp.status_code == HTTP_200_OK
@@ -88,7 +93,7 @@ def test_product_review_filter_user(api_client, product_review_factory):
     users_id = [review.user.id for review in product_reviews]
     id_for_test = users_id[2]
     resp = api_client.get(url, {'user': id_for_test})
-    result = resp.json()
+    result = resp.json()['results']
     result_user_ids = {review['user']['id'] for review in result}
     assert resp.status_code == HTTP_200_OK
     assert {id_for_test} == result_user_ids
@@ -102,7 +107,64 @@ def test_product_review_filter_product(api_client, product_review_factory):
     products_ids = [review.product.id for review in product_reviews]
     id_for_test = products_ids[2]
     resp = api_client.get(url, {'product': id_for_test})
-    result = resp.json()
+    result = resp.json()['results']
     result_product_ids = {review['product']['id'] for review in result}
     assert resp.status_code == HTTP_200_OK
     assert {id_for_test} == result_product_ids
+
+
+@pytest.mark.django_db
+def test_product_review_rating(api_client, product_factory):
+    """Тест пересчета средней оценки и количества отзывов продукта
+     при создании, изменении и удалении отзыва"""
+    product = product_factory()
+    url = reverse('product-reviews-list')
+    first_user = User.objects.create_user('first_user')
+    second_user = User.objects.create_user('second_user')
+    api_client.force_authenticate(user=first_user)
+    resp_first = api_client.post(url, {'product_id': product.id, 'review': 'review', 'grade': 5}, format='json')
+    api_client.force_authenticate(user=second_user)
+    resp_second = api_client.post(url, {'product_id': product.id, 'review': 'review', 'grade': 2}, format='json')
+    product.refresh_from_db()
+    assert (product.rating_count, product.rating_avg) == (2, 3.5)
+
+    detail_url = reverse('product-reviews-detail', args=(resp_second.json()['id'],))
+    api_client.put(detail_url, {'product_id': product.id, 'review': 'review', 'grade': 4}, format='json')
+    product.refresh_from_db()
+    assert (product.rating_count, product.rating_avg) == (2, 4.5)
+
+    api_client.delete(detail_url)
+    api_client.force_authenticate(user=first_user)
+    api_client.delete(reverse('product-reviews-detail', args=(resp_first.json()['id'],)))
+    product.refresh_from_db()
+    assert (product.rating_count, product.rating_avg) == (0, 0)
+
+
+@pytest.mark.django_db
+def test_rebuild_product_ratings(product_factory, product_review_factory):
+    """Тест команды полного пересчета оценок"""
+    product = product_factory()
+    product_review_factory(product=product, grade=1)
+    product_review_factory(product=product, grade=4)
+    call_command('rebuild_product_ratings', chunk_size=1, stdout=StringIO())
+    product.refresh_from_db()
+    assert (product.rating_count, product.rating_sum, product.rating_avg) == (2, 5, 2.5)
+
+
+@pytest.mark.django_db
+def test_product_review_sparse_fields(api_client, product_review_factory):
+    """Тест выборочных полей вложенного продукта: описание продукта не выводится и не читается из базы"""
+    product_review_factory(_quantity=3, grade=4)
+    url = reverse('product-reviews-list')
+    with CaptureQueriesContext(connection) as queries:
+        resp = api_client.get(url, {'fields': 'id,grade,product.name'})
+    page_sql = queries.captured_queries[-1]['sql']
+    resp_omit = api_client.get(url, {'omit': 'user,product.description'})
+    resp_unknown = api_client.get(url, {'fields': 'grade.value'})
+    assert resp.status_code == HTTP_200_OK
+    assert resp.json()['results'][0].keys() == {'id', 'grade', 'product'}
+    assert resp.json()['results'][0]['product'].keys() == {'name'}
+    assert '"description"' not in page_sql and 'auth_user' not in page_sql
+    assert 'user' not in resp_omit.json()['results'][0]
+    assert 'description' not in resp_omit.json()['results'][0]['product']
+    assert resp_unknown.status_code == HTTP_400_BAD_REQUEST
@@ -0,0 +1,103 @@
+from datetime import timedelta
+from decimal import Decimal
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import IntegrityError
+from django.urls import reverse
+from django.utils import timezone
+from model_bakery import baker
+from rest_framework.status import HTTP_200_OK, HTTP_404_NOT_FOUND
+
+from store.analytics import rebuild_sales_stats
+from store.archive import archive_orders
+from store.models import (ArchivedOrder, ArchivedOrderPosition, Order, OrderStatusDay, ProductOrderPosition,
+                          ProductSalesDay)
+
+
+def make_order(user, status, age_days, quantity=1):
+    order = baker.make(Order, user=user, order_status=status, total=Decimal('10.00') * quantity)
+    baker.make(ProductOrderPosition, order=order, quantity=quantity, unit_price=Decimal('10.00'))
+    moment = timezone.now() - timedelta(days=age_days)
+    Order.objects.filter(id=order.id).update(created_at=moment, updated_at=moment)
+    return order
+
+
+@pytest.fixture
+def orders():
+    user = User.objects.create_user('buyer')
+    return {
+        'old_done': make_order(user, 'DONE', 400, quantity=2),
+        'old_new': make_order(user, 'NEW', 400),
+        'recent_done': make_order(user, 'DONE', 10),
+        'other_done': make_order(User.objects.create_user('other'), 'DONE', 500),
+    }
+
+
+@pytest.mark.django_db
+def test_archive_orders_command(orders):
+    """Тест переноса в архив только старых выполненных заказов вместе с позициями"""
+    call_command('archive_orders', days=365, chunk_size=1)
+    archived = ArchivedOrder.objects.get(id=orders['old_done'].id)
+    assert set(ArchivedOrder.objects.values_list('id', flat=True)) == {orders['old_done'].id, orders['other_done'].id}
+    assert set(Order.objects.values_list('id', flat=True)) == {orders['old_new'].id, orders['recent_done'].id}
+    assert archived.total == Decimal('20.00') and archived.created_at == archived.updated_at
+    assert [position.quantity for position in archived.positions.all()] == [2]
+    assert not ProductOrderPosition.objects.filter(order_id=orders['old_done'].id).exists()
+    assert archive_orders(older_than=timedelta(days=365)) == 0
+
+
+@pytest.mark.django_db
+def test_archive_orders_conflict(orders):
+    """Тест конфликта с архивом: заказ с ID, уже занятым в архиве, не удаляется, порция откатывается"""
+    order = orders['old_done']
+    baker.make(ArchivedOrder, id=order.id, user=order.user, order_status='DONE', total=Decimal('1.00'))
+    with pytest.raises(IntegrityError):
+        archive_orders(older_than=timedelta(days=365))
+    assert Order.objects.filter(id=order.id, total=Decimal('20.00')).exists()
+    assert ArchivedOrder.objects.get(id=order.id).total == Decimal('1.00')
+    assert not ArchivedOrderPosition.objects.exists()
+
+
+@pytest.mark.django_db
+def test_archive_orders_rebuild_stats(orders):
+    """Тест пересчета роллапов после архивации: архивные заказы остаются в статистике"""
+    rebuild_sales_stats()
+    sales = list(ProductSalesDay.objects.order_by('day', 'product').values('quantity', 'revenue'))
+    statuses = list(OrderStatusDay.objects.order_by('day', 'order_status').values('orders', 'revenue'))
+    archived = archive_orders(older_than=timedelta(days=365))
+    rebuild_sales_stats()
+    assert archived == 2
+    assert list(ProductSalesDay.objects.order_by('day', 'product').values('quantity', 'revenue')) == sales
+    assert list(OrderStatusDay.objects.order_by('day', 'order_status').values('orders', 'revenue')) == statuses
+    assert {'quantity': 2, 'revenue': Decimal('20.00')} in sales
+
+
+@pytest.mark.django_db
+def test_orders_include_archived(api_client, orders):
+    """Тест списка и деталей заказов с архивом: только по ?include_archived=1, в общем порядке и по страницам"""
+    archive_orders(older_than=timedelta(days=365))
+    admin = User.objects.create_user('test_admin', is_staff=True)
+    api_client.force_authenticate(user=admin)
+    url = reverse('orders-list')
+    live = [order['id'] for order in api_client.get(url).json()['results']]
+    pages = []
+    next_url = f'{url}?include_archived=1&page_size=1'
+    while next_url:
+        page = api_client.get(next_url).json()
+        pages += [order['id'] for order in page['results']]
+        next_url = page['next']
+    created = dict(Order.objects.values_list('id', 'created_at'))
+    created.update(ArchivedOrder.objects.values_list('id', 'created_at'))
+    detail_url = reverse('orders-detail', args=(orders['old_done'].id,))
+    resp_detail = api_client.get(detail_url, {'include_archived': 1})
+    resp_missing = api_client.get(detail_url)
+    api_client.force_authenticate(user=orders['old_done'].user)
+    own = api_client.get(url, {'include_archived': 1}).json()['results']
+    assert set(live) == {orders['old_new'].id, orders['recent_done'].id}
+    assert pages == sorted(created, key=lambda order_id: (created[order_id], order_id))
+    assert resp_detail.status_code == HTTP_200_OK
+    assert resp_detail.json()['products'][0]['quantity'] == 2
+    assert resp_missing.status_code == HTTP_404_NOT_FOUND
+    assert {order['id'] for order in own} == {orders['old_done'].id, orders['old_new'].id, orders['recent_done'].id}
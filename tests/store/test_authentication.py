@@ -0,0 +1,88 @@
+import pytest
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.status import HTTP_200_OK, HTTP_201_CREATED, HTTP_401_UNAUTHORIZED, HTTP_403_FORBIDDEN
+
+from store.authentication import local_cache
+
+
+@pytest.fixture
+def token_client(api_client):
+    def factory(user):
+        token = Token.objects.create(user=user)
+        api_client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        return token
+
+    yield factory
+    local_cache.clear()
+
+
+@pytest.mark.django_db
+def test_cached_token_authentication(api_client, token_client):
+    """Тест аутентификации по токену без запроса к базе при повторных запросах"""
+    test_user = User.objects.create_user('test_user')
+    token_client(test_user)
+    url = reverse('orders-list')
+    resp_first = api_client.get(url)
+    with CaptureQueriesContext(connection) as queries:
+        resp_second = api_client.get(url)
+    assert resp_first.status_code == HTTP_200_OK
+    assert resp_second.status_code == HTTP_200_OK
+    assert not any('authtoken_token' in query['sql'] for query in queries.captured_queries)
+
+
+@pytest.mark.django_db
+def test_cached_token_invalidation(api_client, token_client):
+    """Тест сброса кэша при смене прав пользователя и удалении токена"""
+    test_user = User.objects.create_user('test_user')
+    token = token_client(test_user)
+    url = reverse('products-list')
+    payload = {'name': 'test product', 'description': 'product description', 'price': '10.00'}
+    resp_user = api_client.post(url, payload, format='json')
+    test_user.is_staff = True
+    test_user.save()
+    resp_staff = api_client.post(url, payload, format='json')
+    token.delete()
+    resp_deleted = api_client.post(url, payload, format='json')
+    assert resp_user.status_code == HTTP_403_FORBIDDEN
+    assert resp_staff.status_code == HTTP_201_CREATED
+    assert resp_deleted.status_code == HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.django_db
+def test_cached_token_inactive_user(api_client, token_client):
+    """Тест отказа в доступе деактивированному пользователю"""
+    test_user = User.objects.create_user('test_user')
+    token_client(test_user)
+    url = reverse('orders-list')
+    resp_active = api_client.get(url)
+    test_user.is_active = False
+    test_user.save()
+    resp_inactive = api_client.get(url)
+    assert resp_active.status_code == HTTP_200_OK
+    assert resp_inactive.status_code == HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.django_db
+def test_cached_token_invalidation_shared(api_client, token_client, settings):
+    """Тест сброса через общий кэш: устаревшая локальная запись другого процесса не принимается"""
+    settings.STORE_TOKEN_CACHE = {'SHARED_CACHE': 'default'}
+    test_user = User.objects.create_user('test_user')
+    token = token_client(test_user)
+    url = reverse('products-list')
+    payload = {'name': 'test product', 'description': 'product description', 'price': '10.00'}
+    resp_user = api_client.post(url, payload, format='json')
+    stale = local_cache.get(token.key)
+    test_user.is_staff = True
+    test_user.save()
+    local_cache.set(token.key, *stale)
+    resp_staff = api_client.post(url, payload, format='json')
+    with CaptureQueriesContext(connection) as queries:
+        resp_cached = api_client.get(url)
+    assert resp_user.status_code == HTTP_403_FORBIDDEN
+    assert resp_staff.status_code == HTTP_201_CREATED
+    assert resp_cached.status_code == HTTP_200_OK
+    assert not any('authtoken_token' in query['sql'] for query in queries.captured_queries)
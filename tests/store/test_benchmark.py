@@ -0,0 +1,38 @@
+import json
+from io import StringIO
+
+import pytest
+from django.conf import settings
+from django.core.management import call_command
+from store.benchmark import parse_http_file, percentile
+
+
+def test_parse_http_file():
+    """Тест разбора сценариев из requests.http"""
+    with open(settings.BASE_DIR / 'requests.http', encoding='utf-8') as stream:
+        scenarios = {scenario.name: scenario for scenario in parse_http_file(stream.read())}
+    products = scenarios['получение продуктов']
+    create = scenarios['создание продуктов админ']
+    assert (products.method, products.path, products.weight) == ('GET', '/api/v1/products/?price__gte=1000', 5)
+    assert create.token == '8d10b87e89200a69ecccd94e8a5102707d7c0e4a'
+    assert json.loads(create.body)['name'] == 'Test product'
+    assert scenarios['создание продуктов без авторизации'].token is None
+
+
+def test_percentile():
+    """Тест перцентилей по ближайшему рангу"""
+    values = list(range(1, 101))
+    assert (percentile(values, 0.5), percentile(values, 0.95), percentile(values, 0.99)) == (50, 95, 99)
+
+
+@pytest.mark.django_db
+def test_benchmark_command(tmp_path):
+    """Тест нагрузочного прогона in-process через WSGI с сохранением результатов"""
+    output = tmp_path / 'results.json'
+    call_command('benchmark_api', mode='wsgi', concurrency='1', requests=40, products=20, users=3, reviews=20,
+                 orders=20, collections=2, host='testserver', output=str(output), stdout=StringIO())
+    run = json.loads(output.read_text(encoding='utf-8'))['runs'][0]
+    products = run['endpoints']['получение продуктов']
+    assert (run['mode'], run['concurrency'], run['requests']) == ('wsgi', 1, 40)
+    assert run['errors'] == 0
+    assert products['statuses'] == {'200': products['requests']}
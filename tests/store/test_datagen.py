@@ -0,0 +1,40 @@
+from collections import Counter
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db.models import DecimalField, F, Sum
+from django.utils import timezone
+from store.models import Order, Product, ProductOrderPosition, ProductReview
+
+
+def order_fingerprint(orders):
+    first_order = orders[0].id
+    first_product = Product.objects.order_by('-id').values_list('id', flat=True)[0] - 199
+    return [
+        (order.id - first_order, order.order_status, str(order.total),
+         sorted((position.product_id - first_product, position.quantity) for position in order.positions.all()))
+        for order in orders
+    ]
+
+
+@pytest.mark.django_db
+def test_generate_store_data():
+    """Тест генерации данных: суммы заказов, смещенное распределение товаров и повторяемость при одном seed"""
+    options = {'users': 30, 'products': 200, 'reviews': 300, 'orders': 300, 'collections': 5, 'chunk_size': 70,
+               'seed': 7, 'stdout': StringIO()}
+    call_command('generate_store_data', **options)
+    first = list(Order.objects.order_by('id').prefetch_related('positions'))
+    first_fingerprint = order_fingerprint(first)
+    call_command('generate_store_data', **options)
+    second = list(Order.objects.filter(id__gt=first[-1].id).order_by('id').prefetch_related('positions'))
+
+    totals = Order.objects.annotate(positions_total=Sum(F('positions__unit_price') * F('positions__quantity'),
+                                                        output_field=DecimalField()))
+    popularity = Counter(ProductOrderPosition.objects.values_list('product_id', flat=True))
+    assert len(first) == len(second) == 300
+    assert order_fingerprint(second) == first_fingerprint
+    assert all(order.total == order.positions_total for order in totals)
+    assert popularity.most_common(1)[0][1] > 5 * sum(popularity.values()) / 400
+    assert ProductReview.objects.filter(created_at__gt=timezone.now() - timezone.timedelta(minutes=1)).count() < 5
+    assert Product.objects.filter(rating_count__gt=0).exists()
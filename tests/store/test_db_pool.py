@@ -0,0 +1,152 @@
+import threading
+
+import pytest
+from django.db import connections
+from django.db.backends.sqlite3 import base as sqlite3
+from django.db.utils import OperationalError
+from django.urls import reverse
+
+from store.db.pool import ConnectionPool, PooledDatabaseWrapperMixin, PoolTimeout
+from store.instrumentation import RequestMetrics, _current_metrics
+
+
+class FakeConnection:
+    def __init__(self, number):
+        self.number = number
+        self.healthy = True
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def connect():
+    opened = []
+
+    def factory():
+        opened.append(FakeConnection(len(opened)))
+        return opened[-1]
+
+    factory.opened = opened
+    return factory
+
+
+def test_pool_reuse_and_eviction(clock, connect):
+    """Тест пула: повторное использование, проверка после простоя, закрытие лишних простаивающих и старых"""
+    pool = ConnectionPool(check=lambda raw: raw.healthy, min_size=1, max_size=3, max_idle=60, max_lifetime=600,
+                          check_after=10, clock=clock)
+    first, _ = pool.checkout(connect)
+    second, _ = pool.checkout(connect)
+    pool.checkin(first)
+    pool.checkin(second)
+    reused, _ = pool.checkout(connect)
+    pool.checkin(reused)
+    clock.now = 30
+    reused.healthy = False
+    replaced, _ = pool.checkout(connect)
+    pool.checkin(replaced)
+    clock.now = 100
+    pool.checkin(pool.checkout(connect)[0])
+    stats_idle = pool.stats()
+    clock.now = 700
+    old, _ = pool.checkout(connect)
+    pool.checkin(old)
+    assert reused is second
+    assert replaced is first and second.closed
+    assert stats_idle['idle'] == 1 and stats_idle['size'] == 1
+    assert old is first and first.closed and pool.stats()['size'] == 0
+    assert pool.stats()['opened'] == 2 and pool.stats()['checkouts'] == 6
+
+
+def test_pool_max_size_wait_and_timeout(connect):
+    """Тест ограничения размера пула: ожидание свободного соединения и таймаут"""
+    pool = ConnectionPool(max_size=1, timeout=0.05)
+    raw, _ = pool.checkout(connect)
+    with pytest.raises(PoolTimeout):
+        pool.checkout(connect)
+    result = {}
+
+    def worker():
+        result['raw'], result['wait'] = pool.checkout(connect)
+
+    pool.timeout = 5
+    thread = threading.Thread(target=worker)
+    thread.start()
+    threading.Event().wait(0.05)
+    pool.checkin(raw)
+    thread.join()
+    stats = pool.stats()
+    assert result['raw'] is raw and result['wait'] > 0
+    assert stats['timeouts'] == 1 and stats['waits'] == 2 and stats['in_use'] == 1
+    assert len(connect.opened) == 1
+
+
+def test_pool_failed_connect_releases_slot():
+    """Тест освобождения места в пуле, если соединение не удалось открыть"""
+    pool = ConnectionPool(max_size=1, timeout=0)
+
+    def broken():
+        raise ConnectionError('нет связи')
+
+    with pytest.raises(ConnectionError):
+        pool.checkout(broken)
+    assert pool.stats()['size'] == 0
+
+
+class PooledSQLiteWrapper(PooledDatabaseWrapperMixin, sqlite3.DatabaseWrapper):
+    pass
+
+
+def pooled_connection(name, alias='pooled'):
+    settings_dict = dict(connections['default'].settings_dict, NAME=name, POOL={'MAX_SIZE': 1, 'TIMEOUT': 0.01})
+    return PooledSQLiteWrapper(settings_dict, alias=alias)
+
+
+@pytest.mark.django_db
+def test_pooled_database_wrapper(tmp_path):
+    """Тест бэкенда с пулом: закрытое соединение возвращается в пул, ожидание и загрузка попадают в метрики"""
+    name = str(tmp_path / 'pool.sqlite3')
+    first = pooled_connection(name)
+    metrics = RequestMetrics()
+    token = _current_metrics.set(metrics)
+    try:
+        with first.cursor() as cursor:
+            cursor.execute('CREATE TABLE item (id integer)')
+    finally:
+        _current_metrics.reset(token)
+    raw = first.connection
+    busy = pooled_connection(name)
+    with pytest.raises(OperationalError):
+        busy.ensure_connection()
+    first.close()
+    second = pooled_connection(name)
+    with second.cursor() as cursor:
+        cursor.execute('SELECT COUNT(*) FROM item')
+    assert second.connection is raw
+    assert metrics.pool_usage == (1, 1)
+    assert 'pool;dur=' in metrics.server_timing()
+    assert metrics.as_dict()['pool_in_use'] == 1
+    second.close()
+    second.pool.close_idle()
+
+
+@pytest.mark.django_db
+def test_server_timing_without_pool(api_client, settings):
+    """Тест отсутствия метрик пула, если соединение не из пула"""
+    settings.STORE_INSTRUMENTATION = {'ENABLED': True}
+    resp = api_client.get(reverse('products-list'))
+    assert 'pool;' not in resp['Server-Timing']
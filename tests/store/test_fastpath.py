@@ -0,0 +1,98 @@
+from decimal import Decimal
+
+import pytest
+from django.contrib.auth.models import User
+from django.urls import reverse
+from django.utils import timezone
+from model_bakery import baker
+from rest_framework.status import HTTP_200_OK
+
+from store.fastpath import compiled_converter
+from store.models import Order, Product, ProductOrderPosition
+from store.serializers import OrderSerializer, ProductSerializer
+
+
+def fetch(client, settings, url, params, fast):
+    settings.STORE_FAST_LIST_SERIALIZATION = fast
+    resp = client.get(url, params)
+    assert resp.status_code == HTTP_200_OK
+    return resp
+
+
+@pytest.fixture
+def admin_client(api_client):
+    api_client.force_authenticate(user=User.objects.create_user('test_admin', is_staff=True))
+    return api_client
+
+
+@pytest.fixture
+def catalog():
+    products = [
+        Product.objects.create(name='Первый', description='текст', price=Decimal('10.5')),
+        Product.objects.create(sku='SKU-2', name='Второй "товар"', description='', price=Decimal('0.01')),
+        Product.objects.create(name='Третий', description='многострочный\nтекст', price=Decimal('99999999.99'),
+                               rating_avg=4.333333333333333, rating_count=3),
+    ]
+    user = User.objects.create_user('buyer', first_name='Иван', last_name='Петров')
+    orders = [
+        Order.objects.create(user=user, total=Decimal('21.00')),
+        Order.objects.create(user=User.objects.create_user('other'), total=None, order_status='DONE'),
+        Order.objects.create(user=user),
+    ]
+    for quantity, product in enumerate(products, start=1):
+        baker.make(ProductOrderPosition, order=orders[0], product=product, quantity=quantity,
+                   unit_price=product.price)
+    baker.make(ProductOrderPosition, order=orders[1], product=products[1], quantity=7, unit_price=Decimal('3'))
+    return products, orders
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('url_name', ['products-list', 'orders-list'])
+@pytest.mark.parametrize('params', [{}, {'page_size': 2}, {'ordering': '-created_at'}, {'page_size': 1}])
+def test_fast_list_parity(admin_client, settings, catalog, url_name, params):
+    """Тест совпадения ответа быстрого list с обычной сериализацией байт в байт, включая курсоры"""
+    url = reverse(url_name)
+    regular = fetch(admin_client, settings, url, params, fast=False)
+    fast = fetch(admin_client, settings, url, params, fast=True)
+    assert fast.content == regular.content
+    next_url = regular.json()['next']
+    while next_url:
+        regular = fetch(admin_client, settings, next_url, {}, fast=False)
+        fast = fetch(admin_client, settings, next_url, {}, fast=True)
+        assert fast.content == regular.content
+        next_url = regular.json()['next']
+
+
+def test_fast_list_converters():
+    """Тест сборки преобразователей для продуктов и заказов с вложенными пользователем и позициями"""
+    order = compiled_converter(OrderSerializer, timezone.utc)
+    assert compiled_converter(ProductSerializer, timezone.utc) is not None
+    assert 'user__username' in order.columns
+    assert [relation[0] for relation in order.relations] == ['positions']
+
+
+@pytest.mark.django_db
+def test_fast_list_queries(admin_client, settings, catalog, django_assert_num_queries):
+    """Тест количества запросов быстрого list заказов: страница и позиции"""
+    settings.STORE_FAST_LIST_SERIALIZATION = True
+    with django_assert_num_queries(2):
+        resp = admin_client.get(reverse('orders-list'))
+    assert len(resp.json()['results']) == 3
+
+
+@pytest.mark.django_db
+def test_fast_list_owner_filter(api_client, settings, catalog):
+    """Тест быстрого list заказов обычного пользователя: только свои заказы"""
+    settings.STORE_FAST_LIST_SERIALIZATION = True
+    products, orders = catalog
+    api_client.force_authenticate(user=orders[0].user)
+    resp = api_client.get(reverse('orders-list'))
+    assert {order['id'] for order in resp.json()['results']} == {orders[0].id, orders[2].id}
+
+
+@pytest.mark.django_db
+def test_fast_list_sparse_fallback(admin_client, settings, catalog):
+    """Тест обычной сериализации при ?fields= с включенным быстрым list"""
+    settings.STORE_FAST_LIST_SERIALIZATION = True
+    resp = admin_client.get(reverse('products-list'), {'fields': 'id,name'})
+    assert set(resp.json()['results'][0]) == {'id', 'name'}
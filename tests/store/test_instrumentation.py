@@ -0,0 +1,34 @@
+import json
+import logging
+
+import pytest
+from django.urls import reverse
+from rest_framework.status import HTTP_200_OK
+
+
+@pytest.fixture
+def instrumentation(settings):
+    settings.STORE_INSTRUMENTATION = {'ENABLED': True, 'LOG': True}
+
+
+@pytest.mark.django_db
+def test_server_timing_header(api_client, product_factory, instrumentation, caplog):
+    """Тест метрик запроса в заголовке Server-Timing и в логе"""
+    product_factory(_quantity=3)
+    url = reverse('products-list')
+    with caplog.at_level(logging.INFO, logger='store.instrumentation'):
+        resp = api_client.get(url)
+    metrics = {item.split(';')[0] for item in resp['Server-Timing'].split(', ')}
+    record = json.loads(caplog.records[-1].getMessage())
+    assert resp.status_code == HTTP_200_OK
+    assert metrics == {'db', 'serialize', 'render', 'total'}
+    assert record['path'] == url
+    assert record['queries'] >= 1
+    assert record['serialize_ms'] >= 0
+
+
+@pytest.mark.django_db
+def test_server_timing_disabled(api_client):
+    """Тест отсутствия заголовка при выключенном инструментировании"""
+    resp = api_client.get(reverse('products-list'))
+    assert not resp.has_header('Server-Timing')
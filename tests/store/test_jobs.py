@@ -0,0 +1,148 @@
+from datetime import timedelta
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.status import HTTP_200_OK, HTTP_201_CREATED, HTTP_403_FORBIDDEN
+
+from store.jobs import TASKS, backoff, claim_jobs, enqueue, requeue_stale, run_job, task
+from store.models import Job, JobStatusChoices, OrderStatusDay, ProductSalesDay
+
+
+@pytest.fixture
+def queue(settings):
+    settings.STORE_JOBS = {'EAGER': False, 'BACKOFF': 0, 'MAX_ATTEMPTS': 2}
+    calls = []
+
+    @task('test.record')
+    def record(value):
+        calls.append(value)
+
+    @task('test.broken')
+    def broken():
+        raise ValueError('сломано')
+
+    yield calls
+    del TASKS['test.record'], TASKS['test.broken']
+
+
+def make_job(name='test.record', **kwargs):
+    return Job.objects.create(name=name, payload=kwargs.pop('payload', {'value': 1}), max_attempts=2,
+                              run_at=kwargs.pop('run_at', timezone.now()), **kwargs)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_order_rollups_via_queue(api_client, product_factory, queue):
+    """Тест обновления роллапов через очередь: задача ставится после фиксации заказа и выполняется воркером"""
+    product = product_factory(price=10)
+    api_client.force_authenticate(user=User.objects.create_user('buyer'))
+    resp = api_client.post(reverse('orders-list'), {'products': [{'product': product.id, 'quantity': 3}]},
+                           format='json')
+    queued = list(Job.objects.values_list('name', 'status'))
+    sales_before = ProductSalesDay.objects.count()
+    call_command('run_workers', burst=True, threads=2)
+    assert resp.status_code == HTTP_201_CREATED
+    assert queued == [('store.apply_sales_delta', JobStatusChoices.QUEUED)]
+    assert sales_before == 0
+    assert list(ProductSalesDay.objects.values_list('quantity', 'revenue')) == [(3, 30)]
+    assert list(OrderStatusDay.objects.values_list('orders', 'revenue')) == [(1, 30)]
+    assert Job.objects.get().status == JobStatusChoices.DONE
+
+
+@pytest.mark.django_db(transaction=True)
+def test_enqueue_in_transaction(queue):
+    """Тест постановки задачи в транзакции базы очереди: откат транзакции не оставляет задачи"""
+    with transaction.atomic():
+        enqueue('test.record', {'value': 1})
+        inside = Job.objects.count()
+    with pytest.raises(RuntimeError):
+        with transaction.atomic():
+            enqueue('test.record', {'value': 2})
+            raise RuntimeError
+    enqueue('test.record', {'value': 3}, delay=60)
+    call_command('run_workers', burst=True)
+    assert inside == 1
+    assert queue == [1]
+    assert list(Job.objects.values_list('payload', 'status').order_by('id')) == [
+        ({'value': 1}, JobStatusChoices.DONE), ({'value': 3}, JobStatusChoices.QUEUED)]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_rebuild_discards_pending_deltas(api_client, product_factory, queue):
+    """Тест пересчета роллапов при невыполненных задачах: задачи удаляются, изменения не учитываются дважды"""
+    product = product_factory(price=10)
+    api_client.force_authenticate(user=User.objects.create_user('buyer'))
+    for quantity in (3, 2):
+        api_client.post(reverse('orders-list'), {'products': [{'product': product.id, 'quantity': quantity}]},
+                        format='json')
+    failed = Job.objects.order_by('id').first()
+    failed.status = JobStatusChoices.FAILED
+    failed.save()
+    call_command('rebuild_sales_stats')
+    call_command('run_workers', burst=True)
+    assert list(ProductSalesDay.objects.values_list('quantity', 'revenue')) == [(5, 50)]
+    assert not Job.objects.exists()
+
+
+@pytest.mark.django_db
+def test_job_retries_and_failure(queue, settings):
+    """Тест повторов неудачной задачи с паузой backoff и статуса FAILED после последней попытки"""
+    job = make_job('test.broken', payload={})
+    first, = claim_jobs('worker', 10)
+    run_job(first)
+    job.refresh_from_db()
+    retry_status, retry_run_at = job.status, job.run_at
+    job.run_at = timezone.now()
+    job.save()
+    second, = claim_jobs('worker', 10)
+    run_job(second)
+    job.refresh_from_db()
+    settings.STORE_JOBS = {'BACKOFF': 2, 'MAX_BACKOFF': 10}
+    assert retry_status == JobStatusChoices.QUEUED and retry_run_at >= first.started_at
+    assert job.status == JobStatusChoices.FAILED and job.attempts == 2
+    assert 'ValueError: сломано' in job.last_error
+    assert timedelta(seconds=6.4) <= backoff(3) <= timedelta(seconds=9.6)
+    assert backoff(10) <= timedelta(seconds=12)
+
+
+@pytest.mark.django_db
+def test_claim_jobs(queue, settings):
+    """Тест выдачи задач: задача достается одному воркеру, отложенные не выдаются, зависшие возвращаются"""
+    ready = [make_job(payload={'value': value}) for value in range(3)]
+    make_job(run_at=timezone.now() + timedelta(minutes=5))
+    first = claim_jobs('first', 2)
+    second = claim_jobs('second', 10)
+    third = claim_jobs('third', 10)
+    owners = {job.locked_by for job in first}
+    settings.STORE_JOBS = {'LEASE': 0}
+    requeued = requeue_stale()
+    lost = run_job(first[0])
+    first[0].refresh_from_db()
+    assert [job.id for job in first + second] == [job.id for job in ready]
+    assert third == []
+    assert owners == {'first'}
+    assert requeued == 3
+    assert lost is None and first[0].status == JobStatusChoices.QUEUED
+
+
+@pytest.mark.django_db
+def test_jobs_stats(api_client, queue):
+    """Тест статистики очереди: глубина по статусам, возраст самой старой задачи и задержки, только для админов"""
+    make_job(run_at=timezone.now() - timedelta(seconds=30))
+    make_job()
+    done, = claim_jobs('worker', 1)
+    run_job(done)
+    url = reverse('stats-jobs')
+    api_client.force_authenticate(user=User.objects.create_user('buyer'))
+    resp_user = api_client.get(url)
+    api_client.force_authenticate(user=User.objects.create_user('test_admin', is_staff=True))
+    resp = api_client.get(url)
+    stats = resp.json()
+    assert resp_user.status_code == HTTP_403_FORBIDDEN
+    assert resp.status_code == HTTP_200_OK
+    assert stats['depth'] == {'QUEUED': 1, 'RUNNING': 0, 'DONE': 1, 'FAILED': 0}
+    assert 0 <= stats['oldest_queued_seconds'] < 30
+    assert stats['done_recently'] == 1 and stats['wait_ms']['avg'] >= 30000
@@ -1,8 +1,17 @@
+import json
+from datetime import timedelta
+from decimal import Decimal
+
 import pytest
 from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import QuerySet
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from store.models import Order, Product
 from rest_framework.status import HTTP_200_OK, HTTP_401_UNAUTHORIZED, HTTP_201_CREATED, \
-    HTTP_403_FORBIDDEN, HTTP_400_BAD_REQUEST
+    HTTP_403_FORBIDDEN, HTTP_400_BAD_REQUEST, HTTP_207_MULTI_STATUS, HTTP_204_NO_CONTENT
 
 
 @pytest.mark.django_db
@@ -42,8 +51,8 @@ def test_order_list(api_client, order_factory):
     test_admin = User.objects.create_user('test_admin', is_staff=True)
     api_client.force_authenticate(user=test_admin)
     resp_admin = api_client.get(url)
-    assert resp_test_user.status_code == HTTP_200_OK and len(resp_test_user.data) == 1
-    assert resp_admin.status_code == HTTP_200_OK and len(resp_admin.data) == 5
+    assert resp_test_user.status_code == HTTP_200_OK and len(resp_test_user.data['results']) == 1
+    assert resp_admin.status_code == HTTP_200_OK and len(resp_admin.data['results']) == 5
     assert resp_not_authenticate.status_code == HTTP_401_UNAUTHORIZED
 
 
@@ -112,6 +121,28 @@ def test_order_update_status(api_client, order_factory, ):
     assert resp_admin.status_code == HTTP_200_OK and resp_admin_json['order_status'] == 'DONE'
 
 
+@pytest.mark.django_db
+def test_order_update_locks_row(api_client, order_factory, monkeypatch):
+    """Тест изменения и удаления заказа: строка заказа блокируется до снимка состояния для роллапов"""
+    locked = []
+    select_for_update = QuerySet.select_for_update
+
+    def spy(queryset, **kwargs):
+        locked.append((queryset.model, kwargs))
+        return select_for_update(queryset, **kwargs)
+
+    monkeypatch.setattr(QuerySet, 'select_for_update', spy)
+    order = order_factory()
+    url = reverse('orders-detail', args=(order.id,))
+    api_client.force_authenticate(user=User.objects.create_user('test_admin', is_staff=True))
+    resp_retrieve = api_client.get(url)
+    resp_update = api_client.patch(url, {'order_status': 'DONE'}, format='json')
+    resp_destroy = api_client.delete(url)
+    assert resp_retrieve.status_code == HTTP_200_OK and resp_update.status_code == HTTP_200_OK
+    assert resp_destroy.status_code == HTTP_204_NO_CONTENT
+    assert locked == [(Order, {'of': ('self',)})] * 2
+
+
 @pytest.mark.django_db
 def test_order_filter_status(api_client, order_factory):
     """Тест фильтра по статусу заказа"""
@@ -122,7 +153,7 @@ def test_order_filter_status(api_client, order_factory):
     api_client.force_authenticate(user=test_admin)
     resp_done = api_client.get(url, {'order_status__iexact': 'DONE'})
     assert resp_done.status_code == HTTP_200_OK
-    assert len(resp_done.json()) == 5
+    assert len(resp_done.json()['results']) == 5
 
 
 @pytest.mark.django_db
@@ -136,8 +167,111 @@ def test_order_filter_total(api_client, order_factory, ):
     url = reverse('orders-list')
     api_client.force_authenticate(user=test_admin)
     resp = api_client.get(url, {'total__lte': 4000.00})
-    resp_json = resp.json()
+    resp_json = resp.json()['results']
     total_list = [float(_['total']) for _ in resp_json]
     assert resp.status_code == HTTP_200_OK
     for amount in total_list:
         assert amount <= 4000.00
+
+
+@pytest.mark.django_db
+def test_order_create_pricing(api_client, product_factory):
+    """Тест расчета суммы заказа по зафиксированным ценам позиций
+     и постоянного количества запросов независимо от числа позиций"""
+    url = reverse('orders-list')
+    products = product_factory(_quantity=10, price=100)
+    test_user = User.objects.create_user('test_user')
+    api_client.force_authenticate(user=test_user)
+    with CaptureQueriesContext(connection) as small_order:
+        api_client.post(url, {'products': [{'product': products[0].id, 'quantity': 1}]}, format='json')
+    with CaptureQueriesContext(connection) as large_order:
+        resp = api_client.post(url, {'products': [{'product': product.id, 'quantity': 2}
+                                                  for product in products]}, format='json')
+    Product.objects.update(price=1)
+    order = Order.objects.get(id=resp.json()['id'])
+    order.save()
+    assert resp.status_code == HTTP_201_CREATED
+    assert Decimal(resp.json()['total']) == Decimal('2000')
+    assert len(large_order) == len(small_order)
+    assert {position.unit_price for position in order.positions.all()} == {Decimal('100')}
+    assert order.total == Decimal('2000')
+
+
+@pytest.mark.django_db
+def test_order_create_unknown_product(api_client, product_factory):
+    """Тест создания заказа с несуществующим продуктом"""
+    url = reverse('orders-list')
+    product = product_factory()
+    test_user = User.objects.create_user('test_user')
+    api_client.force_authenticate(user=test_user)
+    resp = api_client.post(url, {'products': [{'product': product.id, 'quantity': 1},
+                                              {'product': product.id + 100, 'quantity': 1}]}, format='json')
+    assert resp.status_code == HTTP_400_BAD_REQUEST
+    assert Order.objects.count() == 0
+
+
+@pytest.mark.django_db
+def test_order_bulk_create(api_client, product_factory):
+    """Тест пакетного создания заказов с частичной ошибкой"""
+    url = reverse('orders-bulk')
+    products = product_factory(_quantity=3, price=10)
+    payload = [
+        {'products': [{'product': products[0].id, 'quantity': 1}, {'product': products[1].id, 'quantity': 2}]},
+        {'products': [{'product': products[2].id + 100, 'quantity': 1}]},
+        {'products': [{'product': products[2].id, 'quantity': 3}]},
+    ]
+    resp_not_authenticate = api_client.post(url, payload, format='json')
+    test_user = User.objects.create_user('test_user')
+    api_client.force_authenticate(user=test_user)
+    resp = api_client.post(url, payload, format='json')
+    result = resp.json()
+    assert resp_not_authenticate.status_code == HTTP_401_UNAUTHORIZED
+    assert resp.status_code == HTTP_207_MULTI_STATUS
+    assert [item['status'] for item in result] == ['created', 'error', 'created']
+    orders = {order.id: order for order in Order.objects.filter(user=test_user)}
+    assert set(orders) == {result[0]['id'], result[2]['id']}
+    assert orders[result[0]['id']].total == Decimal('30')
+    assert orders[result[2]['id']].positions.get().quantity == 3
+
+
+@pytest.mark.django_db
+def test_order_bulk_create_jsonl(api_client, product_factory):
+    """Тест пакетного создания заказов из потока JSON Lines"""
+    url = reverse('orders-bulk')
+    product = product_factory()
+    line = json.dumps({'products': [{'product': product.id, 'quantity': 1}]})
+    test_user = User.objects.create_user('test_user')
+    api_client.force_authenticate(user=test_user)
+    resp = api_client.post(url, f'{line}\n\n{line}\n', content_type='application/x-ndjson')
+    assert resp.status_code == HTTP_201_CREATED
+    assert len(resp.json()) == 2
+    assert Order.objects.filter(user=test_user).count() == 2
+
+
+@pytest.mark.django_db
+def test_order_filter_date(api_client, order_factory):
+    """Тест фильтра по дате создания и регистронезависимого фильтра по статусу"""
+    order = order_factory(order_status='IN_PROGRESS')
+    test_admin = User.objects.create_user('test_admin', is_staff=True)
+    url = reverse('orders-list')
+    api_client.force_authenticate(user=test_admin)
+    today = timezone.localdate(order.created_at)
+    resp_today = api_client.get(url, {'created_at__date': today.isoformat(), 'order_status__iexact': 'in_progress'})
+    resp_yesterday = api_client.get(url, {'created_at__date': (today - timedelta(days=1)).isoformat()})
+    assert [item['id'] for item in resp_today.json()['results']] == [order.id]
+    assert resp_yesterday.json()['results'] == []
+
+
+@pytest.mark.django_db
+def test_order_sparse_fields(api_client, order_factory):
+    """Тест выборочных полей заказа: без позиций запрос позиций не выполняется"""
+    order = order_factory(total=100)
+    api_client.force_authenticate(user=order.user)
+    url = reverse('orders-list')
+    with CaptureQueriesContext(connection) as queries:
+        resp = api_client.get(url, {'fields': 'id,total,user.username'})
+    sql = ' '.join(query['sql'] for query in queries.captured_queries)
+    resp_positions = api_client.get(url, {'fields': 'id,products.quantity'})
+    assert resp.json()['results'] == [{'id': order.id, 'total': '100.00', 'user': {'username': order.user.username}}]
+    assert 'store_productorderposition' not in sql and '"password"' not in sql and '"username"' in sql
+    assert resp_positions.json()['results'] == [{'id': order.id, 'products': []}]
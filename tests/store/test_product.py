@@ -1,8 +1,19 @@
+import base64
+import csv
+import io
+import json
+from decimal import Decimal
+
 import pytest
 from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from store.cache import get_stats
 from store.models import Product
-from rest_framework.status import HTTP_200_OK, HTTP_201_CREATED, HTTP_403_FORBIDDEN, HTTP_204_NO_CONTENT
+from rest_framework.status import HTTP_200_OK, HTTP_201_CREATED, HTTP_403_FORBIDDEN, HTTP_204_NO_CONTENT, \
+    HTTP_404_NOT_FOUND, HTTP_304_NOT_MODIFIED, HTTP_400_BAD_REQUEST
 
 
 @pytest.mark.django_db
@@ -24,7 +35,7 @@ def test_product_list(api_client, product_factory):
     products = product_factory(_quantity=5)
     url = reverse('products-list')
     resp = api_client.get(url)
-    results = resp.json()
+    results = resp.json()['results']
     expected_ids = {product.id for product in products}
     results_ids = {product['id'] for product in results}
     assert resp.status_code == HTTP_200_OK
@@ -113,8 +124,8 @@ def test_product_filter_name(api_client, product_factory):
     filter_name_2 = product_names[3]
     resp1 = api_client.get(url, {'name__iexact': filter_name})
     resp2 = api_client.get(url, {'name__icontains': filter_name_2})
-    resp1_json = resp1.json()
-    resp2_json = resp2.json()
+    resp1_json = resp1.json()['results']
+    resp2_json = resp2.json()['results']
     result_names_1 = {product['name'] for product in resp1_json}
     result_names_2 = {product['name'] for product in resp2_json}
     assert resp1.status_code == HTTP_200_OK
@@ -131,7 +142,7 @@ def test_product_filter_description(api_client, product_factory):
     product_desc = [product.description for product in products]
     filter_desc = product_desc[2]
     resp = api_client.get(url, {'description__icontains': filter_desc})
-    resp_json = resp.json()
+    resp_json = resp.json()['results']
     result = {product['description'] for product in resp_json}
     assert resp.status_code == HTTP_200_OK
     assert all(str(filter_desc) == str(desc) for desc in result)
@@ -147,9 +158,9 @@ def test_product_filter_price(api_client, product_factory):
     resp = api_client.get(url, {'price': filter_price})
     resp_2 = api_client.get(url, {'price__lte': filter_price})
     resp_3 = api_client.get(url, {'price__gte': filter_price})
-    resp_json = resp.json()
-    resp_2_json = resp_2.json()
-    resp_3_json = resp_3.json()
+    resp_json = resp.json()['results']
+    resp_2_json = resp_2.json()['results']
+    resp_3_json = resp_3.json()['results']
     price_exact = {price['price'] for price in resp_json}
     price_lte = {price['price'] for price in resp_2_json}
     price_gte = {price['price'] for price in resp_3_json}
@@ -157,3 +168,258 @@ def test_product_filter_price(api_client, product_factory):
     assert all(float(price) == float(filter_price) for price in price_exact)
     assert all(float(price) <= float(filter_price) for price in price_lte)
     assert all(float(price) >= float(filter_price) for price in price_gte)
+
+
+@pytest.mark.django_db
+def test_product_list_pagination(api_client, product_factory):
+    """Тест постраничного вывода продуктов: проход вперед и назад по курсорам"""
+    products = product_factory(_quantity=7)
+    url = reverse('products-list')
+    seen_ids = []
+    pages = []
+    next_url = f'{url}?page_size=3'
+    while next_url:
+        resp = api_client.get(next_url)
+        assert resp.status_code == HTTP_200_OK
+        result = resp.json()
+        pages.append(result)
+        seen_ids += [product['id'] for product in result['results']]
+        next_url = result['next']
+    assert seen_ids == [product.id for product in products]
+    assert [len(page['results']) for page in pages] == [3, 3, 1]
+    assert pages[0]['previous'] is None
+    resp_previous = api_client.get(pages[2]['previous'])
+    assert [product['id'] for product in resp_previous.json()['results']] == seen_ids[3:6]
+
+
+@pytest.mark.django_db
+def test_product_list_pagination_with_filter(api_client, product_factory, settings):
+    """Тест постраничного вывода с фильтром и ограничения размера страницы"""
+    settings.STORE_MAX_PAGE_SIZE = 2
+    product_factory(_quantity=3, price=100)
+    expensive = product_factory(_quantity=3, price=1000)
+    url = reverse('products-list')
+    resp = api_client.get(url, {'price__gte': 500, 'page_size': 50})
+    result = resp.json()
+    assert [product['id'] for product in result['results']] == [product.id for product in expensive[:2]]
+    resp_next = api_client.get(result['next'])
+    assert [product['id'] for product in resp_next.json()['results']] == [expensive[2].id]
+    assert resp_next.json()['next'] is None
+
+
+@pytest.mark.django_db
+def test_product_list_invalid_cursor(api_client):
+    """Тест некорректного курсора"""
+    url = reverse('products-list')
+    resp = api_client.get(url, {'cursor': 'not-a-cursor'})
+    assert resp.status_code == HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('position', [['garbage', 1], [{'a': 1}, 1], [None, None], ['2026-01-01T00:00:00Z', 'x']])
+def test_product_list_invalid_cursor_values(api_client, product_factory, position):
+    """Тест курсора правильного формата с недопустимыми значениями полей сортировки"""
+    product_factory()
+    payload = json.dumps({'p': position, 'r': 0}).encode()
+    resp = api_client.get(reverse('products-list'), {'cursor': base64.urlsafe_b64encode(payload).decode()})
+    assert resp.status_code == HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+def test_product_search(api_client, product_factory):
+    """Тест полнотекстового поиска: совпадение в названии выше совпадения в описании"""
+    by_description = product_factory(name='Case', description='fits any phone')
+    by_name = product_factory(name='Phone X', description='black')
+    product_factory(name='Headphones', description='wireless')
+    url = reverse('products-list')
+    resp = api_client.get(url, {'search': 'phone'})
+    result_ids = [product['id'] for product in resp.json()['results']]
+    resp_page = api_client.get(url, {'search': 'phone', 'page_size': 1})
+    resp_next = api_client.get(resp_page.json()['next'])
+    assert resp.status_code == HTTP_200_OK
+    assert result_ids == [by_name.id, by_description.id]
+    assert [product['id'] for product in resp_next.json()['results']] == [by_description.id]
+
+
+@pytest.mark.django_db
+def test_product_search_pages_equal_rank(api_client, product_factory):
+    """Тест страниц поиска при одинаковом ранге у нескольких продуктов: строки на границе страниц не теряются
+     и не повторяются"""
+    products = [product_factory(name='Phone case', description='black') for _ in range(5)]
+    product_factory(name='Phone', description='phone case for phone')
+    url = reverse('products-list')
+    resp = api_client.get(url, {'search': 'case', 'page_size': 2})
+    result_ids = []
+    while True:
+        result_ids += [product['id'] for product in resp.json()['results']]
+        if not resp.json()['next']:
+            break
+        resp = api_client.get(resp.json()['next'])
+    assert len(result_ids) == len(set(result_ids)) == 6
+    assert set(product.id for product in products) <= set(result_ids)
+
+
+@pytest.mark.django_db
+def test_product_search_index_sync(api_client, product_factory):
+    """Тест обновления поискового индекса при изменении и удалении продукта"""
+    product = product_factory(name='Ноутбук', description='описание')
+    url = reverse('products-list')
+    product.name = 'Планшет'
+    product.save()
+    assert api_client.get(url, {'search': 'ноутбук'}).json()['results'] == []
+    assert [p['id'] for p in api_client.get(url, {'search': 'планшет'}).json()['results']] == [product.id]
+    product.delete()
+    assert api_client.get(url, {'search': 'планшет'}).json()['results'] == []
+
+
+@pytest.mark.django_db
+def test_product_rating_filter_and_ordering(api_client, product_factory):
+    """Тест фильтрации и сортировки продуктов по средней оценке"""
+    low = product_factory(rating_avg=2.0, rating_count=1)
+    high = product_factory(rating_avg=4.5, rating_count=2)
+    middle = product_factory(rating_avg=3.0, rating_count=3)
+    url = reverse('products-list')
+    resp = api_client.get(url, {'ordering': '-rating_avg'})
+    resp_filter = api_client.get(url, {'rating_avg__gte': 3})
+    assert [product['id'] for product in resp.json()['results']] == [high.id, middle.id, low.id]
+    assert {product['id'] for product in resp_filter.json()['results']} == {high.id, middle.id}
+
+
+@pytest.mark.django_db
+def test_product_import(api_client, product_factory):
+    """Тест загрузки каталога: новые продукты создаются, существующие обновляются по артикулу"""
+    product_factory(sku='A-1', name='old name', description='', price=10)
+    url = reverse('products-import-catalog')
+    rows = [
+        {'sku': 'A-1', 'name': 'new name', 'description': 'text', 'price': '15.50'},
+        {'sku': 'A-2', 'name': 'second', 'description': 'text', 'price': 20},
+        {'sku': 'A-3', 'name': 'bad price', 'price': 'abc'},
+    ]
+    body = '\n'.join(json.dumps(row) for row in rows)
+    test_user = User.objects.create_user('test_user')
+    api_client.force_authenticate(user=test_user)
+    resp_user = api_client.post(url, body, content_type='application/x-ndjson')
+    test_admin = User.objects.create_user('test_admin', is_staff=True)
+    api_client.force_authenticate(user=test_admin)
+    resp = api_client.post(url, body, content_type='application/x-ndjson')
+    result = resp.json()
+    assert resp_user.status_code == HTTP_403_FORBIDDEN
+    assert resp.status_code == HTTP_200_OK
+    assert (result['created'], result['updated'], result['failed']) == (1, 1, 1)
+    assert result['errors'][0]['line'] == 3
+    assert Product.objects.get(sku='A-1').price == Decimal('15.50')
+    assert Product.objects.get(sku='A-2').name == 'second'
+    assert [p['sku'] for p in api_client.get(reverse('products-list'), {'search': 'second'}).json()['results']] == \
+        ['A-2']
+
+
+@pytest.mark.django_db
+def test_product_export(api_client, product_factory):
+    """Тест потоковой выгрузки каталога в CSV и JSONL"""
+    products = product_factory(_quantity=3)
+    url = reverse('products-export-catalog')
+    test_admin = User.objects.create_user('test_admin', is_staff=True)
+    api_client.force_authenticate(user=test_admin)
+    resp_csv = api_client.get(url, {'output': 'csv'})
+    resp_jsonl = api_client.get(url)
+    csv_rows = list(csv.DictReader(io.StringIO(b''.join(resp_csv.streaming_content).decode())))
+    jsonl_rows = [json.loads(line) for line in b''.join(resp_jsonl.streaming_content).decode().splitlines()]
+    assert [int(row['id']) for row in csv_rows] == [product.id for product in products]
+    assert [row['name'] for row in jsonl_rows] == [product.name for product in products]
+
+
+@pytest.mark.django_db
+def test_import_products_command(tmp_path):
+    """Тест команды загрузки каталога из CSV и повторной загрузки без изменений"""
+    path = tmp_path / 'products.csv'
+    path.write_text('sku,name,description,price\nB-1,first,text,1.00\nB-2,second,text,2.00\n', encoding='utf-8')
+    call_command('import_products', str(path), chunk_size=1, stdout=io.StringIO())
+    out = io.StringIO()
+    call_command('import_products', str(path), stdout=out)
+    assert set(Product.objects.values_list('sku', flat=True)) == {'B-1', 'B-2'}
+    assert 'без изменений: 2' in out.getvalue()
+
+
+@pytest.mark.django_db
+def test_product_list_conditional_get(api_client, product_factory):
+    """Тест условного запроса списка продуктов: 304 до изменения, 200 после"""
+    products = product_factory(_quantity=3)
+    url = reverse('products-list')
+    resp = api_client.get(url)
+    etag = resp['ETag']
+    resp_not_modified = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    resp_filtered = api_client.get(url, {'price__gte': 0}, HTTP_IF_NONE_MATCH=etag)
+    products[0].name = 'changed'
+    products[0].save()
+    resp_modified = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert resp_not_modified.status_code == HTTP_304_NOT_MODIFIED
+    assert resp_not_modified['ETag'] == etag
+    assert resp_filtered.status_code == HTTP_200_OK
+    assert resp_modified.status_code == HTTP_200_OK
+    assert resp_modified['ETag'] != etag
+
+
+@pytest.mark.django_db
+def test_product_detail_conditional_get(api_client, product_factory):
+    """Тест условного запроса продукта по If-Modified-Since"""
+    product = product_factory()
+    url = reverse('products-detail', args=(product.id,))
+    resp = api_client.get(url)
+    resp_not_modified = api_client.get(url, HTTP_IF_MODIFIED_SINCE=resp['Last-Modified'])
+    assert resp.status_code == HTTP_200_OK
+    assert resp_not_modified.status_code == HTTP_304_NOT_MODIFIED
+    assert api_client.get(reverse('products-detail', args=(product.id + 1,))).status_code == HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+def test_product_response_cache(api_client, product_factory):
+    """Тест кэша ответов: повторный анонимный запрос без обращения к базе,
+     сброс кэша при изменении продукта, авторизованные запросы мимо кэша"""
+    product = product_factory()
+    url = reverse('products-list')
+    resp_miss = api_client.get(url)
+    with CaptureQueriesContext(connection) as queries:
+        resp_hit = api_client.get(url)
+    product.name = 'changed'
+    product.save()
+    resp_changed = api_client.get(url)
+    test_user = User.objects.create_user('test_user')
+    api_client.force_authenticate(user=test_user)
+    resp_user = api_client.get(url)
+    assert (resp_miss['X-Cache'], resp_hit['X-Cache'], resp_changed['X-Cache']) == ('MISS', 'HIT', 'MISS')
+    assert len(queries) == 0
+    assert resp_hit.content == resp_miss.content
+    assert resp_changed.json()['results'][0]['name'] == 'changed'
+    assert not resp_user.has_header('X-Cache')
+    assert get_stats()['hits'] == 1
+
+
+@pytest.mark.django_db
+def test_product_response_cache_host(api_client, product_factory, settings):
+    """Тест кэша ответов: ответы для разных хостов и схем не смешиваются, ссылки next ведут на свой хост"""
+    settings.ALLOWED_HOSTS = ['testserver', 'shop.example']
+    product_factory(_quantity=2)
+    url = reverse('products-list')
+    responses = [api_client.get(url, {'page_size': 1}, HTTP_HOST=host, secure=secure)
+                 for host, secure in (('testserver', False), ('shop.example', False), ('shop.example', True))]
+    assert [resp['X-Cache'] for resp in responses] == ['MISS', 'MISS', 'MISS']
+    assert [resp.json()['next'].split('/api/')[0] for resp in responses] == [
+        'http://testserver', 'http://shop.example', 'https://shop.example']
+
+
+@pytest.mark.django_db
+def test_product_sparse_fields(api_client, product_factory):
+    """Тест выборочных полей: в ответе и в SQL только запрошенные колонки"""
+    product_factory(_quantity=3)
+    url = reverse('products-list')
+    with CaptureQueriesContext(connection) as queries:
+        resp = api_client.get(url, {'fields': 'id,name', 'ordering': 'price'})
+    page_sql = queries.captured_queries[-1]['sql']
+    resp_omit = api_client.get(url, {'omit': 'description,sku'})
+    resp_unknown = api_client.get(url, {'fields': 'id,weight'})
+    assert resp.status_code == HTTP_200_OK
+    assert [set(item) for item in resp.json()['results']] == [{'id', 'name'}] * 3
+    assert resp.json()['next'] is None
+    assert '"description"' not in page_sql and '"price"' in page_sql
+    assert set(resp_omit.json()['results'][0]) == {'id', 'name', 'price', 'rating_avg', 'rating_count'}
+    assert resp_unknown.status_code == HTTP_400_BAD_REQUEST
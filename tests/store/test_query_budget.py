@@ -0,0 +1,259 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+from django.contrib.auth.models import User
+from django.db import connection
+from django.urls import reverse
+from django.utils import timezone
+
+from store.analytics import rebuild_sales_stats
+from store.models import Job, JobStatusChoices
+
+N = 2
+
+
+def admin():
+    return User.objects.create_user('budget_admin', is_staff=True)
+
+
+def buyer():
+    return User.objects.create_user('budget_user')
+
+
+def order_with_positions(make, user, n):
+    order = make.order(user=user, total=10 * n)
+    for product in make.product(price=10, _quantity=n):
+        make.position(order=order, product=product, quantity=1, unit_price=10)
+    return order
+
+
+def collection_with_products(make, n):
+    return make.collection(products=make.product(_quantity=n))
+
+
+def products_list(n, make):
+    make.product(_quantity=n)
+    return admin(), 'get', reverse('products-list'), {}
+
+
+def products_retrieve(n, make):
+    product = make.product()
+    make.review(product=product, grade=5, _quantity=n)
+    return admin(), 'get', reverse('products-detail', args=(product.id,)), {}
+
+
+def products_create(n, make):
+    make.product(_quantity=n)
+    payload = {'name': 'товар', 'description': 'описание', 'price': '10.00'}
+    return admin(), 'post', reverse('products-list'), {'data': payload, 'format': 'json'}
+
+
+def products_update(n, make):
+    product = make.product()
+    make.review(product=product, grade=5, _quantity=n)
+    payload = {'name': 'товар', 'description': 'описание', 'price': '10.00'}
+    return admin(), 'put', reverse('products-detail', args=(product.id,)), {'data': payload, 'format': 'json'}
+
+
+def products_destroy(n, make):
+    product = make.product()
+    make.review(product=product, grade=5, _quantity=n)
+    make.position(product=product, _quantity=n)
+    make.collection(products=[product], _quantity=n)
+    return admin(), 'delete', reverse('products-detail', args=(product.id,)), {}
+
+
+def products_export(n, make):
+    make.product(_quantity=n)
+    return admin(), 'get', reverse('products-export-catalog'), {}
+
+
+def products_import(n, make):
+    make.product(sku=iter(f'sku-{index}' for index in range(n)), _quantity=n)
+    lines = [json.dumps({'sku': f'sku-{index}', 'name': 'товар', 'price': '1.00'}) for index in range(2 * n)]
+    body = '\n'.join(lines)
+    return admin(), 'post', reverse('products-import-catalog'), {'data': body, 'content_type': 'application/x-ndjson'}
+
+
+def reviews_list(n, make):
+    make.review(grade=3, _quantity=n)
+    return None, 'get', reverse('product-reviews-list'), {}
+
+
+def reviews_retrieve(n, make):
+    review = make.review(grade=3)
+    make.review(product=review.product, grade=3, _quantity=n)
+    return None, 'get', reverse('product-reviews-detail', args=(review.id,)), {}
+
+
+def reviews_create(n, make):
+    product = make.product()
+    make.review(product=product, grade=3, _quantity=n)
+    payload = {'product_id': product.id, 'review': 'отзыв', 'grade': 5}
+    return buyer(), 'post', reverse('product-reviews-list'), {'data': payload, 'format': 'json'}
+
+
+def reviews_update(n, make):
+    review = make.review(grade=3)
+    make.review(product=review.product, grade=3, _quantity=n)
+    payload = {'product_id': review.product_id, 'review': 'отзыв', 'grade': 5}
+    url = reverse('product-reviews-detail', args=(review.id,))
+    return review.user, 'put', url, {'data': payload, 'format': 'json'}
+
+
+def reviews_destroy(n, make):
+    review = make.review(grade=3)
+    make.review(product=review.product, grade=3, _quantity=n)
+    return review.user, 'delete', reverse('product-reviews-detail', args=(review.id,)), {}
+
+
+def collections_list(n, make):
+    for _ in range(n):
+        collection_with_products(make, n)
+    return None, 'get', reverse('product-collections-list'), {}
+
+
+def collections_retrieve(n, make):
+    collection = collection_with_products(make, n)
+    return None, 'get', reverse('product-collections-detail', args=(collection.id,)), {}
+
+
+def collections_products(n, make):
+    collection = collection_with_products(make, n)
+    return None, 'get', reverse('product-collections-products', args=(collection.id,)), {}
+
+
+def collections_create(n, make):
+    products = make.product(_quantity=n)
+    payload = {'title': 'подборка', 'text': 'текст', 'products': [{'product_id': product.id} for product in products]}
+    return admin(), 'post', reverse('product-collections-list'), {'data': payload, 'format': 'json'}
+
+
+def collections_update(n, make):
+    collection = collection_with_products(make, n)
+    products = list(collection.products.all()[:n // 2]) + make.product(_quantity=n)
+    payload = {'title': 'подборка', 'text': 'текст', 'products': [{'product_id': product.id} for product in products]}
+    url = reverse('product-collections-detail', args=(collection.id,))
+    return admin(), 'put', url, {'data': payload, 'format': 'json'}
+
+
+def collections_destroy(n, make):
+    collection = collection_with_products(make, n)
+    return admin(), 'delete', reverse('product-collections-detail', args=(collection.id,)), {}
+
+
+def orders_list(n, make):
+    user = buyer()
+    for _ in range(n):
+        order_with_positions(make, user, n)
+    return user, 'get', reverse('orders-list'), {}
+
+
+def orders_retrieve(n, make):
+    user = buyer()
+    order = order_with_positions(make, user, n)
+    return user, 'get', reverse('orders-detail', args=(order.id,)), {}
+
+
+def orders_create(n, make):
+    products = make.product(price=10, _quantity=n)
+    payload = {'products': [{'product': product.id, 'quantity': 2} for product in products]}
+    return buyer(), 'post', reverse('orders-list'), {'data': payload, 'format': 'json'}
+
+
+def orders_update(n, make):
+    user = buyer()
+    order = order_with_positions(make, user, n)
+    products = make.product(price=10, _quantity=n)
+    payload = {'products': [{'product': product.id, 'quantity': 2} for product in products]}
+    return user, 'put', reverse('orders-detail', args=(order.id,)), {'data': payload, 'format': 'json'}
+
+
+def orders_partial_update(n, make):
+    order = order_with_positions(make, buyer(), n)
+    url = reverse('orders-detail', args=(order.id,))
+    return admin(), 'patch', url, {'data': {'order_status': 'DONE'}, 'format': 'json'}
+
+
+def orders_destroy(n, make):
+    user = buyer()
+    order = order_with_positions(make, user, n)
+    return user, 'delete', reverse('orders-detail', args=(order.id,)), {}
+
+
+def orders_bulk(n, make):
+    if not connection.features.can_return_rows_from_bulk_insert:
+        pytest.skip('без RETURNING в bulk_create заказы сохраняются по одному')
+    products = make.product(_quantity=n)
+    payload = [{'products': [{'product': product.id, 'quantity': 1} for product in products]} for _ in range(n)]
+    return buyer(), 'post', reverse('orders-bulk'), {'data': payload, 'format': 'json'}
+
+
+def stats_list(n, make):
+    user = buyer()
+    for _ in range(n):
+        order_with_positions(make, user, n)
+    rebuild_sales_stats()
+    return admin(), 'get', reverse('stats-list'), {}
+
+
+def stats_jobs(n, make):
+    now = timezone.now()
+    for status in JobStatusChoices.values:
+        for _ in range(n):
+            Job.objects.create(name='store.apply_sales_delta', status=status, max_attempts=1, run_at=now,
+                               started_at=now, finished_at=now)
+    return admin(), 'get', reverse('stats-jobs'), {}
+
+
+CASES = [
+    pytest.param(products_list, 2, id='products-list'),
+    pytest.param(products_retrieve, 2, id='products-retrieve'),
+    pytest.param(products_create, 3, id='products-create'),
+    pytest.param(products_update, 4, id='products-update'),
+    pytest.param(products_destroy, 8, id='products-destroy'),
+    pytest.param(products_export, 1, id='products-export'),
+    pytest.param(products_import, 8, id='products-import'),
+    pytest.param(reviews_list, 2, id='reviews-list'),
+    pytest.param(reviews_retrieve, 2, id='reviews-retrieve'),
+    pytest.param(reviews_create, 7, id='reviews-create'),
+    pytest.param(reviews_update, 6, id='reviews-update'),
+    pytest.param(reviews_destroy, 7, id='reviews-destroy'),
+    pytest.param(collections_list, 3, id='collections-list'),
+    pytest.param(collections_retrieve, 3, id='collections-retrieve'),
+    pytest.param(collections_products, 2, id='collections-products'),
+    pytest.param(collections_create, 7, id='collections-create'),
+    pytest.param(collections_update, 10, id='collections-update'),
+    pytest.param(collections_destroy, 4, id='collections-destroy'),
+    pytest.param(orders_list, 2, id='orders-list'),
+    pytest.param(orders_retrieve, 2, id='orders-retrieve'),
+    pytest.param(orders_create, 10, id='orders-create'),
+    pytest.param(orders_update, 13, id='orders-update'),
+    pytest.param(orders_partial_update, 9, id='orders-partial-update'),
+    pytest.param(orders_destroy, 8, id='orders-destroy'),
+    pytest.param(orders_bulk, 5, id='orders-bulk'),
+    pytest.param(stats_list, 4, id='stats-list'),
+    pytest.param(stats_jobs, 3, id='stats-jobs'),
+]
+
+
+@pytest.fixture
+def make(product_factory, product_review_factory, product_collection_factory, order_factory, order_position_factory):
+    return SimpleNamespace(product=product_factory, review=product_review_factory,
+                           collection=product_collection_factory, order=order_factory, position=order_position_factory)
+
+
+@pytest.mark.parametrize('size', [N, 10 * N], ids=['N', '10N'])
+@pytest.mark.parametrize(['case', 'budget'], CASES)
+@pytest.mark.django_db
+def test_query_budget(api_client, query_budget, make, case, budget, size):
+    """Тест количества SQL запросов каждого действия API: бюджет не зависит от числа связанных записей"""
+    user, method, url, kwargs = case(size, make)
+    if user is not None:
+        api_client.force_authenticate(user=user)
+    with query_budget(budget):
+        resp = getattr(api_client, method)(url, **kwargs)
+        if resp.streaming:
+            b''.join(resp.streaming_content)
+    assert resp.status_code < 300, resp.content
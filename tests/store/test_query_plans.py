@@ -0,0 +1,124 @@
+import re
+
+import pytest
+from django.db import connection
+from django.contrib.auth.models import User
+from rest_framework.request import Request
+
+from store.filters import OrderFilter, ProductFilter, ProductReviewFilter
+from store.models import Order, Product, ProductReview
+from store.pagination import KeysetPagination
+from store.views import ProductsViewSet
+
+PAGE = 21
+
+PRODUCT_FILTERS = [
+    {'price': '100'},
+    {'price__lte': '100'},
+    {'price__gte': '100'},
+    {'rating_avg__gte': '4'},
+    {'rating_count__gte': '10'},
+]
+
+ORDER_FILTERS = [
+    {'order_status__iexact': 'done'},
+    {'total__lte': '1000'},
+    {'total__gte': '1000'},
+    {'created_at__date': '2021-05-11'},
+    {'updated_at__date': '2021-05-11'},
+    {'products__id': '1'},
+    {'order_status__iexact': 'new', 'created_at__date': '2021-05-11'},
+]
+
+REVIEW_FILTERS = [
+    {'user': '1'},
+    {'product': '1'},
+    {'created_at__date': '2021-05-11'},
+]
+
+
+def explain(queryset):
+    """
+    План запроса. На PostgreSQL последовательное сканирование запрещается для
+    текущей транзакции: если подходящего индекса нет, планировщик все равно
+    выберет Seq Scan, и тест это увидит независимо от объема данных.
+    """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+    return queryset.explain()
+
+
+def assert_index_search(queryset, table):
+    """
+    Условие фильтра обслуживает индекс. План строится без ORDER BY и LIMIT:
+    иначе SQLite обходит индекс сортировки целиком (SCAN ... USING INDEX), и
+    такой план неотличим от плана с индексом по условию.
+    """
+    queryset = queryset.order_by()
+    plan = explain(queryset)
+    if connection.vendor == 'postgresql':
+        scanned = re.search(rf'Seq Scan on {table}\b', plan) or 'Index Cond' not in plan
+    else:
+        scanned = re.search(rf'SCAN (TABLE )?{table}\b', plan) or not re.search(rf'SEARCH (TABLE )?{table}\b', plan)
+    assert not scanned, f'Условие на {table} не обслуживается индексом:\n{queryset.query}\n{plan}'
+
+
+def assert_index_order(queryset, table):
+    """Сортировка идет по индексу: без последовательного сканирования и отдельной сортировки."""
+    plan = explain(queryset)
+    if connection.vendor == 'postgresql':
+        scanned = re.search(rf'Seq Scan on {table}\b', plan) or re.search(r'\bSort\b', plan)
+    else:
+        scanned = re.search(rf'SCAN (TABLE )?{table}\b(?! USING)', plan) or 'TEMP B-TREE' in plan
+    assert not scanned, f'Сортировка {table} не по индексу:\n{queryset.query}\n{plan}'
+
+
+def filtered(filterset):
+    assert filterset.is_valid(), filterset.errors
+    return filterset.qs
+
+
+pytestmark = [
+    pytest.mark.django_db,
+    pytest.mark.skipif(connection.vendor not in ('postgresql', 'sqlite'), reason='планы проверяются для PostgreSQL и SQLite'),
+]
+
+
+@pytest.mark.parametrize('params', PRODUCT_FILTERS)
+def test_product_filter_plan(params):
+    """Фильтры списка продуктов идут по индексам"""
+    queryset = filtered(ProductFilter(params, queryset=Product.objects.all()))
+    assert_index_search(queryset, 'store_product')
+
+
+@pytest.mark.parametrize('ordering', ['price', '-rating_avg', 'rating_count'])
+def test_product_ordering_plan(rf, ordering):
+    """Сортировки списка продуктов идут по индексам"""
+    view = ProductsViewSet(ordering_fields=ProductsViewSet.ordering_fields)
+    ordering = KeysetPagination().get_ordering(Request(rf.get('/', {'ordering': ordering})), None, view)
+    assert_index_order(Product.objects.order_by(*ordering)[:PAGE], 'store_product')
+
+
+@pytest.mark.parametrize('params', ORDER_FILTERS)
+def test_order_filter_plan(params):
+    """Фильтры списка заказов (для администратора) идут по индексам"""
+    queryset = filtered(OrderFilter(params, queryset=Order.objects.all()))
+    assert_index_search(queryset, 'store_order')
+
+
+@pytest.mark.parametrize('params', [{}] + ORDER_FILTERS)
+def test_order_owner_plan(params):
+    """Список заказов пользователя с фильтрами идет по индексам"""
+    user = User.objects.create_user('test_user')
+    queryset = filtered(OrderFilter(params, queryset=Order.objects.filter(user=user)))
+    assert_index_search(queryset, 'store_order')
+
+
+@pytest.mark.parametrize('params', REVIEW_FILTERS)
+def test_review_filter_plan(params, product_factory):
+    """Фильтры списка отзывов идут по индексам"""
+    related = {'user': User.objects.create_user('test_user').id, 'product': product_factory().id}
+    params = {key: related.get(key, value) for key, value in params.items()}
+    queryset = filtered(ProductReviewFilter(params, queryset=ProductReview.objects.all()))
+    assert_index_search(queryset, 'store_productreview')
@@ -0,0 +1,85 @@
+import io
+import uuid
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+from django.core.management import call_command
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from store.parsers import FastJSONParser, JSONLinesParser
+from store.renderers import FastJSONRenderer
+
+DATA = OrderedDict([
+    ('price', Decimal('10.50')),
+    ('created_at', datetime(2026, 1, 2, 3, 4, 5, 678, tzinfo=timezone.utc)),
+    ('local', datetime(2026, 1, 2, 3, 4, 5, tzinfo=timezone(timedelta(hours=3)))),
+    ('day', date(2026, 1, 2)),
+    ('duration', timedelta(minutes=1)),
+    ('uuid', uuid.UUID(int=1)),
+    ('lazy', gettext_lazy('товар')),
+    ('text', 'строка с разделителем '),
+    ('nested', [[1, 2.5, None], (True, {'key': []})]),
+    (1, 'ключ-число'),
+])
+
+
+def test_renderer_matches_drf():
+    """Тест рендерера orjson: байт в байт как JSONRenderer DRF, отступы и большие целые - через DRF"""
+    drf, fast = JSONRenderer(), FastJSONRenderer()
+    content = fast.render(DATA, 'application/json')
+    assert content == drf.render(DATA, 'application/json')
+    assert b'\\u2028' in content and ' '.encode() not in content
+    assert fast.render(DATA, 'application/json; indent=4') == drf.render(DATA, 'application/json; indent=4')
+    assert fast.render({'big': 2 ** 70}) == drf.render({'big': 2 ** 70})
+    assert fast.render(None) == b''
+
+
+@pytest.mark.parametrize('data', [{'rate': float('nan')}, [1.0, None, float('inf')], {'price': Decimal('NaN')}])
+def test_renderer_non_finite(data):
+    """Тест рендерера orjson на NaN и Infinity: ValueError, как у JSONRenderer DRF при STRICT_JSON"""
+    with pytest.raises(ValueError):
+        JSONRenderer().render(data)
+    with pytest.raises(ValueError):
+        FastJSONRenderer().render(data)
+
+
+def test_parser_matches_drf():
+    """Тест парсера orjson: тот же результат, что у JSONParser DRF, ошибки разбора - ParseError"""
+    body = '{"name": "товар", "price": 10.5, "ids": [1, 2], "rate": 1e-2, "nested": {"empty": null}}'.encode()
+    lines = JSONLinesParser().parse(io.BytesIO(b'{"quantity": 2}\n\n{"price": 0.1}\n'))
+    assert FastJSONParser().parse(io.BytesIO(body)) == JSONParser().parse(io.BytesIO(body))
+    legacy = FastJSONParser().parse(io.BytesIO(body.decode().encode('cp1251')), parser_context={'encoding': 'cp1251'})
+    assert legacy['name'] == 'товар'
+    assert lines == [{'quantity': 2}, {'price': 0.1}]
+    for body in (b'{"price": NaN}', b'{"price": 1.5', b'{'):
+        with pytest.raises(ParseError):
+            FastJSONParser().parse(io.BytesIO(body))
+
+
+@pytest.mark.parametrize('body', [
+    b'{"id": 12345678901234567890123}',
+    b'[-12345678901234567890123, 18446744073709551615]',
+    b'[1e400, -1e400]',
+    b'{"sku": "\\ud800"}',
+    b'{"sku": "1234567890123456789012", "price": 0.1}',
+])
+def test_parser_matches_drf_edge_cases(body):
+    """Тест парсера orjson на больших целых, числах вне диапазона double и суррогатах: как у JSONParser DRF"""
+    expected = JSONParser().parse(io.BytesIO(body))
+    assert repr(FastJSONParser().parse(io.BytesIO(body))) == repr(expected)
+    assert repr(JSONLinesParser().parse(io.BytesIO(body + b'\n'))) == repr([expected])
+
+
+@pytest.mark.django_db
+def test_benchmark_json_command():
+    """Тест команды сравнения рендереров и парсеров JSON на списках продуктов и заказов"""
+    out = io.StringIO()
+    call_command('benchmark_json', repeat=2, products=20, users=3, orders=20, stdout=out)
+    output = out.getvalue()
+    assert 'orders orjson:' in output and 'products drf:' in output
+    assert 'Ответы совпадают' in output
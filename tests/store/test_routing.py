@@ -0,0 +1,129 @@
+import random
+from collections import Counter
+
+import pytest
+from django.contrib.auth.models import User
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from store.models import Product
+from store.routing import ReplicaRouter, _read_database, choose_replica
+from store.views import ProductsViewSet
+
+REPLICAS = ('replica_a', 'replica_b')
+
+
+@pytest.fixture
+def replicas(settings):
+    """Реплики - дополнительные подключения к той же тестовой базе."""
+    for alias in REPLICAS:
+        connections.databases[alias] = dict(connections['default'].settings_dict)
+    settings.STORE_DATABASE_ROUTING = {'REPLICAS': {'replica_a': 1, 'replica_b': 1}, 'PIN_SECONDS': 60}
+    settings.STORE_RESPONSE_CACHE = {'ENABLED': False}
+    yield REPLICAS
+    for alias in REPLICAS:
+        connections[alias].close()
+        del connections[alias]
+        del connections.databases[alias]
+
+
+def captured(func):
+    contexts = {alias: CaptureQueriesContext(connections[alias]) for alias in ('default', *REPLICAS)}
+    for context in contexts.values():
+        context.__enter__()
+    try:
+        response = func()
+    finally:
+        for context in contexts.values():
+            context.__exit__(None, None, None)
+    return response, {alias: len(context) for alias, context in contexts.items()}
+
+
+def test_choose_replica_weights():
+    """Тест выбора реплики пропорционально весу"""
+    rng = random.Random(1)
+    counts = Counter(choose_replica({'a': 3, 'b': 1, 'c': 0}, rng=rng) for _ in range(4000))
+    assert set(counts) == {'a', 'b'}
+    assert 2.5 < counts['a'] / counts['b'] < 3.5
+    assert choose_replica({}) is None
+
+
+def test_router_without_request(settings):
+    """Тест маршрутизации вне запросов: запись объектов с реплики на основную базу, миграции не на реплики"""
+    settings.STORE_DATABASE_ROUTING = {'REPLICAS': {'replica_a': 1}}
+    router = ReplicaRouter()
+    assert router.db_for_read(Product) is None
+    assert router.db_for_write(Product) is None
+    replica_product = Product()
+    replica_product._state.db = 'replica_a'
+    assert router.db_for_write(Product, instance=replica_product) == 'default'
+    assert router.allow_migrate('replica_a', 'store') is False
+    assert router.allow_migrate('default', 'store') is None
+
+
+@pytest.mark.django_db(transaction=True)
+def test_reads_go_to_replicas(api_client, replicas):
+    """Тест чтения каталога с реплик, а заказов и записи - с основной базы"""
+    Product.objects.create(name='товар', description='описание', price=10)
+    reads = [captured(lambda: api_client.get(reverse('products-list'))) for _ in range(20)]
+    user = User.objects.create_user('buyer')
+    api_client.force_authenticate(user=user)
+    resp_orders, orders_queries = captured(lambda: api_client.get(reverse('orders-list')))
+    assert all(resp.status_code == 200 and resp.json()['results'] for resp, _ in reads)
+    assert all(queries['default'] == 0 for _, queries in reads)
+    assert all(sum(queries[alias] for alias in REPLICAS) > 0 for _, queries in reads)
+    assert {alias for _, queries in reads for alias in REPLICAS if queries[alias]} == set(REPLICAS)
+    assert resp_orders.status_code == 200
+    assert orders_queries['default'] > 0 and not any(orders_queries[alias] for alias in REPLICAS)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_read_your_writes(api_client, replicas):
+    """Тест закрепления клиента за основной базой после записи"""
+    admin = User.objects.create_user('test_admin', is_staff=True)
+    other = User.objects.create_user('other_admin', is_staff=True)
+    api_client.force_authenticate(user=admin)
+    payload = {'name': 'товар', 'description': 'описание', 'price': '10.00'}
+    resp_create, create_queries = captured(lambda: api_client.post(reverse('products-list'), payload, format='json'))
+    detail_url = reverse('products-detail', args=(resp_create.json()['id'],))
+    resp_read, read_queries = captured(lambda: api_client.get(detail_url))
+    api_client.force_authenticate(user=other)
+    _, other_queries = captured(lambda: api_client.get(reverse('products-list')))
+    assert resp_create.status_code == 201
+    assert not any(create_queries[alias] for alias in REPLICAS)
+    assert resp_read.status_code == 200
+    assert read_queries['default'] > 0 and not any(read_queries[alias] for alias in REPLICAS)
+    assert other_queries['default'] == 0
+
+
+@pytest.mark.django_db(transaction=True)
+def test_replica_reset_after_error(api_client, replicas, settings, monkeypatch):
+    """Тест сброса реплики после необработанного исключения и чтения только с настроенных реплик"""
+    def broken(*args, **kwargs):
+        raise RuntimeError('сбой')
+
+    monkeypatch.setattr(ProductsViewSet, 'filter_queryset', broken)
+    with pytest.raises(RuntimeError):
+        api_client.get(reverse('products-list'))
+    after_error = _read_database.get()
+    token = _read_database.set('replica_a')
+    try:
+        settings.STORE_DATABASE_ROUTING = {'REPLICAS': {}}
+        stale = ReplicaRouter().db_for_read(Product)
+    finally:
+        _read_database.reset(token)
+    assert after_error is None
+    assert stale is None
+
+
+@pytest.mark.django_db(transaction=True)
+def test_replica_responses_not_cached(api_client, replicas, settings):
+    """Тест отказа от кэширования ответа, прочитанного с реплики"""
+    settings.STORE_RESPONSE_CACHE = {'ENABLED': True}
+    Product.objects.create(name='товар', description='описание', price=10)
+    responses = [api_client.get(reverse('products-list')) for _ in range(2)]
+    settings.STORE_DATABASE_ROUTING = {'REPLICAS': {}}
+    primary = [api_client.get(reverse('products-list')) for _ in range(2)]
+    assert [resp['X-Cache'] for resp in responses] == ['MISS', 'MISS']
+    assert [resp['X-Cache'] for resp in primary] == ['MISS', 'HIT']
@@ -0,0 +1,158 @@
+from collections import Counter
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connections
+from django.urls import reverse
+from rest_framework.status import HTTP_200_OK, HTTP_201_CREATED, HTTP_204_NO_CONTENT
+
+from store.models import (ArchivedOrder, ArchivedOrderPosition, IdSequence, Order, Product, ProductOrderPosition,
+                          ProductSalesDay)
+from store.datagen import generate_store_data
+from store.sharding import id_allocator, jump_hash, shard_for_user
+
+SHARDS = ('shard_1', 'shard_2')
+SHARDED = (ProductOrderPosition, Order, ArchivedOrderPosition, ArchivedOrder)
+
+
+@pytest.fixture(scope='module')
+def shard_databases(django_db_setup, django_db_blocker):
+    """Дополнительные шарды - отдельные SQLite базы в памяти со всеми миграциями."""
+    with django_db_blocker.unblock():
+        for alias in SHARDS:
+            connections.databases[alias] = {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': f'file:store_{alias}?mode=memory&cache=shared',
+            }
+            call_command('migrate', database=alias, verbosity=0)
+    yield SHARDS
+    for alias in SHARDS:
+        del connections[alias]
+        del connections.databases[alias]
+
+
+@pytest.fixture
+def use_shards(settings, shard_databases):
+    def configure(*aliases):
+        settings.STORE_ORDER_SHARDING = {'SHARDS': ['default', *aliases], 'ID_BLOCK_SIZE': 2}
+        id_allocator.reset()
+
+    yield configure
+    for alias in shard_databases:
+        for model in SHARDED:
+            model.objects.using(alias).all().delete()
+    id_allocator.reset()
+
+
+def placement():
+    """{ID заказа: шард} по всем шардам."""
+    return {order_id: alias for alias in ('default', *SHARDS)
+            for order_id in Order.objects.using(alias).values_list('id', flat=True)}
+
+
+def create_orders(api_client, users, product):
+    url = reverse('orders-list')
+    ids = {}
+    for user in users:
+        api_client.force_authenticate(user=user)
+        resp = api_client.post(url, {'products': [{'product': product.id, 'quantity': 2}]}, format='json')
+        assert resp.status_code == HTTP_201_CREATED
+        ids[resp.json()['id']] = user
+    return ids
+
+
+def test_jump_hash():
+    """Тест jump hash: равномерное распределение и перенос ключей только на добавленный шард"""
+    keys = range(1, 3001)
+    before = [jump_hash(key, 3) for key in keys]
+    after = [jump_hash(key, 4) for key in keys]
+    moved = [new for old, new in zip(before, after) if old != new]
+    assert all(800 < count < 1200 for count in Counter(before).values())
+    assert set(moved) == {3}
+    assert 600 < len(moved) < 900
+
+
+@pytest.mark.django_db(transaction=True)
+def test_orders_sharded_by_user(api_client, product_factory, use_shards):
+    """Тест шардирования заказов: запись на шард пользователя, списки со всех шардов, детали, удаление и каскад"""
+    use_shards(*SHARDS)
+    product = product_factory(price=10)
+    users = [User.objects.create_user(f'buyer_{index}') for index in range(8)]
+    orders = create_orders(api_client, users, product)
+    stored = placement()
+    admin = User.objects.create_user('test_admin', is_staff=True)
+    api_client.force_authenticate(user=users[0])
+    own = api_client.get(reverse('orders-list')).json()['results']
+    api_client.force_authenticate(user=admin)
+    pages = []
+    next_url = f"{reverse('orders-list')}?page_size=3"
+    while next_url:
+        page = api_client.get(next_url).json()
+        pages += [order['id'] for order in page['results']]
+        next_url = page['next']
+    remote_id = next(order_id for order_id, alias in stored.items() if alias != 'default')
+    detail_url = reverse('orders-detail', args=(remote_id,))
+    resp_detail = api_client.get(detail_url)
+    resp_patch = api_client.patch(detail_url, {'order_status': 'DONE'}, format='json')
+    resp_filtered = api_client.get(reverse('orders-list'), {'order_status__iexact': 'done'})
+    sales = list(ProductSalesDay.objects.values_list('quantity', 'revenue'))
+    call_command('rebuild_sales_stats')
+    rebuilt = list(ProductSalesDay.objects.values_list('quantity', 'revenue'))
+    resp_delete = api_client.delete(detail_url)
+    product.delete()
+    assert len(orders) == 8 and len(set(stored.values())) == 3
+    assert all(stored[order_id] == shard_for_user(user.id) for order_id, user in orders.items())
+    assert IdSequence.objects.get(name='order').next_id > max(orders)
+    assert [order['id'] for order in own] == [order_id for order_id, user in orders.items() if user == users[0]]
+    assert pages == sorted(orders)
+    assert resp_detail.status_code == HTTP_200_OK
+    assert resp_detail.json()['user']['username'] == orders[remote_id].username
+    assert resp_patch.status_code == HTTP_200_OK
+    assert [order['id'] for order in resp_filtered.json()['results']] == [remote_id]
+    assert rebuilt == sales
+    assert resp_delete.status_code == HTTP_204_NO_CONTENT
+    assert remote_id not in placement()
+    assert not any(ProductOrderPosition.objects.using(alias).exists() for alias in ('default', *SHARDS))
+
+
+@pytest.mark.django_db(transaction=True)
+def test_rebalance_order_shards(api_client, product_factory, use_shards):
+    """Тест переноса заказов после добавления шарда: позиции переезжают вместе с заказом, повтор ничего не меняет"""
+    use_shards('shard_1')
+    product = product_factory(price=10)
+    users = [User.objects.create_user(f'buyer_{index}') for index in range(12)]
+    orders = create_orders(api_client, users, product)
+    use_shards(*SHARDS)
+    call_command('rebalance_order_shards', dry_run=True)
+    unchanged = placement()
+    call_command('rebalance_order_shards', chunk_size=1)
+    stored = placement()
+    positions = {alias: set(ProductOrderPosition.objects.using(alias).values_list('order_id', flat=True))
+                 for alias in ('default', *SHARDS)}
+    call_command('rebalance_order_shards')
+    assert 'shard_2' not in unchanged.values()
+    assert stored.keys() == orders.keys() and 'shard_2' in stored.values()
+    assert all(stored[order_id] == shard_for_user(user.id) for order_id, user in orders.items())
+    assert all(order_id in positions[alias] for order_id, alias in stored.items())
+    assert sum(len(ids) for ids in positions.values()) == len(orders)
+    assert placement() == stored
+
+
+@pytest.mark.django_db(transaction=True)
+def test_generate_store_data_sharded(api_client, use_shards):
+    """Тест генерации заказов при шардировании: заказы на шардах пользователей, ID не пересекаются с API"""
+    use_shards('shard_1')
+    generate_store_data(users=6, products=10, reviews=0, orders=30, collections=0, chunk_size=7, search_index=False)
+    stored = placement()
+    owners = dict(Order.objects.using('default').values_list('id', 'user_id'))
+    owners.update(Order.objects.using('shard_1').values_list('id', 'user_id'))
+    position_ids = [position_id for alias in ('default', 'shard_1')
+                    for position_id in ProductOrderPosition.objects.using(alias).values_list('id', flat=True)]
+    users = list(User.objects.all())
+    created = create_orders(api_client, users, Product.objects.first())
+    assert len(stored) == 30 and set(stored.values()) == {'default', 'shard_1'}
+    assert all(alias == shard_for_user(owners[order_id]) for order_id, alias in stored.items())
+    assert len(position_ids) == len(set(position_ids))
+    assert all(order_id not in stored for order_id in created)
+    assert ProductSalesDay.objects.exists()
@@ -0,0 +1,88 @@
+from decimal import Decimal
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.status import HTTP_200_OK, HTTP_400_BAD_REQUEST, HTTP_401_UNAUTHORIZED, HTTP_403_FORBIDDEN
+
+from store.models import OrderStatusDay, ProductSalesDay
+
+
+def rollups():
+    products = {(row.product_id, row.day): (row.quantity, row.revenue)
+                for row in ProductSalesDay.objects.all() if row.quantity or row.revenue}
+    statuses = {(row.order_status, row.day): (row.orders, row.revenue)
+                for row in OrderStatusDay.objects.all() if row.orders or row.revenue}
+    return products, statuses
+
+
+@pytest.fixture
+def sales(api_client, product_factory):
+    """Заказы через API: создание, смена статуса, замена позиций и удаление."""
+    first, second, third = (product_factory(price=price) for price in (Decimal('10.50'), 20, 5))
+    user = User.objects.create_user('buyer')
+    admin = User.objects.create_user('test_admin', is_staff=True)
+    api_client.force_authenticate(user=user)
+    url = reverse('orders-list')
+    order_ids = [
+        api_client.post(url, {'products': products}, format='json').json()['id']
+        for products in (
+            [{'product': first.id, 'quantity': 2}, {'product': second.id, 'quantity': 1}],
+            [{'product': first.id, 'quantity': 1}],
+            [{'product': third.id, 'quantity': 4}],
+        )
+    ]
+    api_client.force_authenticate(user=admin)
+    api_client.patch(reverse('orders-detail', args=(order_ids[0],)), {'order_status': 'DONE'}, format='json')
+    api_client.put(reverse('orders-detail', args=(order_ids[1],)),
+                   {'products': [{'product': second.id, 'quantity': 3}]}, format='json')
+    api_client.delete(reverse('orders-detail', args=(order_ids[2],)))
+    return first, second, third
+
+
+@pytest.mark.django_db
+def test_sales_rollups_incremental(sales):
+    """Тест инкрементальных роллапов: совпадают с ожидаемыми и с полным пересчетом"""
+    first, second, third = sales
+    today = timezone.localdate()
+    products, statuses = rollups()
+    assert products == {
+        (first.id, today): (2, Decimal('21.00')),
+        (second.id, today): (4, Decimal('80.00')),
+    }
+    assert statuses == {
+        ('DONE', today): (1, Decimal('41.00')),
+        ('NEW', today): (1, Decimal('60.00')),
+    }
+    call_command('rebuild_sales_stats', chunk_size=1)
+    assert rollups() == (products, statuses)
+
+
+@pytest.mark.django_db
+def test_stats_endpoint(api_client, sales):
+    """Тест эндпоинта статистики: итоги, фильтр по продукту, доступ только админу"""
+    first, second, third = sales
+    today = timezone.localdate().isoformat()
+    url = reverse('stats-list')
+    api_client.force_authenticate(user=None)
+    resp_anonymous = api_client.get(url)
+    api_client.force_authenticate(user=User.objects.get(username='buyer'))
+    resp_user = api_client.get(url)
+    api_client.force_authenticate(user=User.objects.get(username='test_admin'))
+    resp = api_client.get(url, {'date_from': today, 'date_to': today})
+    resp_product = api_client.get(url, {'product': first.id})
+    resp_past = api_client.get(url, {'date_to': '2000-01-01'})
+    resp_invalid = api_client.get(url, {'date_from': 'вчера'})
+    result = resp.json()
+    assert resp_anonymous.status_code == HTTP_401_UNAUTHORIZED
+    assert resp_user.status_code == HTTP_403_FORBIDDEN
+    assert resp.status_code == HTTP_200_OK
+    assert result['totals'] == {'quantity': 6, 'revenue': '101.00'}
+    assert result['by_day'] == [{'quantity': 6, 'revenue': '101.00', 'day': today}]
+    assert [item['product'] for item in result['by_product']] == [second.id, first.id]
+    assert {item['order_status']: item['orders'] for item in result['by_status']} == {'DONE': 1, 'NEW': 1}
+    assert resp_product.json()['totals'] == {'quantity': 2, 'revenue': '21.00'}
+    assert resp_past.json()['totals'] == {'quantity': 0, 'revenue': '0.00'}
+    assert resp_invalid.status_code == HTTP_400_BAD_REQUEST